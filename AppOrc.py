@@ -9,41 +9,85 @@ Inclui:
 - Conversão moeda BR robusta (vectorizada)
 - Mes_Num garantido + ordenações sem KeyError
 - Exclusão segura por Lanc_ID (batch_update)
-- Cache buster via session_state (sem st.cache_data.clear())
+- Cache buster global por versão dos dados (sem st.cache_data.clear())
+- Gravações via journal local (SQLite) sincronizado em segundo plano
+- Razão de consumo por orçamento mantido incrementalmente (SQLite)
+- Importação em lote de lançamentos (CSV/XLSX) com validação e simulação
+- Relatórios de fechamento por Projeto/Ano em lote (CLI, pool de processos)
+- Limpeza, agregação, journal e razão no pacote `orcamento` (sem Streamlit);
+  Plotly/gspread só são importados quando usados
 """
 
 import streamlit as st
-import streamlit.components.v1 as components  # (mantém disponível se quiser usar HTML via iframe)
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import date, datetime
+from datetime import date
 from dateutil.relativedelta import relativedelta
-import gspread
+import hashlib
 import json
 import os
 import math
+import threading
+import time
+import re
+import sys
 import numpy as np
-import uuid
-from typing import List, Tuple, Optional
+from collections import OrderedDict
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Optional
+
+from orcamento.config import (
+    COLS_IMPORTACAO, COLS_IMPORTACAO_OBRIG, COLS_LANC, FORMATOS_EXPORTACAO, JOURNAL_INTERVALO, MESES_CURTOS,
+    MESES_PT, MIGRACAO_DIR, MIGRACAO_PREENCHER, PARTICAO_RE, RAZAO_VERIFICACAO_INTERVALO, SHARDS_PADRAO,
+    SHEET_NAME, SHEETS_APPEND_LOTE, SHEETS_APPEND_PAUSA, TAB_CAD, TAB_ENV, TAB_LANC, TAB_LANC_ANO,
+    TAB_LANC_ARQUIVO, TAB_LANC_FALLBACK, TAB_LOG,
+)
+from orcamento.dados import (
+    ano_fechado, chave_cadastro, descartar_snapshot, expandir_parcelas, fmt_real, fmt_real_series,
+    gravar_snapshot, lanc_id_provisorio, ler_arquivo_importacao, ler_snapshot, limpar_lancamentos, linhas_planejamento, mes_num,
+    mes_str_from_date, normalizar_nome_series, normalize_text_cols, now_iso, pct, tipar_envolvidos, uuid4,
+    validar_importacao,
+)
+from orcamento.exportacao import formatos_exportacao, gerar_exportacao
+from orcamento.agregado import (
+    IndiceCandidatos, alertas_previsao, build_orcamentos_table, compute_consumo, kpis_lancamentos, projetar_consumo,
+)
+from orcamento.razao import (
+    RAZAO_LOCK, razao_aplicar, razao_conferir, razao_mensal_tabela, razao_pronta, razao_tabela,
+)
+from orcamento.journal import (
+    anos_no_journal, aplicar_journal, journal_compactar, journal_listar, journal_marcar, journal_registrar,
+    journal_reprocessar_falhas, journal_resumo, lancamentos_alterados,
+)
+from orcamento.indices import (
+    COLS_TEXTO, DIMENSOES_ENV, DIMENSOES_LANC, DIMENSOES_ORC, DIMENSOES_RATEIO, IndiceFiltros, IndiceTexto,
+)
+from orcamento.cli import argumentos_relatorios, rodar_relatorios
+
+# Plotly e gspread são importados só nos caminhos que desenham gráficos / falam com o Sheets.
+if TYPE_CHECKING:
+    import gspread
+    import plotly.graph_objects as go
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # 1. CONFIGURAÇÃO GERAL
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-st.set_page_config(
-    page_title="Controle Orçamentário",
-    page_icon="🎯",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
+def configurar_pagina():
+    """Configuração da página + CSS global; roda no início de main(), não no import."""
+    st.set_page_config(
+        page_title="Controle Orçamentário",
+        page_icon="🎯",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
+    st.markdown(CSS_GLOBAL, unsafe_allow_html=True)
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # 2. CSS GLOBAL + CSS TELA DE LOGIN
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-st.markdown(
-    """
+CSS_GLOBAL = """
 <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
 <style>
     /* ══════════ Reset & Base ══════════ */
@@ -275,9 +319,7 @@ st.markdown(
       .auth-wrap{ margin-top: 7vh; }
     }
 </style>
-""",
-    unsafe_allow_html=True,
-)
+"""
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -294,25 +336,6 @@ CORES = {
     "texto3": "#8E8E93",
 }
 
-MESES_PT = {
-    1: "JANEIRO", 2: "FEVEREIRO", 3: "MARÇO", 4: "ABRIL",
-    5: "MAIO", 6: "JUNHO", 7: "JULHO", 8: "AGOSTO",
-    9: "SETEMBRO", 10: "OUTUBRO", 11: "NOVEMBRO", 12: "DEZEMBRO"
-}
-
-SHEET_NAME = "dados_app_orcamento"
-TAB_LANC = "lançamentos"
-TAB_LANC_FALLBACK = ["lancamentos", "Lancamentos", "LANÇAMENTOS", "Lançamentos"]
-TAB_CAD = "cadastros"
-TAB_ENV = "envolvidos"
-TAB_LOG = "logs"
-
-COLS_LANC = [
-    "Data", "Ano", "Mês", "Tipo", "Projeto", "Categoria",
-    "Valor", "Descrição", "Parcela", "Abatido",
-    "Envolvidos", "Info Gerais",
-    "Lanc_ID", "Grupo_ID", "Orcado_Vinculo", "Criado_Em"
-]
 
 PLOTLY_LAYOUT = dict(
     font_family="-apple-system, BlinkMacSystemFont, 'SF Pro Display', sans-serif",
@@ -344,48 +367,34 @@ THRESH_OK = 70
 THRESH_WARN = 85
 THRESH_MAX = 100
 
+# Listas de progresso do Painel: quantas linhas aparecem de início e a cada "Mostrar mais".
+PROGRESSO_TOP_N = 10
+
+TPL_LINHA_PROGRESSO = (
+    '<div style="padding:14px 0;border-bottom:1px solid #F5F5F5;">'
+    '<div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:6px;flex-wrap:wrap;gap:4px;">'
+    '<span style="font-size:14px;font-weight:600;color:#1C1C1E;">{nome}</span>'
+    '<div style="display:flex;align-items:center;gap:10px;">'
+    '<span style="font-size:12px;color:#8E8E93;">{consumido} / {orcado}</span>'
+    '<span style="background:{cor_bg};color:{cor};padding:2px 10px;border-radius:6px;font-size:12px;font-weight:700;">{p}%</span>'
+    "</div></div>"
+    '<div style="background:#F5F5F5;border-radius:4px;height:6px;width:100%;overflow:hidden;">'
+    '<div style="background:{cor};width:{largura}%;height:6px;border-radius:4px;"></div>'
+    "</div>"
+    '<div style="display:flex;justify-content:flex-end;margin-top:4px;">'
+    '<span style="font-size:11px;color:{saldo_cor};font-weight:500;">Saldo: {saldo}</span>'
+    "</div></div>"
+).format_map
+
+TPL_CARTAO_PROGRESSO = (
+    '<div style="background:#FFFFFF;border:1px solid #F0F0F0;border-radius:14px;padding:6px 20px;'
+    'box-shadow:0 1px 4px rgba(0,0,0,0.04);margin-bottom:20px;">{linhas}</div>'
+)
+
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # 4. HELPERS
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-def now_iso() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-
-def uuid4() -> str:
-    return str(uuid.uuid4())
-
-
-def mes_str_from_date(d: date) -> str:
-    return f"{d.month:02d} - {MESES_PT[d.month]}"
-
-
-def mes_num(m: str) -> int:
-    try:
-        return int(str(m).split(" - ")[0])
-    except Exception:
-        return 0
-
-
-def fmt_real(v) -> str:
-    try:
-        v = float(v)
-    except Exception:
-        v = 0.0
-    if v < 0:
-        return f"-R$ {abs(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-
-def pct(realizado, orcado) -> float:
-    try:
-        realizado = float(realizado)
-        orcado = float(orcado)
-    except Exception:
-        return 0.0
-    return (realizado / orcado * 100.0) if orcado else 0.0
-
-
 def render_section_title(title: str):
     st.markdown(
         f"""
@@ -441,36 +450,45 @@ def render_progress_bar(consumido, orcado, label=None):
     )
 
 
-def render_progress_row(nome, consumido, orcado):
-    p = min(pct(consumido, orcado), 120)
-    if p <= THRESH_OK:
-        cor = CORES["realizado"]
-        cor_bg = "rgba(52,199,89,0.12)"
-    elif p <= THRESH_MAX:
-        cor = CORES["aviso"]
-        cor_bg = "rgba(255,149,0,0.12)"
-    else:
-        cor = CORES["alerta"]
-        cor_bg = "rgba(255,59,48,0.12)"
-
-    saldo = float(orcado) - float(consumido)
-    saldo_cor = CORES["realizado"] if saldo >= 0 else CORES["alerta"]
-
-    return (
-        f'<div style="padding:14px 0;border-bottom:1px solid #F5F5F5;">'
-        f'<div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:6px;flex-wrap:wrap;gap:4px;">'
-        f'<span style="font-size:14px;font-weight:600;color:#1C1C1E;">{nome}</span>'
-        f'<div style="display:flex;align-items:center;gap:10px;">'
-        f'<span style="font-size:12px;color:#8E8E93;">{fmt_real(consumido)} / {fmt_real(orcado)}</span>'
-        f'<span style="background:{cor_bg};color:{cor};padding:2px 10px;border-radius:6px;font-size:12px;font-weight:700;">{p:.0f}%</span>'
-        f"</div></div>"
-        f'<div style="background:#F5F5F5;border-radius:4px;height:6px;width:100%;overflow:hidden;">'
-        f'<div style="background:{cor};width:{min(p,100):.0f}%;height:6px;border-radius:4px;"></div>'
-        f"</div>"
-        f'<div style="display:flex;justify-content:flex-end;margin-top:4px;">'
-        f'<span style="font-size:11px;color:{saldo_cor};font-weight:500;">Saldo: {fmt_real(saldo)}</span>'
-        f"</div></div>"
+def render_progress_rows(nomes: pd.Series, consumido: pd.Series, orcado: pd.Series) -> str:
+    """HTML das linhas de progresso (nome, consumido/orçado, %, saldo) com formatação vetorizada."""
+    consumido = pd.to_numeric(consumido, errors="coerce").fillna(0.0)
+    orcado = pd.to_numeric(orcado, errors="coerce").fillna(0.0)
+    p = (consumido / orcado.replace(0, np.nan) * 100.0).fillna(0.0).clip(upper=120)
+    faixa = np.select([p <= THRESH_OK, p <= THRESH_MAX], [0, 1], 2)
+    saldo = orcado - consumido
+    campos = pd.DataFrame({
+        "nome": nomes.astype(str),
+        "consumido": fmt_real_series(consumido),
+        "orcado": fmt_real_series(orcado),
+        "p": p.round().astype(int).astype(str),
+        "largura": p.clip(upper=100).round().astype(int).astype(str),
+        "cor": np.array([CORES["realizado"], CORES["aviso"], CORES["alerta"]])[faixa],
+        "cor_bg": np.array(["rgba(52,199,89,0.12)", "rgba(255,149,0,0.12)", "rgba(255,59,48,0.12)"])[faixa],
+        "saldo": fmt_real_series(saldo),
+        "saldo_cor": np.where(saldo >= 0, CORES["realizado"], CORES["alerta"]),
+    })
+    return "".join(map(TPL_LINHA_PROGRESSO, campos.to_dict("records")))
+
+
+def _mostrar_mais(chave: str):
+    st.session_state[chave] = st.session_state.get(chave, PROGRESSO_TOP_N) + PROGRESSO_TOP_N
+
+
+def render_lista_progresso(agg: pd.DataFrame, col_nome: str, chave: str):
+    """Cartão com as PROGRESSO_TOP_N primeiras linhas de `agg` e um botão "Mostrar mais"."""
+    n = st.session_state.get(chave, PROGRESSO_TOP_N)
+    topo = agg.head(n)
+    st.markdown(
+        TPL_CARTAO_PROGRESSO.format(
+            linhas=render_progress_rows(topo[col_nome], topo["Realizado_Total"], topo["Orcado_Total"])
+        ),
+        unsafe_allow_html=True,
     )
+    if len(agg) > n:
+        c1, c2 = st.columns([3, 1])
+        c1.caption(f"Exibindo {n} de {len(agg)}")
+        c2.button("Mostrar mais", key=f"{chave}_mais", on_click=_mostrar_mais, args=(chave,), use_container_width=True)
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -513,6 +531,8 @@ def gate_password_screen() -> None:
 @st.cache_resource(ttl=300)
 def conectar_google():
     try:
+        import gspread
+
         diretorio_atual = os.path.dirname(os.path.abspath(__file__))
         caminho_json = os.path.join(diretorio_atual, "credentials.json")
         if os.path.exists(caminho_json):
@@ -531,6 +551,62 @@ def conectar_google():
         return None
 
 
+@st.cache_resource(ttl=300)
+def abrir_planilha(planilha: str = SHEET_NAME):
+    client = conectar_google()
+    if not client:
+        return None
+    return client.open(planilha)
+
+
+def carregar_shards() -> List[Dict]:
+    cfg = None
+    try:
+        cfg = st.secrets.get("shards")
+    except Exception:
+        cfg = None
+    if not cfg and os.getenv("ORC_SHARDS"):
+        cfg = json.loads(os.getenv("ORC_SHARDS"))
+    if not cfg:
+        return SHARDS_PADRAO
+    return [
+        {
+            "nome": str(c["nome"]),
+            "planilha": str(c.get("planilha") or c["nome"]),
+            "projetos": [str(p) for p in c.get("projetos", [])],
+        }
+        for c in cfg
+    ]
+
+
+def nomes_shards() -> List[str]:
+    return [c["nome"] for c in carregar_shards()]
+
+
+def abrir_shard(shard: str):
+    for c in carregar_shards():
+        if c["nome"] == shard:
+            return abrir_planilha(c["planilha"])
+    raise KeyError(f"Shard desconhecido: {shard}")
+
+
+def em_paralelo(fn, itens: List, max_workers: int = 8) -> List:
+    """Aplica fn a cada item em threads (ordem preservada), repassando o contexto do Streamlit."""
+    if len(itens) <= 1:
+        return [fn(i) for i in itens]
+
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+
+    def _init():
+        if ctx:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(itens)), initializer=_init) as ex:
+        return list(ex.map(fn, itens))
+
+
 def get_worksheet_case_insensitive(sh, nome: str):
     for ws in sh.worksheets():
         if ws.title.strip().lower() == nome.strip().lower():
@@ -549,6 +625,31 @@ def get_ws_lanc(sh):
     return None
 
 
+def nome_particao(ano: int) -> str:
+    return TAB_LANC_ANO.format(ano=int(ano))
+
+
+def listar_particoes(sh) -> Dict[int, "gspread.Worksheet"]:
+    """Mapeia ano -> aba de partição, com uma única chamada de metadados."""
+    particoes = {}
+    for ws in sh.worksheets():
+        m = PARTICAO_RE.match(ws.title.strip())
+        if m:
+            particoes[int(m.group(1))] = ws
+    return particoes
+
+
+def get_ws_particao(sh, ano: int, criar: bool = False):
+    """Aba da partição do `ano` pelo mesmo mapeamento de listar_particoes (aceita "lancamentos 2025" etc.).
+
+    Com `criar`, só cria a aba com o nome padrão se nenhuma grafia existir.
+    """
+    ws = listar_particoes(sh).get(int(ano))
+    if ws or not criar:
+        return ws
+    return get_or_create_worksheet(sh, nome_particao(ano), rows=1000, cols=len(COLS_LANC), header=COLS_LANC)
+
+
 def get_or_create_worksheet(sh, title: str, rows: int, cols: int, header: Optional[List[str]] = None):
     ws = get_worksheet_case_insensitive(sh, title)
     if ws:
@@ -559,47 +660,109 @@ def get_or_create_worksheet(sh, title: str, rows: int, cols: int, header: Option
     return ws
 
 
-def ensure_schema_simple(ws, header: List[str]):
+def ensure_schema_simple(ws, header: List[str]) -> List[List[str]]:
+    """Garante o cabeçalho e devolve os valores da aba (a mesma leitura serve ao chamador)."""
     values = ws.get_all_values()
     if not values:
         ws.append_row(header, value_input_option="USER_ENTERED")
-        return
+        return [header]
     existing = [c.strip() for c in values[0]]
     if existing != header:
         ws.update("1:1", [header])
+        values[0] = header
+    return values
 
 
-def ensure_schema_lanc(ws):
-    values = ws.get_all_values()
-    if not values:
+def ensure_schema_lanc(ws) -> List[str]:
+    """Garante o cabeçalho (só a linha 1) e devolve o cabeçalho final.
+
+    O corpo da planilha não é reescrito aqui: colunas novas nascem vazias e o
+    preenchimento fica com migrar_schema_lanc (`python AppOrc.py migrar`).
+    """
+    header = [h.strip() for h in ws.row_values(1)]
+    if not header:
         ws.append_row(COLS_LANC, value_input_option="USER_ENTERED")
-        return
+        return list(COLS_LANC)
 
-    header = [h.strip() for h in values[0]]
     missing = [c for c in COLS_LANC if c not in header]
-    if not missing:
-        return
+    if missing:
+        header = header + missing
+        ws.update(range_name="1:1", values=[header])
+    return header
 
-    new_header = header + missing
-    ws.update("1:1", [new_header])
 
-    n_rows = len(values) - 1
-    if n_rows <= 0:
-        return
+def alinhar_ao_header(header: List[str], linhas: List[List]) -> List[List]:
+    """Reordena linhas no formato COLS_LANC para a ordem de colunas da aba."""
+    pos = [COLS_LANC.index(h) if h in COLS_LANC else None for h in header]
+    return [[linha[p] if p is not None else "" for p in pos] for linha in linhas]
+
+
+def caminho_progresso_migracao(ws) -> str:
+    nome = re.sub(r"[^\w-]", "_", f"{ws.spreadsheet_id}_{ws.title}")
+    return os.path.join(MIGRACAO_DIR, f"{nome}.json")
+
+
+def _valores_backfill(col: str, data: str) -> str:
+    if col == "Lanc_ID":
+        return uuid4()
+    dt = pd.to_datetime(data, format="%d/%m/%Y", errors="coerce")
+    if pd.isna(dt):
+        return ""
+    return str(dt.year) if col == "Ano" else mes_str_from_date(dt.date())
 
-    total_cols = len(new_header)
-    body = values[1:]
-    padded = []
-    for row in body:
-        r = row + [""] * (total_cols - len(row))
-        padded.append(r[:total_cols])
-
-    start_row = 2
-    end_row = n_rows + 1
-    ws.update(
-        f"A{start_row}:{gspread.utils.rowcol_to_a1(end_row, total_cols)}",
-        padded
-    )
+
+def migrar_schema_lanc(ws, tamanho_lote: int = 500, progresso=None) -> Dict[str, int]:
+    """Completa o cabeçalho e preenche, em lotes, só as células vazias de MIGRACAO_PREENCHER.
+
+    O trabalho restante é recalculado a partir das células ainda vazias, então
+    basta rodar de novo depois de uma falha.
+    """
+    from gspread.utils import rowcol_to_a1
+
+    header = ensure_schema_lanc(ws)
+    pos_data = header.index("Data") + 1 if "Data" in header else None
+    datas = ws.col_values(pos_data)[1:] if pos_data else []
+
+    pendentes = []  # (coluna_a1, linha_planilha, valor)
+    for col in MIGRACAO_PREENCHER:
+        j = header.index(col) + 1
+        valores = ws.col_values(j)[1:]
+        n_linhas = max(len(datas), len(valores))
+        for i in range(n_linhas):
+            atual = valores[i].strip() if i < len(valores) else ""
+            if atual:
+                continue
+            novo = _valores_backfill(col, datas[i] if i < len(datas) else "")
+            if novo:
+                pendentes.append((j, i + 2, novo))
+
+    total = len(pendentes)
+    caminho = caminho_progresso_migracao(ws)
+    os.makedirs(MIGRACAO_DIR, exist_ok=True)
+
+    feitas = 0
+    for k in range(0, total, tamanho_lote):
+        lote = pendentes[k:k + tamanho_lote]
+        por_coluna = {}
+        for j, linha, valor in lote:
+            por_coluna.setdefault(j, {})[linha] = valor
+
+        data = []
+        for j, celulas in por_coluna.items():
+            for ini, fim in _group_contiguous(sorted(celulas)):
+                data.append({
+                    "range": f"{rowcol_to_a1(ini, j)}:{rowcol_to_a1(fim, j)}",
+                    "values": [[celulas[r]] for r in range(ini, fim + 1)],
+                })
+        ws.batch_update(data, value_input_option="USER_ENTERED")
+
+        feitas += len(lote)
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump({"aba": ws.title, "feitas": feitas, "total": total, "atualizado_em": now_iso()}, f)
+        if progresso:
+            progresso(feitas, total)
+
+    return {"celulas": feitas, "total": total}
 
 
 def log_event(sh, action: str, detail: str, n: int = 0):
@@ -615,217 +778,225 @@ def log_event(sh, action: str, detail: str, n: int = 0):
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # 7. DADOS — LOAD / CLEAN
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-def moeda_to_float_series(s: pd.Series) -> pd.Series:
-    if s is None or len(s) == 0:
-        return pd.Series([], dtype="float64")
-
-    x = s.astype(str).fillna("").str.strip()
-    x = x.replace({"": "0", "None": "0", "nan": "0", "NaN": "0"})
-    x = x.str.replace("R$", "", regex=False).str.replace(" ", "", regex=False)
-
-    has_comma = x.str.contains(",", regex=False)
-    x = x.where(~has_comma, x.str.replace(".", "", regex=False))
-    x = x.where(~has_comma, x.str.replace(",", ".", regex=False))
-
-    dot_count = x.str.count(r"\.")
-    maybe_thousand = (dot_count == 1) & (x.str.split(".").str[-1].str.len() == 3)
-    x = x.where(~maybe_thousand, x.str.replace(".", "", regex=False))
-
-    return pd.to_numeric(x, errors="coerce").fillna(0.0).astype(float)
-
-
-def normalize_text_cols(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
-    for c in cols:
-        if c in df.columns:
-            df[c] = df[c].astype(str).fillna("").str.strip()
+@st.cache_data(ttl=120, show_spinner=False)
+def carregar_particao(_sh, shard: str, ano: int, cache_buster: int) -> pd.DataFrame:
+    """Lê uma partição anual; anos fechados vêm do snapshot local quando existe."""
+    fechado = ano_fechado(ano)
+    if fechado:
+        snap = ler_snapshot(shard, ano)
+        if snap is not None:
+            return snap
+
+    ws = get_ws_particao(_sh, ano)
+    if not ws:
+        return limpar_lancamentos([])
+    df = limpar_lancamentos(ws.get_all_values())
+    if fechado:
+        gravar_snapshot(shard, ano, df)
     return df
 
 
-def normalize_tipo(df: pd.DataFrame) -> pd.DataFrame:
-    if "Tipo" not in df.columns:
-        return df
-    m = {
-        "orcado": "Orçado",
-        "orçado": "Orçado",
-        "planejado": "Orçado",
-        "realizado": "Realizado",
-        "efetivado": "Realizado",
-    }
-    df["Tipo"] = (
-        df["Tipo"]
-        .astype(str)
-        .fillna("")
-        .str.strip()
-        .apply(lambda v: m.get(v.lower(), v))
-    )
-    return df
-
+@st.cache_data(ttl=120, show_spinner=False)
+def carregar_legado(_sh, shard: str, cache_buster: int) -> pd.DataFrame:
+    ws = get_ws_lanc(_sh)
+    if not ws:
+        return limpar_lancamentos([])
+    return limpar_lancamentos(ws.get_all_values())
 
-def derive_year_from_date(df: pd.DataFrame) -> pd.DataFrame:
-    df["Data_dt"] = pd.to_datetime(df.get("Data", ""), format="%d/%m/%Y", errors="coerce")
 
-    if "Ano" not in df.columns:
-        df["Ano"] = np.nan
+@st.cache_data(ttl=120, show_spinner=False)
+def listar_anos_lanc(cache_buster: int) -> List[int]:
+    def _anos_shard(shard):
+        sh = abrir_shard(shard)
+        if not sh:
+            return set()
+        anos = set(listar_particoes(sh))
+        anos.update(int(a) for a in carregar_legado(sh, shard, cache_buster)["Ano"].unique())
+        return anos
 
-    ano_num = pd.to_numeric(df["Ano"], errors="coerce")
-    ano_from_data = df["Data_dt"].dt.year
-    ano_final = ano_num.where(~ano_num.isna(), ano_from_data)
+    try:
+        anos = set().union(*em_paralelo(_anos_shard, nomes_shards()))
+        return sorted(anos, reverse=True)
+    except Exception as e:
+        st.error(f"Erro ao listar anos: {e}")
+        return []
 
-    df["Ano_Invalido"] = ano_final.isna()
-    df["Ano"] = ano_final.fillna(date.today().year).astype(int)
-    return df
 
+def carregar_lancamentos(cache_buster: int, anos: Tuple[int, ...]) -> pd.DataFrame:
+    """Fan-out paralelo por shard x partição; o resultado traz a coluna Shard."""
+    def _ler(tarefa):
+        shard, ano = tarefa
+        sh = abrir_shard(shard)
+        if not sh:
+            return limpar_lancamentos([])
+        if ano is None:
+            legado = carregar_legado(sh, shard, cache_buster)
+            df = legado[legado["Ano"].isin(anos)]
+        else:
+            df = carregar_particao(sh, shard, ano, cache_buster)
+        return df.assign(Shard=shard)
 
-def ensure_month_consistency(df: pd.DataFrame) -> pd.DataFrame:
-    if "Mês" not in df.columns:
-        df["Mês"] = ""
-    mask = (df["Mês"].astype(str).str.strip() == "") & (df["Data_dt"].notna())
-    df.loc[mask, "Mês"] = df.loc[mask, "Data_dt"].dt.month.apply(
-        lambda m: f"{int(m):02d} - {MESES_PT[int(m)]}"
-    )
-    return df
+    tarefas = [(shard, ano) for shard in nomes_shards() for ano in (*anos, None)] if anos else []
+    partes = [p for p in em_paralelo(_ler, tarefas) if not p.empty]
+    if not partes:
+        return limpar_lancamentos([]).assign(Shard="")
+    return pd.concat(partes, ignore_index=True)
 
 
 @st.cache_data(ttl=120, show_spinner=False)
-def carregar_dados(cache_buster: int) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    client = conectar_google()
-    if not client:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+def carregar_cadastros_envolvidos(_sh, shard: str, cache_buster: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # cadastros
+    ws_cad = get_or_create_worksheet(_sh, TAB_CAD, rows=200, cols=2, header=["Tipo", "Nome"])
+    dados_cad = ensure_schema_simple(ws_cad, ["Tipo", "Nome"])
+    df_cad = pd.DataFrame(dados_cad[1:], columns=["Tipo", "Nome"]) if len(dados_cad) > 1 else pd.DataFrame(columns=["Tipo", "Nome"])
+    df_cad = normalize_text_cols(df_cad, ["Tipo", "Nome"])
+
+    # envolvidos
+    ws_env = get_or_create_worksheet(
+        _sh, TAB_ENV, rows=1500, cols=8,
+        header=["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"]
+    )
+    dados_env = ensure_schema_simple(ws_env, ["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"])
+    cols_env = ["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"]
+    df_env = pd.DataFrame(dados_env[1:], columns=cols_env) if len(dados_env) > 1 else pd.DataFrame(columns=cols_env)
+    df_env = normalize_text_cols(df_env, cols_env)
+    return df_cad.assign(Shard=shard), df_env.assign(Shard=shard)
 
-    try:
-        sh = client.open(SHEET_NAME)
 
-        ws_lanc = get_ws_lanc(sh)
-        if not ws_lanc:
-            ws_lanc = get_or_create_worksheet(sh, TAB_LANC, rows=3000, cols=len(COLS_LANC), header=COLS_LANC)
-        ensure_schema_lanc(ws_lanc)
+def carregar_dados(cache_buster: int, anos: Tuple[int, ...] = ()) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Carrega cadastros/envolvidos de todos os shards e só as partições de lançamentos em `anos`,
+    já com as gravações pendentes no journal."""
+    try:
+        def _cad_env(shard):
+            sh = abrir_shard(shard)
+            if not sh:
+                return pd.DataFrame(), pd.DataFrame()
+            return carregar_cadastros_envolvidos(sh, shard, cache_buster)
+
+        df_lanc = carregar_lancamentos(cache_buster, tuple(anos))
+        cad_env = em_paralelo(_cad_env, nomes_shards())
+        df_cad = pd.concat([c for c, _ in cad_env], ignore_index=True)
+        df_env = pd.concat([e for _, e in cad_env], ignore_index=True)
+        df_lanc, df_cad, df_env = aplicar_journal(df_lanc, df_cad, df_env, tuple(anos))
+        return df_lanc, df_cad, tipar_envolvidos(df_env)
 
-        dados_lanc = ws_lanc.get_all_values()
-        header = [h.strip() for h in (dados_lanc[0] if dados_lanc else COLS_LANC)]
-        body = dados_lanc[1:] if len(dados_lanc) > 1 else []
-        df_lanc = pd.DataFrame(body, columns=header) if body else pd.DataFrame(columns=header)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados: {e}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
-        for c in COLS_LANC:
-            if c not in df_lanc.columns:
-                df_lanc[c] = ""
 
-        df_lanc = normalize_text_cols(df_lanc, [
-            "Projeto", "Categoria", "Descrição", "Envolvidos", "Info Gerais",
-            "Parcela", "Abatido", "Lanc_ID", "Grupo_ID", "Orcado_Vinculo", "Criado_Em", "Mês"
-        ])
-        df_lanc = normalize_tipo(df_lanc)
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# 8. ESCRITA — APPEND / DELETE / CADASTROS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+@st.cache_resource
+def _estado_global() -> Dict:
+    return {
+        "versao_planilha": 0, "versao_dados": 0, "lock": threading.Lock(), "replay_lock": threading.Lock(),
+        "razao_verificado_em": 0.0,
+    }
 
-        df_lanc["Valor_num"] = moeda_to_float_series(df_lanc["Valor"]) if "Valor" in df_lanc.columns else 0.0
 
-        df_lanc = derive_year_from_date(df_lanc)
-        df_lanc = ensure_month_consistency(df_lanc)
+def versao_planilha() -> int:
+    """Chave dos caches de leitura do Sheets; muda quando o Sheets é alterado."""
+    return _estado_global()["versao_planilha"]
 
-        df_lanc["Mes_Num"] = df_lanc["Mês"].apply(mes_num)
 
-        df_lanc["Lanc_ID"] = df_lanc["Lanc_ID"].replace({"": np.nan}).fillna(
-            df_lanc.apply(lambda _: uuid4(), axis=1)
-        )
-        df_lanc["Grupo_ID"] = df_lanc["Grupo_ID"].replace({"": np.nan}).fillna("")
-        df_lanc["Orcado_Vinculo"] = df_lanc["Orcado_Vinculo"].replace({"": np.nan}).fillna("")
-
-        # cadastros
-        ws_cad = get_or_create_worksheet(sh, TAB_CAD, rows=200, cols=2, header=["Tipo", "Nome"])
-        ensure_schema_simple(ws_cad, ["Tipo", "Nome"])
-        dados_cad = ws_cad.get_all_values()
-        df_cad = pd.DataFrame(dados_cad[1:], columns=["Tipo", "Nome"]) if len(dados_cad) > 1 else pd.DataFrame(columns=["Tipo", "Nome"])
-        df_cad = normalize_text_cols(df_cad, ["Tipo", "Nome"])
-
-        # envolvidos
-        ws_env = get_or_create_worksheet(
-            sh, TAB_ENV, rows=1500, cols=8,
-            header=["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"]
-        )
-        ensure_schema_simple(ws_env, ["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"])
-        dados_env = ws_env.get_all_values()
-        cols_env = ["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"]
-        df_env = pd.DataFrame(dados_env[1:], columns=cols_env) if len(dados_env) > 1 else pd.DataFrame(columns=cols_env)
-        df_env = normalize_text_cols(df_env, cols_env)
+def versao_dados() -> int:
+    """Muda a cada alteração visível (inclusive gravações ainda só no journal)."""
+    return _estado_global()["versao_dados"]
 
-        return df_lanc, df_cad, df_env
 
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+def invalidate_cache(planilha: bool = True):
+    estado = _estado_global()
+    with estado["lock"]:
+        if planilha:
+            estado["versao_planilha"] += 1
+        estado["versao_dados"] += 1
 
 
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-# 8. ESCRITA — APPEND / DELETE / CADASTROS
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-def invalidate_cache():
-    st.session_state.cache_buster = int(st.session_state.get("cache_buster", 0)) + 1
+def shard_do_projeto(projeto: str) -> str:
+    """Shard dono do projeto: configuração explícita, depois cadastros, depois o primeiro shard."""
+    shards = carregar_shards()
+    for c in shards:
+        if projeto in c["projetos"]:
+            return c["nome"]
+    if len(shards) > 1:
+        dono = catalogo_cadastros()["shard_projeto"].get(projeto)
+        if dono:
+            return dono
+    return shards[0]["nome"]
 
 
-def salvar_lancamentos(linhas: List[List]) -> bool:
-    client = conectar_google()
-    if not client:
-        return False
-    try:
-        sh = client.open(SHEET_NAME)
-        ws = get_ws_lanc(sh)
-        if not ws:
-            ws = get_or_create_worksheet(sh, TAB_LANC, rows=3000, cols=len(COLS_LANC), header=COLS_LANC)
-        ensure_schema_lanc(ws)
-
-        ws.append_rows(linhas, value_input_option="USER_ENTERED")
-        log_event(sh, "append_lancamentos", "append_rows", n=len(linhas))
-        invalidate_cache()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar: {e}")
-        return False
+def _abrir_shard_ou_erro(shard: str):
+    sh = abrir_shard(shard)
+    if not sh:
+        raise RuntimeError("Sem conexão com o Google Sheets.")
+    return sh
 
 
-def salvar_envolvido(dados_linha: List[str]) -> bool:
-    client = conectar_google()
-    if not client:
-        return False
-    try:
-        sh = client.open(SHEET_NAME)
-        ws = get_or_create_worksheet(
-            sh, TAB_ENV, rows=1500, cols=8,
-            header=["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"]
-        )
-        ensure_schema_simple(ws, ["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"])
-        ws.append_row(dados_linha, value_input_option="USER_ENTERED")
-        log_event(sh, "append_envolvido", "append_row", n=1)
-        invalidate_cache()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar envolvido: {e}")
-        return False
+def _aplicar_append_lancamentos(shard: str, linhas: List[List], tamanho_lote: Optional[int] = SHEETS_APPEND_LOTE) -> int:
+    """Append por partição anual, ignorando Lanc_IDs que já estão na planilha.
 
+    `tamanho_lote` linhas por append_rows; None manda cada partição num único append.
+    """
+    sh = _abrir_shard_ou_erro(shard)
+    idx_ano = COLS_LANC.index("Ano")
+    idx_id = COLS_LANC.index("Lanc_ID")
+    por_ano = {}
+    for linha in linhas:
+        por_ano.setdefault(int(linha[idx_ano]), []).append(linha)
+
+    n = 0
+    for ano, lote in sorted(por_ano.items()):
+        ws = get_ws_particao(sh, ano, criar=True)
+        header = ensure_schema_lanc(ws)
+        existentes = set(ws.col_values(header.index("Lanc_ID") + 1)[1:])
+        novos = [linha for linha in lote if linha[idx_id] not in existentes]
+        passo = tamanho_lote or max(len(novos), 1)
+        for i in range(0, len(novos), passo):
+            if i:
+                time.sleep(SHEETS_APPEND_PAUSA)
+            ws.append_rows(alinhar_ao_header(header, novos[i:i + passo]), value_input_option="USER_ENTERED")
+        n += len(novos)
+        if ano_fechado(ano):
+            descartar_snapshot(shard, ano)
+
+    anos_txt = ",".join(str(a) for a in sorted(por_ano))
+    log_event(sh, "append_lancamentos", f"append_rows anos={anos_txt}", n=n)
+    return n
+
+
+def _aplicar_append_envolvidos(shard: str, linhas: List[List[str]]) -> int:
+    sh = _abrir_shard_ou_erro(shard)
+    ws = get_or_create_worksheet(
+        sh, TAB_ENV, rows=1500, cols=8,
+        header=["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"]
+    )
+    ensure_schema_simple(ws, ["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"])
+    ws.append_rows(linhas, value_input_option="USER_ENTERED")
+    log_event(sh, "append_envolvido", "append_rows", n=len(linhas))
+    return len(linhas)
+
+
+def _aplicar_append_cadastros(shard: str, itens: List[Tuple[str, str]]) -> int:
+    sh = _abrir_shard_ou_erro(shard)
+    ws = get_or_create_worksheet(sh, TAB_CAD, rows=200, cols=2, header=["Tipo", "Nome"])
+    vistos = {
+        chave_cadastro(row[0], row[1])
+        for row in ensure_schema_simple(ws, ["Tipo", "Nome"])[1:]
+        if len(row) >= 2
+    }
+    novos = []
+    for tipo, nome in itens:
+        chave = chave_cadastro(tipo, nome)
+        if chave not in vistos:
+            vistos.add(chave)
+            novos.append([tipo, nome])
 
-def salvar_cadastro_novo(tipo: str, nome: str) -> bool:
-    client = conectar_google()
-    if not client:
-        return False
-    try:
-        sh = client.open(SHEET_NAME)
-        ws = get_or_create_worksheet(sh, TAB_CAD, rows=200, cols=2, header=["Tipo", "Nome"])
-        ensure_schema_simple(ws, ["Tipo", "Nome"])
-
-        dados_existentes = ws.get_all_values()
-        for row in dados_existentes[1:]:
-            if (
-                len(row) >= 2
-                and row[0].strip().lower() == tipo.strip().lower()
-                and row[1].strip().lower() == nome.strip().lower()
-            ):
-                st.warning(f"'{nome}' já existe em {tipo}.")
-                return False
-
-        ws.append_row([tipo, nome], value_input_option="USER_ENTERED")
-        log_event(sh, "append_cadastro", f"{tipo}:{nome}", n=1)
-        invalidate_cache()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar cadastro: {e}")
-        return False
+    if novos:
+        ws.append_rows(novos, value_input_option="USER_ENTERED")
+        log_event(sh, "append_cadastro", ";".join(f"{t}:{n}" for t, n in novos), n=len(novos))
+    return len(novos)
 
 
 def _group_contiguous(sorted_rows: List[int]) -> List[Tuple[int, int]]:
@@ -843,48 +1014,42 @@ def _group_contiguous(sorted_rows: List[int]) -> List[Tuple[int, int]]:
     return groups
 
 
-def excluir_linhas_por_lanc_id(lanc_ids: List[str]) -> bool:
-    if not lanc_ids:
-        return False
-
-    client = conectar_google()
-    if not client:
-        return False
+def _excluir_no_shard(shard: str, target: set, anos: Optional[Iterable[int]]) -> int:
+    """Apaga as linhas dos Lanc_IDs `target`; falha, sem apagar nada, se algum não estiver em nenhuma aba."""
+    sh = _abrir_shard_ou_erro(shard)
 
-    try:
-        sh = client.open(SHEET_NAME)
-        ws = get_ws_lanc(sh)
-        if not ws:
-            st.error("Aba de lançamentos não encontrada.")
-            return False
+    particoes = listar_particoes(sh)
+    anos_busca = set(particoes) if anos is None else {int(a) for a in anos}
+    alvos = [(ano, particoes[ano]) for ano in sorted(anos_busca) if ano in particoes]
+    ws_legado = get_ws_lanc(sh)
+    if ws_legado:
+        alvos.append((None, ws_legado))
 
-        ensure_schema_lanc(ws)
-        values = ws.get_all_values()
-        if len(values) <= 1:
-            return False
+    requests = []
+    n_linhas = 0
+    n_grupos = 0
+    anos_afetados = set()
+    encontrados = set()
 
-        header = [h.strip() for h in values[0]]
+    for ano, ws in alvos:
+        # Só o cabeçalho e a coluna Lanc_ID: não precisa baixar a aba inteira.
+        header = [h.strip() for h in ws.row_values(1)]
         if "Lanc_ID" not in header:
-            st.error("Coluna Lanc_ID não existe na planilha.")
-            return False
-
-        col_idx = header.index("Lanc_ID")
-        target = set(lanc_ids)
+            continue
 
+        ids = ws.col_values(header.index("Lanc_ID") + 1)
         rows_to_delete = []
-        for i, row in enumerate(values[1:], start=2):
-            row_id = row[col_idx].strip() if len(row) > col_idx else ""
-            if row_id in target:
+        for i, row_id in enumerate(ids[1:], start=2):
+            if row_id.strip() in target:
                 rows_to_delete.append(i)
+                encontrados.add(row_id.strip())
 
         if not rows_to_delete:
-            st.warning("Nenhuma linha encontrada para exclusão (IDs não localizados).")
-            return False
+            continue
 
         rows_to_delete.sort()
         groups = _group_contiguous(rows_to_delete)
 
-        requests = []
         sheet_id = ws._properties.get("sheetId")
         for start, end in reversed(groups):
             requests.append({
@@ -897,186 +1062,869 @@ def excluir_linhas_por_lanc_id(lanc_ids: List[str]) -> bool:
                     }
                 }
             })
+        n_linhas += len(rows_to_delete)
+        n_grupos += len(groups)
+        if ano is not None:
+            anos_afetados.add(ano)
+
+    faltando = sorted(set(target) - encontrados)
+    if faltando:
+        # Sem a linha na planilha a exclusão se perderia: a entrada fica no journal (e vira 'falha').
+        raise RuntimeError(
+            f"{len(faltando)} Lanc_ID(s) não encontrado(s) para exclusão: "
+            f"{', '.join(faltando[:5])}{'...' if len(faltando) > 5 else ''}"
+        )
+    if not requests:
+        return 0
 
-        sh.batch_update({"requests": requests})
-        log_event(sh, "delete_lancamentos", f"by_lanc_id groups={len(groups)}", n=len(rows_to_delete))
-        invalidate_cache()
-        return True
+    sh.batch_update({"requests": requests})
+    for ano in anos_afetados:
+        if ano_fechado(ano):
+            descartar_snapshot(shard, ano)
+    log_event(sh, "delete_lancamentos", f"by_lanc_id groups={n_grupos}", n=n_linhas)
+    return n_linhas
 
-    except Exception as e:
-        st.error(f"Erro ao excluir: {e}")
-        return False
 
+def _aplicar_update_lancamentos(shard: str, alteracoes: List[Dict]) -> int:
+    """Grava só as células alteradas, achando a linha de cada Lanc_ID, num único values_batch_update.
 
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-# 9. ORÇADO x REALIZADO — AGREGADO
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-def build_orcamentos_table(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return pd.DataFrame(columns=["Orc_ID", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria", "Orcado_Total"])
+    Alterações repetidas do mesmo Lanc_ID se acumulam (a mais recente vence por campo).
+    Falha, sem gravar nada, se algum Lanc_ID não estiver em nenhuma aba.
+    """
+    from gspread.utils import rowcol_to_a1
+
+    sh = _abrir_shard_ou_erro(shard)
+    pendentes, anos = {}, set()
+    for a in alteracoes:
+        pendentes.setdefault(a["lanc_id"], {}).update(a["campos"])
+        anos.add(int(a["ano"]))
+
+    particoes = listar_particoes(sh)
+    alvos = [(ano, particoes[ano]) for ano in sorted(anos) if ano in particoes]
+    ws_legado = get_ws_lanc(sh)
+    if ws_legado:
+        alvos.append((None, ws_legado))
+
+    data, n_linhas, anos_afetados = [], 0, set()
+    for ano, ws in alvos:
+        if not pendentes:
+            break
+        header = ensure_schema_lanc(ws)
+        ids = ws.col_values(header.index("Lanc_ID") + 1)
+        titulo = ws.title.replace("'", "''")
+        for linha, lanc_id in enumerate(ids[1:], start=2):
+            campos = pendentes.pop(lanc_id.strip(), None)
+            if campos is None:
+                continue
+            valores = {header.index(c) + 1: v for c, v in campos.items() if c in header}
+            for ini, fim in _group_contiguous(sorted(valores)):
+                data.append({
+                    "range": f"'{titulo}'!{rowcol_to_a1(linha, ini)}:{rowcol_to_a1(linha, fim)}",
+                    "values": [[valores[j] for j in range(ini, fim + 1)]],
+                })
+            n_linhas += 1
+            if ano is not None:
+                anos_afetados.add(ano)
+
+    if pendentes:
+        # Sem a linha na planilha a alteração se perderia: a entrada fica no journal (e vira 'falha').
+        faltando = sorted(pendentes)
+        raise RuntimeError(
+            f"{len(faltando)} Lanc_ID(s) não encontrado(s) nas abas de lançamentos: "
+            f"{', '.join(faltando[:5])}{'...' if len(faltando) > 5 else ''}"
+        )
+    if not data:
+        return 0
+    sh.values_batch_update({"valueInputOption": "USER_ENTERED", "data": data})
+    for ano in anos_afetados:
+        if ano_fechado(ano):
+            descartar_snapshot(shard, ano)
+    log_event(sh, "update_lancamentos", f"by_lanc_id ranges={len(data)}", n=n_linhas)
+    return n_linhas
 
-    df_orc = df[df["Tipo"] == "Orçado"].copy()
-    if df_orc.empty:
-        return pd.DataFrame(columns=["Orc_ID", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria", "Orcado_Total"])
 
-    if "Mes_Num" not in df_orc.columns:
-        df_orc["Mes_Num"] = df_orc["Mês"].apply(mes_num)
+def particionar_legado(shard: str, tamanho_lote: int = 2000) -> Dict[int, int]:
+    """Copia a aba única de lançamentos para as partições anuais e arquiva a aba antiga.
 
-    df_orc["Orc_ID"] = df_orc["Grupo_ID"].where(
-        df_orc["Grupo_ID"].astype(str).str.strip() != "",
-        df_orc["Lanc_ID"]
-    )
+    Lanc_IDs já presentes na partição de destino são ignorados, então a
+    operação pode ser repetida após uma falha no meio do caminho.
+    """
+    sh = abrir_shard(shard)
+    if not sh:
+        return {}
+    ws = get_ws_lanc(sh)
+    if not ws:
+        return {}
 
-    agg = (
-        df_orc.groupby(["Orc_ID", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria"], dropna=False)
-        .agg(Orcado_Total=("Valor_num", "sum"))
-        .reset_index()
-    )
-    return agg
+    values = ws.get_all_values()
+    if len(values) <= 1:
+        ws.update_title(TAB_LANC_ARQUIVO)
+        return {}
 
+    header = [h.strip() for h in values[0]]
+    pos = {c: i for i, c in enumerate(header)}
+    df = limpar_lancamentos(values)
+    idx_ano = COLS_LANC.index("Ano")
+    idx_id = COLS_LANC.index("Lanc_ID")
+
+    contagem = {}
+    for ano, idx_linhas in df.groupby("Ano").groups.items():
+        ano = int(ano)
+        ws_p = get_ws_particao(sh, ano, criar=True)
+        header_p = ensure_schema_lanc(ws_p)
+        existentes = set(ws_p.col_values(header_p.index("Lanc_ID") + 1)[1:])
+
+        linhas = []
+        for i in idx_linhas:
+            row = values[i + 1]
+            linha = [row[pos[c]] if c in pos and pos[c] < len(row) else "" for c in COLS_LANC]
+            linha[idx_ano] = ano
+            linha[idx_id] = df.at[i, "Lanc_ID"]
+            if linha[idx_id] not in existentes:
+                linhas.append(linha)
+
+        for k in range(0, len(linhas), tamanho_lote):
+            ws_p.append_rows(alinhar_ao_header(header_p, linhas[k:k + tamanho_lote]), value_input_option="USER_ENTERED")
+        descartar_snapshot(shard, ano)
+        contagem[ano] = len(linhas)
+
+    ws.update_title(TAB_LANC_ARQUIVO)
+    log_event(sh, "particionar_legado", f"anos={len(contagem)}", n=sum(contagem.values()))
+    return contagem
+
+
+COLS_SEM_ORCAMENTO = ["Shard", "Aba", "Linha", "Lanc_ID", "Ano", "Mês", "Projeto", "Categoria", "Valor_num"]
+
+
+def vincular_realizados(simular: bool = False) -> Tuple[int, pd.DataFrame]:
+    """Grava em Orcado_Vinculo o vínculo que o fallback do consumo deduziria.
+
+    Realizados sem vínculo recebem o Orc_ID de maior Orcado_Total do mesmo
+    (Ano, Mês, Projeto, Categoria), com um batch_update de ranges contíguos por aba.
+    Segura o replay do journal para que exclusões não desloquem as linhas no meio.
+    Devolve quantos foram (ou seriam, com `simular`) vinculados e os realizados
+    sem orçamento correspondente.
+    """
+    from gspread.utils import rowcol_to_a1
+
+    vp = versao_planilha()
+    anos = tuple(sorted(set(listar_anos_lanc(vp)) | anos_no_journal()))
+    candidatos = IndiceCandidatos(build_orcamentos_table(carregar_dados(vp, anos)[0]))
+
+    vinculados, sem_orcamento = 0, []
+    with _estado_global()["replay_lock"]:
+        for shard in nomes_shards():
+            sh = abrir_shard(shard)
+            if not sh:
+                continue
+            legado = get_ws_lanc(sh)
+            abas = sorted(listar_particoes(sh).items()) + ([(None, legado)] if legado else [])
+            for ano, ws in abas:
+                values = ws.get_all_values()
+                if len(values) <= 1:
+                    continue
+                df = limpar_lancamentos(values)
+                df["Linha"] = np.arange(len(df)) + 2
+                sem = df[(df["Tipo"] == "Realizado") & (df["Orcado_Vinculo"] == "")]
+                if sem.empty:
+                    continue
+
+                mapeado = candidatos.maior_orc_id(sem)
+                achou = mapeado[mapeado["Orc_ID"].notna()]
+                sem_orcamento.append(mapeado[mapeado["Orc_ID"].isna()].assign(Shard=shard, Aba=ws.title)[COLS_SEM_ORCAMENTO])
+                vinculados += len(achou)
+                if simular or achou.empty:
+                    continue
+
+                j = ensure_schema_lanc(ws).index("Orcado_Vinculo") + 1
+                celulas = dict(zip(achou["Linha"].tolist(), achou["Orc_ID"].tolist()))
+                ws.batch_update([
+                    {
+                        "range": f"{rowcol_to_a1(ini, j)}:{rowcol_to_a1(fim, j)}",
+                        "values": [[celulas[r]] for r in range(ini, fim + 1)],
+                    }
+                    for ini, fim in _group_contiguous(sorted(celulas))
+                ], value_input_option="USER_ENTERED")
+                if ano is not None:
+                    descartar_snapshot(shard, ano)
+                log_event(sh, "vincular_realizados", ws.title, n=len(achou))
 
-def compute_consumo(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    alerts = []
+    if vinculados and not simular:
+        invalidate_cache()
+        razao_verificar(forcar=True)
+    sem_orcamento = [d for d in sem_orcamento if not d.empty]
+    return vinculados, (pd.concat(sem_orcamento, ignore_index=True) if sem_orcamento
+                        else pd.DataFrame(columns=COLS_SEM_ORCAMENTO))
 
-    if df.empty:
-        return pd.DataFrame(), pd.DataFrame(columns=["Tipo", "Mensagem"])
-
-    df = df.copy()
-    if "Mes_Num" not in df.columns:
-        df["Mes_Num"] = df["Mês"].apply(mes_num)
-
-    df_orc = build_orcamentos_table(df)
-    df_real = df[df["Tipo"] == "Realizado"].copy()
-
-    if df_orc.empty:
-        if not df_real.empty:
-            grp = df_real.groupby(["Ano", "Mês", "Projeto", "Categoria"], dropna=False)["Valor_num"].sum().reset_index()
-            for _, r in grp.iterrows():
-                alerts.append({
-                    "Tipo": "Realizado sem Orçado",
-                    "Mensagem": f"Realizado {fmt_real(r['Valor_num'])} em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}) sem orçamento."
-                })
-        return df_orc, pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
 
-    if df_real.empty:
-        df_orc["Realizado_Total"] = 0.0
-        df_orc["Saldo"] = df_orc["Orcado_Total"]
-        df_orc["Uso_%"] = df_orc.apply(lambda r: pct(r["Realizado_Total"], r["Orcado_Total"]), axis=1)
-        df_orc["Status"] = np.where(df_orc["Saldo"] < 0, "Estouro", "OK")
-        return df_orc, pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# 9. JOURNAL LOCAL — SALVAR / EXCLUIR / REPLAY
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+def _aplicar_lote_journal(op: str, shard: str, payloads: List[Dict]):
+    if op == "append_lancamentos":
+        # Entradas com lote_unico (planejamento) vão num único append; a ordem das entradas é mantida.
+        for unico, grupo in groupby(payloads, key=lambda p: bool(p.get("lote_unico"))):
+            linhas = [linha for p in grupo for linha in p["linhas"]]
+            _aplicar_append_lancamentos(shard, linhas, tamanho_lote=None if unico else SHEETS_APPEND_LOTE)
+    elif op == "append_envolvido":
+        _aplicar_append_envolvidos(shard, [p["linha"] for p in payloads])
+    elif op == "append_cadastro":
+        _aplicar_append_cadastros(shard, [(p["tipo"], p["nome"]) for p in payloads])
+    elif op == "update_lancamentos":
+        _aplicar_update_lancamentos(shard, [a for p in payloads for a in p["alteracoes"]])
+    elif op == "delete_lancamentos":
+        ids = {i for p in payloads for i in p["lanc_ids"]}
+        anos = None if any(p.get("anos") is None for p in payloads) else {a for p in payloads for a in p["anos"]}
+        _excluir_no_shard(shard, ids, anos)
+    else:
+        raise ValueError(f"Operação desconhecida no journal: {op}")
 
-    df_real["Orc_Vinc"] = df_real["Orcado_Vinculo"].astype(str).fillna("").str.strip()
 
-    vinc = df_real[df_real["Orc_Vinc"] != ""]
-    consumo_vinc = (
-        vinc.groupby("Orc_Vinc")["Valor_num"].sum().reset_index()
-        .rename(columns={"Orc_Vinc": "Orc_ID", "Valor_num": "Realizado_Vinculado"})
-    )
+def replay_journal() -> int:
+    """Envia as entradas pendentes ao Sheets, agrupando entradas seguidas de mesma operação e shard.
 
-    sem_vinc = df_real[df_real["Orc_Vinc"] == ""]
-    if not sem_vinc.empty:
-        sem_vinc_grp = (
-            sem_vinc.groupby(["Ano", "Mês", "Projeto", "Categoria"], dropna=False)["Valor_num"].sum().reset_index()
-        )
+    A ordem das gravações é preservada por shard: uma entrada que falhou (pendente
+    para nova tentativa ou já em 'falha') segura todas as seguintes do mesmo shard
+    até ser enviada ou reenviada; os demais shards seguem. Devolve quantas entradas
+    foram confirmadas.
+    """
+    estado = _estado_global()
+    with estado["replay_lock"]:
+        travados = set()
+        lotes = []
+        for e in journal_listar(("pendente", "falha")):
+            if e["status"] == "falha":
+                travados.add(e["shard"])
+            if e["shard"] in travados:
+                continue
+            if lotes and lotes[-1][0]["op"] == e["op"] and lotes[-1][0]["shard"] == e["shard"]:
+                lotes[-1].append(e)
+            else:
+                lotes.append([e])
+
+        feitas = 0
+        for lote in lotes:
+            if lote[0]["shard"] in travados:
+                continue
+            ids = [e["id"] for e in lote]
+            try:
+                _aplicar_lote_journal(lote[0]["op"], lote[0]["shard"], [e["payload"] for e in lote])
+            except Exception as e:
+                journal_marcar(ids, "falha", str(e))
+                travados.add(lote[0]["shard"])
+                continue
+            # Invalida antes de marcar: quem ler no meio vê o Sheets novo (e a
+            # sobreposição do journal deduplica), nunca o cache antigo sem a entrada.
+            invalidate_cache()
+            journal_marcar(ids, "feito")
+            feitas += len(ids)
 
-        best_orc_in_group = (
-            df_orc.sort_values("Orcado_Total", ascending=False)
-            .groupby(["Ano", "Mês", "Projeto", "Categoria"], dropna=False)
-            .head(1)[["Orc_ID", "Ano", "Mês", "Projeto", "Categoria"]]
-        )
+        if feitas:
+            journal_compactar()
+        return feitas
 
-        sem_vinc_mapped = sem_vinc_grp.merge(best_orc_in_group, on=["Ano", "Mês", "Projeto", "Categoria"], how="left")
-        consumo_fallback = (
-            sem_vinc_mapped.dropna(subset=["Orc_ID"])
-            .groupby("Orc_ID")["Valor_num"].sum().reset_index()
-            .rename(columns={"Valor_num": "Realizado_Fallback"})
-        )
 
-        nao_achou = sem_vinc_mapped[sem_vinc_mapped["Orc_ID"].isna()]
-        if not nao_achou.empty:
-            for _, r in nao_achou.iterrows():
-                alerts.append({
-                    "Tipo": "Realizado sem Orçado",
-                    "Mensagem": f"Realizado {fmt_real(r['Valor_num'])} em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}) sem orçamento correspondente."
-                })
-    else:
-        consumo_fallback = pd.DataFrame(columns=["Orc_ID", "Realizado_Fallback"])
+@st.cache_resource
+def iniciar_replayer() -> threading.Event:
+    """Sobe (uma vez por processo) a thread que esvazia o journal; o Event a acorda na hora."""
+    acordar = threading.Event()
 
-    df_orc2 = df_orc.merge(consumo_vinc, on="Orc_ID", how="left")
-    df_orc2["Realizado_Vinculado"] = df_orc2.get("Realizado_Vinculado", 0.0).fillna(0.0)
+    def _loop():
+        while True:
+            acordar.wait(JOURNAL_INTERVALO)
+            acordar.clear()
+            try:
+                replay_journal()
+            except Exception:
+                pass
+            if time.time() - _estado_global()["razao_verificado_em"] >= RAZAO_VERIFICACAO_INTERVALO:
+                try:
+                    razao_verificar()
+                except Exception:
+                    pass
 
-    if not consumo_fallback.empty:
-        df_orc2 = df_orc2.merge(consumo_fallback, on="Orc_ID", how="left")
-        df_orc2["Realizado_Fallback"] = df_orc2.get("Realizado_Fallback", 0.0).fillna(0.0)
-    else:
-        df_orc2["Realizado_Fallback"] = 0.0
+    threading.Thread(target=_loop, name="journal-replayer", daemon=True).start()
+    return acordar
 
-    if "Mes_Num" not in df_orc2.columns:
-        df_orc2["Mes_Num"] = df_orc2["Mês"].apply(mes_num)
 
-    df_orc2["Realizado_Total"] = df_orc2["Realizado_Vinculado"] + df_orc2["Realizado_Fallback"]
-    df_orc2["Saldo"] = df_orc2["Orcado_Total"] - df_orc2["Realizado_Total"]
-    df_orc2["Uso_%"] = df_orc2.apply(lambda r: pct(r["Realizado_Total"], r["Orcado_Total"]), axis=1)
-    df_orc2["Status"] = np.where(df_orc2["Saldo"] < 0, "Estouro", "OK")
+def _journal_gravado():
+    invalidate_cache(planilha=False)
+    iniciar_replayer().set()
 
-    estouros = df_orc2[df_orc2["Saldo"] < 0]
-    for _, r in estouros.iterrows():
-        alerts.append({
-            "Tipo": "Estouro",
-            "Mensagem": f"Estouro em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}): saldo {fmt_real(r['Saldo'])}."
-        })
 
-    return df_orc2, pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
+def _registrar_lancamentos(linhas: List[List], lote_unico: bool = False):
+    """Journal (uma entrada por shard) + razão; o chamador avisa o replayer.
 
+    Com `lote_unico`, o replay envia as linhas de cada entrada num único append_rows.
+    """
+    idx_proj = COLS_LANC.index("Projeto")
+    shard_de = {p: shard_do_projeto(p) for p in {linha[idx_proj] for linha in linhas}}
+    por_shard = {}
+    for linha in linhas:
+        por_shard.setdefault(shard_de[linha[idx_proj]], []).append(linha)
+    for shard, lote in por_shard.items():
+        journal_registrar("append_lancamentos", shard, {"linhas": lote, **({"lote_unico": True} if lote_unico else {})})
+    razao_aplicar(novas=limpar_lancamentos([COLS_LANC] + [list(l) for l in linhas]))
+
+
+def salvar_lancamentos(linhas: List[List], lote_unico: bool = False) -> bool:
+    """Registra as linhas no journal, já roteadas para o shard do projeto."""
+    try:
+        _registrar_lancamentos(linhas, lote_unico)
+        _journal_gravado()
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar: {e}")
+        return False
 
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-# 10. TELAS
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-def tela_resumo(df: pd.DataFrame):
-    st.markdown(
-        "<h1>Painel Financeiro</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Visão consolidada do seu orçamento</p>",
-        unsafe_allow_html=True,
-    )
 
-    if df.empty:
-        st.info("Sem dados. Acesse **Novo** para criar o primeiro lançamento.")
-        return
+def salvar_envolvido(dados_linha: List[str]) -> bool:
+    try:
+        journal_registrar("append_envolvido", shard_do_projeto(dados_linha[2]), {"linha": dados_linha})
+        _journal_gravado()
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar envolvido: {e}")
+        return False
 
-    anos_disponiveis = sorted(df["Ano"].unique(), reverse=True)
-    ano_atual = date.today().year
-    default_ano = ano_atual if ano_atual in anos_disponiveis else (anos_disponiveis[0] if anos_disponiveis else ano_atual)
 
-    with st.expander("🔍 Filtros", expanded=False):
-        with st.form("form_filtros_painel"):
-            c1, c2 = st.columns(2)
-            ano_sel = c1.selectbox(
-                "Ano", anos_disponiveis,
-                index=anos_disponiveis.index(default_ano) if default_ano in anos_disponiveis else 0
-            )
-            meses_disp = sorted(df["Mês"].unique(), key=mes_num)
-            meses_sel = c2.multiselect("Meses", meses_disp)
+def salvar_cadastro_novo(tipo: str, nome: str, shard: Optional[str] = None) -> bool:
+    try:
+        if shard is None:
+            shard = shard_do_projeto(nome) if tipo == "Projeto" else nomes_shards()[0]
 
-            c3, c4 = st.columns(2)
-            proj_sel = c3.multiselect("Projetos", sorted(df["Projeto"].unique()))
-            cat_sel = c4.multiselect("Categorias", sorted(df["Categoria"].unique()))
+        existente = catalogo_cadastros()["chaves"].get(chave_cadastro(tipo, nome))
+        if existente is not None:
+            st.warning(f"'{nome}' já existe em {tipo}" + ("." if existente == nome.strip() else f" como '{existente}'."))
+            return False
 
-            st.form_submit_button("Aplicar", type="primary", use_container_width=True)
+        journal_registrar("append_cadastro", shard, {"tipo": tipo, "nome": nome})
+        _journal_gravado()
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar cadastro: {e}")
+        return False
+
+
+def excluir_lancamentos(alvo: pd.DataFrame) -> bool:
+    """Registra a exclusão das linhas de `alvo` por Lanc_ID: uma entrada por shard, só com os seus ids e anos.
+
+    Linhas cujo Lanc_ID ainda não está gravado na planilha não podem ser excluídas.
+    """
+    if alvo.empty:
+        return False
+    provisorios = int(lanc_id_provisorio(alvo).sum())
+    if provisorios:
+        st.error(
+            f"{provisorios} registro(s) sem Lanc_ID na planilha não podem ser excluídos "
+            "(rode `python AppOrc.py migrar` antes)."
+        )
+        return False
+
+    try:
+        for shard, linhas in alvo.groupby("Shard", sort=True):
+            payload = {"lanc_ids": linhas["Lanc_ID"].tolist(), "anos": sorted(int(a) for a in linhas["Ano"].unique())}
+            journal_registrar("delete_lancamentos", shard, payload)
+        razao_aplicar(remover=alvo["Lanc_ID"].tolist())
+        _journal_gravado()
+        return True
+    except Exception as e:
+        st.error(f"Erro ao excluir: {e}")
+        return False
+
+
+def anos_das_series(alvo: pd.DataFrame) -> set:
+    """Anos que as séries (Grupo_ID) das linhas de `alvo` alcançam, da 1ª à última parcela.
+
+    Cada linha se situa na série pela Parcela "k de n"; sem esse formato, conta só o próprio mês.
+    """
+    alvo = alvo[alvo["Grupo_ID"] != ""]
+    if alvo.empty:
+        return set()
+    kn = alvo["Parcela"].astype(str).str.extract(r"^\s*(\d+)\s*de\s*(\d+)\s*$").apply(pd.to_numeric).fillna(1)
+    k, n = kn[0], kn[[0, 1]].max(axis=1)
+    mes_abs = alvo["Ano"].astype(int) * 12 + alvo["Mes_Num"].astype(int).clip(1, 12) - 1
+    inicio, fim = (mes_abs - (k - 1)) // 12, (mes_abs + (n - k)) // 12
+    return {a for i, f in zip(inicio.astype(int), fim.astype(int)) for a in range(i, f + 1)}
+
+
+def membros_grupos(alvo: pd.DataFrame) -> pd.DataFrame:
+    """Todas as linhas (com o journal) das séries das linhas de `alvo`, lendo só os anos que elas alcançam."""
+    grupos = set(alvo["Grupo_ID"]) - {""}
+    vp = versao_planilha()
+    anos = anos_das_series(alvo) & (set(listar_anos_lanc(vp)) | anos_no_journal())
+    if not grupos or not anos:
+        return alvo.iloc[0:0]
+    df = carregar_dados(vp, tuple(sorted(anos)))[0]
+    return df[df["Grupo_ID"].isin(grupos)] if not df.empty else df
+
+
+def editar_lancamentos(originais: pd.DataFrame, campos_por_id: Dict[str, Dict[str, str]]) -> bool:
+    """Registra edições de células (valores já no formato da planilha) por Lanc_ID, uma entrada por shard."""
+    if not campos_por_id:
+        return False
+
+    try:
+        alvo = originais[originais["Lanc_ID"].isin(campos_por_id)]
+        por_shard = {}
+        for lanc_id, ano, shard in zip(alvo["Lanc_ID"], alvo["Ano"], alvo["Shard"]):
+            por_shard.setdefault(shard, []).append({"lanc_id": lanc_id, "ano": int(ano), "campos": campos_por_id[lanc_id]})
+        for shard, alteracoes in por_shard.items():
+            journal_registrar("update_lancamentos", shard, {"alteracoes": alteracoes})
+        razao_aplicar(novas=lancamentos_alterados(alvo, campos_por_id))
+        _journal_gravado()
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar alterações: {e}")
+        return False
+
+
+def importar_lancamentos(arquivo, nome: str, simular: bool = False, progresso=None) -> Dict:
+    """Importa um arquivo de lançamentos bloco a bloco; com `simular`, só valida e relata.
+
+    Cada bloco válido vira entradas no journal (enviadas pelo replayer em appends fatiados).
+    """
+    catalogo = catalogo_cadastros()
+    r = {"lidas": 0, "aceitas": 0, "lancamentos": 0, "valor": 0.0, "rejeitadas": []}
+    for bloco in ler_arquivo_importacao(arquivo, nome):
+        faltando = [c for c in COLS_IMPORTACAO_OBRIG if c not in {str(h).strip() for h in bloco.columns}]
+        if faltando:
+            raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+        validas, rejeitadas = validar_importacao(bloco, catalogo, inicio=r["lidas"])
+        linhas = expandir_parcelas(validas)
+        if linhas and not simular:
+            _registrar_lancamentos(linhas)
+        r["lidas"] += len(bloco)
+        r["aceitas"] += len(validas)
+        r["lancamentos"] += len(linhas)
+        r["valor"] += float((validas["Valor_num"] * validas["Parcelas"]).sum())
+        r["rejeitadas"].append(rejeitadas)
+        if progresso:
+            progresso(r)
+
+    r["rejeitadas"] = pd.concat(r["rejeitadas"], ignore_index=True) if r["rejeitadas"] else pd.DataFrame(
+        columns=["Linha", "Motivo", *COLS_IMPORTACAO]
+    )
+    if r["lancamentos"] and not simular:
+        _journal_gravado()
+    return r
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# 10. RAZÃO — CONFERÊNCIA / ROLLUPS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+def lancamentos_razao(cache_buster: int) -> pd.DataFrame:
+    """Lançamentos de todos os anos, com o journal, para conferir/reconstruir o razão.
+
+    Anos fechados vêm direto dos snapshots locais; o Sheets só é lido nas partições
+    abertas e nas fechadas ainda sem snapshot (que passam a ter). Cadastros e
+    envolvidos não são carregados.
+    """
+    def _ler(shard):
+        sh = abrir_shard(shard)
+        if not sh:
+            return limpar_lancamentos([])
+        partes = [carregar_legado(sh, shard, cache_buster)]
+        for ano in sorted(listar_particoes(sh)):
+            snap = ler_snapshot(shard, ano) if ano_fechado(ano) else None
+            partes.append(snap if snap is not None else carregar_particao(sh, shard, ano, cache_buster))
+        partes = [p.assign(Shard=shard) for p in partes if not p.empty]
+        return pd.concat(partes, ignore_index=True) if partes else limpar_lancamentos([])
+
+    partes = [p for p in em_paralelo(_ler, nomes_shards()) if not p.empty]
+    df = pd.concat(partes, ignore_index=True) if partes else limpar_lancamentos([]).assign(Shard="")
+    anos = tuple(sorted(set(df["Ano"].unique().tolist()) | anos_no_journal()))
+    return aplicar_journal(df, pd.DataFrame(), pd.DataFrame(), anos)[0]
+
+
+def razao_verificar(forcar: bool = False) -> Dict[str, int]:
+    """Recalcula o consumo completo e compara com o razão; reconstrói se houver divergência."""
+    with RAZAO_LOCK:
+        r = razao_conferir(lancamentos_razao(versao_planilha()), forcar=forcar)
+        _estado_global()["razao_verificado_em"] = time.time()
+        return r
+
+
+def razao_garantir():
+    """Constrói o razão na primeira leitura (ou depois de uma falha incremental)."""
+    if not razao_pronta():
+        razao_verificar()
+
+
+@st.cache_data(ttl=120, show_spinner=False)
+def rollup_mensal(versao_planilha_: int, versao_dados_: int) -> pd.DataFrame:
+    """Totais mensais por Projeto/Categoria/Tipo (todos os anos), lidos de razao_mensal."""
+    razao_garantir()
+    return razao_mensal_tabela()
+
+
+CHAVE_HORAS = ["Ano", "Mes_Num", "Projeto", "Centro de Custo"]
+
+
+@st.cache_data(ttl=120, max_entries=4, show_spinner=False)
+def horas_envolvidos(versao_planilha_: int, versao_dados_: int) -> pd.DataFrame:
+    """Horas e pessoas por (Ano, Mes_Num, Projeto, Centro de Custo)."""
+    df_env = carregar_dados(versao_planilha_)[2]
+    if df_env.empty:
+        return pd.DataFrame(columns=[*CHAVE_HORAS, "Horas", "Pessoas"])
+    return (
+        df_env.groupby(CHAVE_HORAS, as_index=False)
+        .agg(Horas=("Horas", "sum"), Pessoas=("Nome", "nunique"))
+    )
+
+
+@st.cache_data(ttl=120, max_entries=4, show_spinner=False)
+def rateio_custos(versao_planilha_: int, versao_dados_: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Realizado de cada (Ano, mês, Projeto) rateado entre os envolvidos pelas horas.
+
+    Junta os envolvidos tipados ao rollup mensal (razao_mensal) — nenhuma linha de
+    lançamento é lida. Devolve o rateio por pessoa e o realizado sem envolvidos
+    (ou com zero horas) no mês, que fica sem rateio.
+    """
+    rollup = rollup_mensal(versao_planilha_, versao_dados_)
+    realizado = (
+        rollup[rollup["Tipo"] == "Realizado"]
+        .groupby(["Ano", "Mes_Num", "Projeto"], as_index=False)["Valor_num"].sum()
+        .rename(columns={"Valor_num": "Realizado_Projeto"})
+    )
+    df_env = carregar_dados(versao_planilha_)[2]
+    cols = ["Ano", "Mes_Num", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas"]
+    env = df_env[cols] if not df_env.empty else pd.DataFrame(columns=cols)
+
+    horas_mes = env.groupby(["Ano", "Mes_Num", "Projeto"])["Horas"].transform("sum")
+    rateio = env.assign(Participacao=(env["Horas"] / horas_mes.where(horas_mes > 0)).fillna(0.0))
+    rateio = rateio.merge(realizado, on=["Ano", "Mes_Num", "Projeto"], how="left")
+    rateio["Realizado_Projeto"] = rateio["Realizado_Projeto"].fillna(0.0)
+    rateio["Custo_Rateado"] = rateio["Participacao"] * rateio["Realizado_Projeto"]
+
+    com_horas = rateio[rateio["Horas"] > 0][["Ano", "Mes_Num", "Projeto"]].drop_duplicates()
+    sem_rateio = realizado.merge(com_horas, on=["Ano", "Mes_Num", "Projeto"], how="left", indicator=True)
+    sem_rateio = sem_rateio[sem_rateio["_merge"] == "left_only"].drop(columns="_merge").reset_index(drop=True)
+    return rateio, sem_rateio
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# 11. FILTROS — ÍNDICES POR DIMENSÃO
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+@st.cache_resource(ttl=120, max_entries=16, show_spinner=False)
+def _indice_lancamentos(anos: Tuple[int, ...], versao_planilha_: int, versao_dados_: int) -> IndiceFiltros:
+    df = carregar_dados(versao_planilha_, anos)[0]
+    return IndiceFiltros(df, DIMENSOES_LANC)
+
+
+def indice_lancamentos(anos: Tuple[int, ...]) -> IndiceFiltros:
+    """Índice dos lançamentos dos `anos`, construído uma vez por versão dos dados."""
+    return _indice_lancamentos(tuple(sorted(int(a) for a in anos)), versao_planilha(), versao_dados())
+
+
+@st.cache_resource(show_spinner=False)
+def _indices_texto_recentes() -> Dict:
+    """Último índice de texto (+ hash das linhas indexadas) por conjunto de anos, base para a extensão incremental."""
+    return {"lock": threading.Lock(), "por_anos": OrderedDict()}
+
+
+def _hash_linhas_texto(df: pd.DataFrame) -> np.ndarray:
+    """Hash por linha de Lanc_ID + COLS_TEXTO: muda quando o texto de uma linha é editado no lugar."""
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[["Lanc_ID", *COLS_TEXTO]].astype(str), index=False).to_numpy()
+
+
+def indice_texto_lancamentos(anos: Tuple[int, ...], indice: IndiceFiltros) -> IndiceTexto:
+    """Índice de texto do mesmo DataFrame de `indice` (mesmas posições), criado na primeira busca."""
+    if getattr(indice, "texto", None) is not None:
+        return indice.texto
+    anos = tuple(sorted(int(a) for a in anos))
+    df = indice.df
+    ids = df["Lanc_ID"].to_numpy(dtype=object) if not df.empty else np.empty(0, dtype=object)
+    hashes = _hash_linhas_texto(df)
+    recentes = _indices_texto_recentes()
+    with recentes["lock"]:
+        base, base_hashes = recentes["por_anos"].get(anos, (None, None))
+    # Só estende quando as linhas novas foram acrescentadas ao fim e as antigas (id e texto) não mudaram;
+    # edições no lugar (update_lancamentos) mudam o hash e forçam a reconstrução.
+    if base is not None and base.n <= len(ids) and np.array_equal(base_hashes, hashes[:base.n]):
+        texto = base.estender(df.iloc[base.n:]) if base.n < len(ids) else base
+    else:
+        texto = IndiceTexto.construir(df) if not df.empty else IndiceTexto(ids, {})
+    with recentes["lock"]:
+        recentes["por_anos"][anos] = (texto, hashes)
+        recentes["por_anos"].move_to_end(anos)
+        while len(recentes["por_anos"]) > 16:
+            recentes["por_anos"].popitem(last=False)
+    indice.texto = texto
+    return texto
+
+
+@st.cache_resource(ttl=120, max_entries=16, show_spinner=False)
+def _indice_candidatos(anos: Tuple[int, ...], versao_planilha_: int, versao_dados_: int) -> IndiceCandidatos:
+    return IndiceCandidatos(build_orcamentos_table(indice_lancamentos(anos).df))
+
+
+def indice_candidatos(anos: Tuple[int, ...]) -> IndiceCandidatos:
+    """Orçamentos dos `anos` indexados para vínculo/fallback, uma vez por versão dos dados."""
+    return _indice_candidatos(tuple(sorted(int(a) for a in anos)), versao_planilha(), versao_dados())
+
+
+@st.cache_resource(ttl=120, max_entries=16, show_spinner=False)
+def _indice_orcamentos(anos: Tuple[int, ...], versao_planilha_: int, versao_dados_: int) -> Tuple[IndiceFiltros, pd.DataFrame]:
+    razao_garantir()
+    _, df_alertas = razao_tabela(anos)
+    # Projeção sobre todos os anos: um Orc_ID pode ter parcelas fora dos anos carregados.
+    df_orc_agg = projetar_consumo(razao_tabela()[0])
+    df_orc_agg = df_orc_agg[df_orc_agg["Ano"].isin(anos)].reset_index(drop=True)
+    df_alertas = pd.concat([df_alertas, alertas_previsao(df_orc_agg)], ignore_index=True)
+    if df_orc_agg.empty:
+        df_orc_agg = pd.DataFrame(columns=["Ano", "Mês", "Mes_Num", "Projeto", "Categoria", "Orcado_Total",
+                                           "Realizado_Total", "Saldo", "Uso_%", "Status", "Orc_ID",
+                                           "Projecao", "Estouro_Previsto"])
+    return IndiceFiltros(df_orc_agg, DIMENSOES_ORC), df_alertas
+
+
+def indice_orcamentos(anos: Tuple[int, ...]) -> Tuple[IndiceFiltros, pd.DataFrame]:
+    """Consumo por orçamento dos `anos` (do razão) + índice, uma vez por versão dos dados."""
+    return _indice_orcamentos(tuple(sorted(int(a) for a in anos)), versao_planilha(), versao_dados())
+
+
+@st.cache_resource(ttl=120, max_entries=4, show_spinner=False)
+def _indice_envolvidos(versao_planilha_: int, versao_dados_: int) -> IndiceFiltros:
+    return IndiceFiltros(carregar_dados(versao_planilha_)[2], DIMENSOES_ENV)
 
-    df_f = df[df["Ano"] == ano_sel].copy()
-    if meses_sel:
-        df_f = df_f[df_f["Mês"].isin(meses_sel)]
-    if proj_sel:
-        df_f = df_f[df_f["Projeto"].isin(proj_sel)]
-    if cat_sel:
-        df_f = df_f[df_f["Categoria"].isin(cat_sel)]
+
+def indice_envolvidos() -> IndiceFiltros:
+    """Índice dos envolvidos, uma vez por versão dos dados."""
+    return _indice_envolvidos(versao_planilha(), versao_dados())
+
+
+@st.cache_resource(ttl=120, max_entries=4, show_spinner=False)
+def _indice_rateio(versao_planilha_: int, versao_dados_: int) -> Tuple[IndiceFiltros, pd.DataFrame]:
+    rateio, sem_rateio = rateio_custos(versao_planilha_, versao_dados_)
+    return IndiceFiltros(rateio.reset_index(drop=True), DIMENSOES_RATEIO), sem_rateio
+
+
+def indice_rateio() -> Tuple[IndiceFiltros, pd.DataFrame]:
+    """Rateio do realizado por pessoa/centro de custo + índice, uma vez por versão dos dados."""
+    return _indice_rateio(versao_planilha(), versao_dados())
+
+
+@st.cache_resource(ttl=120, max_entries=4, show_spinner=False)
+def _catalogo_cadastros(versao_planilha_: int, versao_dados_: int) -> Dict:
+    _, df_cad, _ = carregar_dados(versao_planilha_)
+    tipo = df_cad["Tipo"].str.lower() if not df_cad.empty else pd.Series(dtype=str)
+    proj = df_cad[tipo == "projeto"] if not df_cad.empty else df_cad
+    chaves = {}
+    if not df_cad.empty:
+        # Primeira grafia cadastrada vence: é a que aparece nos avisos e na importação.
+        pares = zip(normalizar_nome_series(df_cad["Tipo"]), normalizar_nome_series(df_cad["Nome"]), df_cad["Nome"])
+        for t, n, nome in pares:
+            chaves.setdefault((t, n), nome)
+    return {
+        "projeto": sorted(proj["Nome"].unique().tolist()) if not proj.empty else [],
+        "categoria": sorted(df_cad[tipo == "categoria"]["Nome"].unique().tolist()) if not df_cad.empty else [],
+        "shard_projeto": dict(zip(proj["Nome"], proj["Shard"])) if not proj.empty else {},
+        "chaves": chaves,
+    }
+
+
+def catalogo_cadastros() -> Dict:
+    """Projetos/categorias cadastrados (ordenados), shard de cada projeto e o índice normalizado
+    (Tipo, Nome) -> grafia cadastrada, uma vez por versão dos dados (inclui o que está no journal)."""
+    return _catalogo_cadastros(versao_planilha(), versao_dados())
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# 12. TELAS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+FIGURAS_MAX = 64  # specs de gráficos guardados (LRU), compartilhados entre sessões
+
+
+@st.cache_resource
+def _cache_figuras() -> Dict:
+    return {"specs": OrderedDict(), "lock": threading.Lock(), "acertos": {}, "faltas": {}}
+
+
+def figura_em_cache(nome: str, filtros: Tuple, construir) -> Optional[Dict]:
+    """Spec do gráfico `nome` para a versão dos dados + `filtros`; `construir()` só roda na falta.
+
+    Guarda o JSON já serializado (None quando não há o que plotar) num LRU de FIGURAS_MAX entradas.
+    """
+    cache = _cache_figuras()
+    chave = (nome, versao_planilha(), versao_dados(), filtros)
+    with cache["lock"]:
+        spec = cache["specs"].get(chave)
+        if spec is not None:
+            cache["specs"].move_to_end(chave)
+        contador = cache["acertos"] if spec is not None else cache["faltas"]
+        contador[nome] = contador.get(nome, 0) + 1
+
+    if spec is None:
+        fig = construir()
+        spec = fig.to_json() if fig is not None else "null"
+        with cache["lock"]:
+            cache["specs"][chave] = spec
+            while len(cache["specs"]) > FIGURAS_MAX:
+                cache["specs"].popitem(last=False)
+    return json.loads(spec)
+
+
+def estatisticas_figuras() -> Dict[str, int]:
+    cache = _cache_figuras()
+    with cache["lock"]:
+        acertos, faltas = sum(cache["acertos"].values()), sum(cache["faltas"].values())
+        return {"acertos": acertos, "faltas": faltas, "entradas": len(cache["specs"])}
+
+
+def figura_mensal(df_f: pd.DataFrame) -> Optional["go.Figure"]:
+    import plotly.express as px
+
+    df_mes = df_f.groupby(["Mês", "Tipo"])["Valor_num"].sum().reset_index()
+    if df_mes.empty:
+        return None
+    df_mes["Mes_Num"] = df_mes["Mês"].apply(mes_num)
+    df_mes = df_mes.sort_values("Mes_Num")
+
+    fig_mes = px.bar(
+        df_mes, x="Mês", y="Valor_num", color="Tipo", barmode="group",
+        color_discrete_map={"Orçado": CORES["orcado"], "Realizado": CORES["realizado"]},
+    )
+    fig_mes.update_traces(
+        texttemplate="%{y:.2s}", textposition="outside",
+        marker_line_width=0,
+        hovertemplate="<b>%{x}</b><br>Valor: R$ %{y:,.2f}<extra></extra>"
+    )
+    fig_mes.update_layout(height=360, bargap=0.3, bargroupgap=0.08, **PLOTLY_LAYOUT)
+    return fig_mes
+
+
+def figura_horas(horas: pd.DataFrame) -> Optional["go.Figure"]:
+    """Horas por mês, empilhadas por centro de custo (a partir do rollup de horas)."""
+    import plotly.express as px
+
+    df_h = horas.groupby(["Mes_Num", "Centro de Custo"], as_index=False)["Horas"].sum()
+    if df_h.empty:
+        return None
+    df_h["Mês"] = df_h["Mes_Num"].map(MESES_CURTOS)
+    fig = px.bar(df_h.sort_values("Mes_Num"), x="Mês", y="Horas", color="Centro de Custo", barmode="stack")
+    fig.update_traces(marker_line_width=0, hovertemplate="<b>%{x}</b><br>%{y:,.1f} h<extra></extra>")
+    fig.update_layout(height=320, bargap=0.3, **PLOTLY_LAYOUT)
+    return fig
+
+
+def figura_waterfall(df_f: pd.DataFrame) -> Optional["go.Figure"]:
+    import plotly.graph_objects as go
+
+    total_orcado = df_f[df_f["Tipo"] == "Orçado"]["Valor_num"].sum()
+    df_gastos = (
+        df_f[df_f["Tipo"] == "Realizado"]
+        .groupby("Categoria")["Valor_num"]
+        .sum()
+        .reset_index()
+        .sort_values("Valor_num", ascending=False)
+    )
+    if not (total_orcado > 0 or not df_gastos.empty):
+        return None
+
+    top_n = 6
+    measures = ["absolute"]
+    x_data = ["Orçamento Total"]
+    y_data = [total_orcado]
+    text_data = [fmt_real(total_orcado)]
+    saldo_wf = total_orcado
+
+    df_top = df_gastos.head(top_n)
+    outros_val = df_gastos.iloc[top_n:]["Valor_num"].sum() if len(df_gastos) > top_n else 0
+
+    for _, row in df_top.iterrows():
+        measures.append("relative")
+        x_data.append(row["Categoria"])
+        y_data.append(-row["Valor_num"])
+        text_data.append(f"-{fmt_real(row['Valor_num'])}")
+        saldo_wf -= row["Valor_num"]
+
+    if outros_val > 0:
+        measures.append("relative")
+        x_data.append("Outros")
+        y_data.append(-outros_val)
+        text_data.append(f"-{fmt_real(outros_val)}")
+        saldo_wf -= outros_val
+
+    measures.append("total")
+    x_data.append("Saldo Final")
+    y_data.append(0)
+    text_data.append(fmt_real(saldo_wf))
+
+    fig_wf = go.Figure(go.Waterfall(
+        orientation="v", measure=measures, x=x_data,
+        textposition="outside", text=text_data, y=y_data,
+        connector={"line": {"color": "#E5E5EA", "width": 1, "dash": "dot"}},
+        decreasing={"marker": {"color": CORES["alerta"], "line": {"width": 0}}},
+        increasing={"marker": {"color": CORES["realizado"], "line": {"width": 0}}},
+        totals={"marker": {"color": CORES["primaria"], "line": {"width": 0}}},
+        hovertemplate="<b>%{x}</b><br>%{text}<extra></extra>"
+    ))
+    fig_wf.update_layout(height=400, waterfallgap=0.3, **PLOTLY_LAYOUT)
+    return fig_wf
+
+
+def tela_resumo(anos_disponiveis: List[int]):
+    st.markdown(
+        "<h1>Painel Financeiro</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Visão consolidada do seu orçamento</p>",
+        unsafe_allow_html=True,
+    )
+
+    if not anos_disponiveis:
+        st.info("Sem dados. Acesse **Novo** para criar o primeiro lançamento.")
+        return
+
+    fragmento_painel(anos_disponiveis)
+
+
+@st.fragment
+def fragmento_painel(anos_disponiveis: List[int]):
+    """Filtros + KPIs + gráficos: aplicar os filtros reexecuta só este trecho."""
+    default_ano = ano_padrao(anos_disponiveis)
+
+    # Carrega só a partição do ano escolhido; as opções dos filtros vêm dela.
+    ano_corrente = int(st.session_state.get("painel_ano", default_ano))
+    indice = indice_lancamentos((ano_corrente,))
+    df = indice.df
+
+    with st.expander("🔍 Filtros", expanded=False):
+        with st.form("form_filtros_painel"):
+            c1, c2 = st.columns(2)
+            ano_sel = c1.selectbox(
+                "Ano", anos_disponiveis,
+                index=anos_disponiveis.index(default_ano) if default_ano in anos_disponiveis else 0,
+                key="painel_ano",
+            )
+            meses_sel = c2.multiselect("Meses", indice.opcoes("Mês"))
+
+            c3, c4 = st.columns(2)
+            proj_sel = c3.multiselect("Projetos", indice.opcoes("Projeto"))
+            cat_sel = c4.multiselect("Categorias", indice.opcoes("Categoria"))
+
+            shards = nomes_shards()
+            shard_sel = st.multiselect("Unidades (shards)", shards) if len(shards) > 1 else []
+
+            st.form_submit_button("Aplicar", type="primary", use_container_width=True)
+
+    if df.empty:
+        st.info(f"Sem lançamentos em {ano_sel}.")
+        return
+    df_f = indice.filtrar({
+        "Ano": [ano_sel], "Mês": meses_sel, "Projeto": proj_sel, "Categoria": cat_sel, "Shard": shard_sel,
+    })
+
+    # Os contadores do "Mostrar mais" valem para um conjunto de filtros: filtros novos voltam ao topo.
+    chave = hashlib.sha1(repr((ano_sel, meses_sel, proj_sel, cat_sel, shard_sel)).encode("utf-8")).hexdigest()[:12]
 
     df_orc_agg, df_alertas = compute_consumo(df_f)
+    df_orc_agg = projetar_consumo(df_orc_agg)
+    df_alertas = pd.concat([df_alertas, alertas_previsao(df_orc_agg)], ignore_index=True)
 
-    orcado = df_f[df_f["Tipo"] == "Orçado"]["Valor_num"].sum()
-    realizado = df_f[df_f["Tipo"] == "Realizado"]["Valor_num"].sum()
-    saldo = orcado - realizado
-    pct_uso = pct(realizado, orcado)
-    n_proj = df_f["Projeto"].nunique()
+    kpis = kpis_lancamentos(df_f)
+    orcado, realizado, saldo = kpis["Orcado"], kpis["Realizado"], kpis["Saldo"]
+    pct_uso, n_proj = kpis["Uso_%"], kpis["Projetos"]
 
     k1, k2, k3, k4 = st.columns(4)
     k1.metric("💰 Orçado (linhas)", fmt_real(orcado))
@@ -1100,14 +1948,7 @@ def tela_resumo(df: pd.DataFrame):
             .sum().reset_index()
             .sort_values("Orcado_Total", ascending=False)
         )
-        rows_html = "".join(
-            render_progress_row(r["Projeto"], r["Realizado_Total"], r["Orcado_Total"])
-            for _, r in proj_agg.iterrows()
-        )
-        st.markdown(
-            f'<div style="background:#FFFFFF;border:1px solid #F0F0F0;border-radius:14px;padding:6px 20px;box-shadow:0 1px 4px rgba(0,0,0,0.04);margin-bottom:20px;">{rows_html}</div>',
-            unsafe_allow_html=True,
-        )
+        render_lista_progresso(proj_agg, "Projeto", f"painel_proj_n_{chave}")
     else:
         st.info("Sem orçamentos para exibir (cadastre ao menos um 'Orçado').")
 
@@ -1118,91 +1959,158 @@ def tela_resumo(df: pd.DataFrame):
             .sum().reset_index()
             .sort_values("Orcado_Total", ascending=False)
         )
-        rows_html = "".join(
-            render_progress_row(r["Categoria"], r["Realizado_Total"], r["Orcado_Total"])
-            for _, r in cat_agg.iterrows()
-        )
-        st.markdown(
-            f'<div style="background:#FFFFFF;border:1px solid #F0F0F0;border-radius:14px;padding:6px 20px;box-shadow:0 1px 4px rgba(0,0,0,0.04);margin-bottom:20px;">{rows_html}</div>',
-            unsafe_allow_html=True,
-        )
+        render_lista_progresso(cat_agg, "Categoria", f"painel_cat_n_{chave}")
     else:
         st.info("Sem orçamentos para exibir (cadastre ao menos um 'Orçado').")
 
-    render_section_title("Evolução Mensal")
-    df_mes = df_f.groupby(["Mês", "Tipo"])["Valor_num"].sum().reset_index()
-    if not df_mes.empty:
-        df_mes["Mes_Num"] = df_mes["Mês"].apply(mes_num)
-        df_mes = df_mes.sort_values("Mes_Num")
+    filtros = (ano_sel, *(tuple(sorted(f)) for f in (meses_sel, proj_sel, cat_sel, shard_sel)))
 
-        fig_mes = px.bar(
-            df_mes, x="Mês", y="Valor_num", color="Tipo", barmode="group",
-            color_discrete_map={"Orçado": CORES["orcado"], "Realizado": CORES["realizado"]},
-        )
-        fig_mes.update_traces(
-            texttemplate="%{y:.2s}", textposition="outside",
-            marker_line_width=0,
-            hovertemplate="<b>%{x}</b><br>Valor: R$ %{y:,.2f}<extra></extra>"
-        )
-        fig_mes.update_layout(height=360, bargap=0.3, bargroupgap=0.08, **PLOTLY_LAYOUT)
-        st.plotly_chart(fig_mes, use_container_width=True, config=PLOTLY_CONFIG)
+    render_section_title("Evolução Mensal")
+    spec_mes = figura_em_cache("painel_mensal", filtros, lambda: figura_mensal(df_f))
+    if spec_mes is not None:
+        st.plotly_chart(spec_mes, use_container_width=True, config=PLOTLY_CONFIG)
     else:
         st.info("Sem dados mensais para exibir.")
 
     render_section_title("Fluxo de Caixa · Waterfall")
-    total_orcado = df_f[df_f["Tipo"] == "Orçado"]["Valor_num"].sum()
-    df_gastos = (
-        df_f[df_f["Tipo"] == "Realizado"]
-        .groupby("Categoria")["Valor_num"]
-        .sum()
-        .reset_index()
-        .sort_values("Valor_num", ascending=False)
+    spec_wf = figura_em_cache("painel_waterfall", filtros, lambda: figura_waterfall(df_f))
+    if spec_wf is not None:
+        st.plotly_chart(spec_wf, use_container_width=True, config=PLOTLY_CONFIG)
+
+
+def serie_tendencia(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Série mensal contínua (meses sem lançamento = 0) com acumulados e burn móvel de 3 e 12 meses."""
+    piv = rollup.pivot_table(index=["Ano", "Mes_Num"], columns="Tipo", values="Valor_num", aggfunc="sum", fill_value=0.0)
+    piv = piv.reindex(columns=["Orçado", "Realizado"], fill_value=0.0)
+    periodo = piv.index.get_level_values("Ano") * 12 + piv.index.get_level_values("Mes_Num") - 1
+    todos = np.arange(periodo.min(), periodo.max() + 1)
+    piv = piv.set_axis(periodo, axis=0).reindex(todos, fill_value=0.0)
+
+    serie = pd.DataFrame({
+        "Ano": todos // 12,
+        "Mes_Num": todos % 12 + 1,
+        "Orçado": piv["Orçado"].to_numpy(),
+        "Realizado": piv["Realizado"].to_numpy(),
+    })
+    serie["Período"] = serie["Mes_Num"].astype(str).str.zfill(2) + "/" + serie["Ano"].astype(str)
+    serie["Orçado_Acum"] = serie["Orçado"].cumsum()
+    serie["Realizado_Acum"] = serie["Realizado"].cumsum()
+    serie["Burn_3m"] = serie["Realizado"].rolling(3, min_periods=1).mean()
+    serie["Burn_12m"] = serie["Realizado"].rolling(12, min_periods=1).mean()
+    return serie
+
+
+def _figura_linhas(serie: pd.DataFrame, linhas: List[Tuple[str, str, str]]) -> "go.Figure":
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for col, nome, cor in linhas:
+        fig.add_trace(go.Scatter(
+            x=serie["Período"], y=serie[col], name=nome, mode="lines",
+            line={"color": cor, "width": 2},
+            hovertemplate="<b>%{x}</b><br>" + nome + ": R$ %{y:,.2f}<extra></extra>",
+        ))
+    fig.update_layout(height=360, **PLOTLY_LAYOUT)
+    return fig
+
+
+def figura_acumulado(serie: pd.DataFrame) -> "go.Figure":
+    return _figura_linhas(serie, [
+        ("Orçado_Acum", "Orçado acumulado", CORES["orcado"]),
+        ("Realizado_Acum", "Realizado acumulado", CORES["realizado"]),
+    ])
+
+
+def figura_burn(serie: pd.DataFrame) -> "go.Figure":
+    return _figura_linhas(serie, [
+        ("Burn_3m", "Média móvel 3 meses", CORES["aviso"]),
+        ("Burn_12m", "Média móvel 12 meses", CORES["primaria"]),
+    ])
+
+
+def figura_yoy(serie: pd.DataFrame) -> "go.Figure":
+    import plotly.graph_objects as go
+
+    por_ano = serie.pivot(index="Mes_Num", columns="Ano", values="Realizado").reindex(range(1, 13))
+    meses = [MESES_PT[m][:3].title() for m in por_ano.index]
+    fig = go.Figure([
+        go.Bar(x=meses, y=por_ano[ano], name=str(ano), marker_line_width=0,
+               hovertemplate="<b>%{x} " + str(ano) + "</b><br>Realizado: R$ %{y:,.2f}<extra></extra>")
+        for ano in por_ano.columns
+    ])
+    fig.update_layout(height=360, barmode="group", bargap=0.25, **PLOTLY_LAYOUT)
+    return fig
+
+
+def tela_tendencias():
+    st.markdown(
+        "<h1>Tendências</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Evolução plurianual, acumulados e comparação ano a ano</p>",
+        unsafe_allow_html=True,
     )
+    fragmento_tendencias()
 
-    if total_orcado > 0 or not df_gastos.empty:
-        top_n = 6
-        measures = ["absolute"]
-        x_data = ["Orçamento Total"]
-        y_data = [total_orcado]
-        text_data = [fmt_real(total_orcado)]
-        saldo_wf = total_orcado
-
-        df_top = df_gastos.head(top_n)
-        outros_val = df_gastos.iloc[top_n:]["Valor_num"].sum() if len(df_gastos) > top_n else 0
-
-        for _, row in df_top.iterrows():
-            measures.append("relative")
-            x_data.append(row["Categoria"])
-            y_data.append(-row["Valor_num"])
-            text_data.append(f"-{fmt_real(row['Valor_num'])}")
-            saldo_wf -= row["Valor_num"]
-
-        if outros_val > 0:
-            measures.append("relative")
-            x_data.append("Outros")
-            y_data.append(-outros_val)
-            text_data.append(f"-{fmt_real(outros_val)}")
-            saldo_wf -= outros_val
-
-        measures.append("total")
-        x_data.append("Saldo Final")
-        y_data.append(0)
-        text_data.append(fmt_real(saldo_wf))
-
-        fig_wf = go.Figure(go.Waterfall(
-            orientation="v", measure=measures, x=x_data,
-            textposition="outside", text=text_data, y=y_data,
-            connector={"line": {"color": "#E5E5EA", "width": 1, "dash": "dot"}},
-            decreasing={"marker": {"color": CORES["alerta"], "line": {"width": 0}}},
-            increasing={"marker": {"color": CORES["realizado"], "line": {"width": 0}}},
-            totals={"marker": {"color": CORES["primaria"], "line": {"width": 0}}},
-            hovertemplate="<b>%{x}</b><br>%{text}<extra></extra>"
-        ))
-        fig_wf.update_layout(height=400, waterfallgap=0.3, **PLOTLY_LAYOUT)
-        st.plotly_chart(fig_wf, use_container_width=True, config=PLOTLY_CONFIG)
 
+@st.fragment
+def fragmento_tendencias():
+    """Lê só o rollup mensal (razao_mensal), nunca as linhas de lançamentos."""
+    rollup = rollup_mensal(versao_planilha(), versao_dados())
+    if rollup.empty:
+        st.info("Sem dados. Acesse **Novo** para criar o primeiro lançamento.")
+        return
+
+    with st.expander("🔍 Filtros", expanded=False):
+        with st.form("form_filtros_tendencias"):
+            c1, c2 = st.columns(2)
+            proj_sel = c1.multiselect("Projetos", sorted(rollup["Projeto"].unique()))
+            cat_sel = c2.multiselect("Categorias", sorted(rollup["Categoria"].unique()))
+            st.form_submit_button("Aplicar", type="primary", use_container_width=True)
+
+    r = rollup
+    if proj_sel:
+        r = r[r["Projeto"].isin(proj_sel)]
+    if cat_sel:
+        r = r[r["Categoria"].isin(cat_sel)]
+    if r.empty:
+        st.info("Nada encontrado para os filtros selecionados.")
+        return
 
-def tela_novo(df_lanc: pd.DataFrame, df_cad: pd.DataFrame):
+    serie = serie_tendencia(r)
+    filtros = (tuple(sorted(proj_sel)), tuple(sorted(cat_sel)))
+
+    ultimo = serie.iloc[-1]
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("💰 Orçado acumulado", fmt_real(ultimo["Orçado_Acum"]))
+    k2.metric("✅ Realizado acumulado", fmt_real(ultimo["Realizado_Acum"]),
+              delta=f"{pct(ultimo['Realizado_Acum'], ultimo['Orçado_Acum']):.1f}% do orçado", delta_color="off")
+    k3.metric("🔥 Burn 3 meses", fmt_real(ultimo["Burn_3m"]))
+    k4.metric("📆 Burn 12 meses", fmt_real(ultimo["Burn_12m"]))
+
+    render_section_title("Orçado x Realizado · Acumulado")
+    st.plotly_chart(figura_em_cache("tendencia_acumulado", filtros, lambda: figura_acumulado(serie)),
+                    use_container_width=True, config=PLOTLY_CONFIG)
+
+    render_section_title("Burn Mensal · Médias Móveis")
+    st.plotly_chart(figura_em_cache("tendencia_burn", filtros, lambda: figura_burn(serie)),
+                    use_container_width=True, config=PLOTLY_CONFIG)
+
+    render_section_title("Comparação Ano a Ano · Realizado")
+    st.plotly_chart(figura_em_cache("tendencia_yoy", filtros, lambda: figura_yoy(serie)),
+                    use_container_width=True, config=PLOTLY_CONFIG)
+
+    anual = serie.groupby("Ano")[["Orçado", "Realizado"]].sum()
+    anual["Var. Realizado (%)"] = anual["Realizado"].pct_change().mul(100).replace([np.inf, -np.inf], np.nan)
+    st.dataframe(
+        anual.reset_index(), use_container_width=True, hide_index=True,
+        column_config={
+            "Ano": st.column_config.NumberColumn("Ano", format="%d"),
+            "Orçado": st.column_config.NumberColumn("Orçado", format="R$ %.2f"),
+            "Realizado": st.column_config.NumberColumn("Realizado", format="R$ %.2f"),
+            "Var. Realizado (%)": st.column_config.NumberColumn("Var. Realizado (%)", format="%.1f%%"),
+        },
+    )
+
+
+def tela_novo(anos: Tuple[int, ...], df_cad: pd.DataFrame):
     st.markdown(
         "<h1>Novo Lançamento</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Registre orçamentos e despesas realizadas</p>",
         unsafe_allow_html=True,
@@ -1212,10 +2120,10 @@ def tela_novo(df_lanc: pd.DataFrame, df_cad: pd.DataFrame):
         st.warning("Nenhum Projeto ou Categoria cadastrado. Acesse **Cadastros** primeiro.")
         lista_proj, lista_cat = [], []
     else:
-        lista_proj = sorted(df_cad[df_cad["Tipo"].str.lower() == "projeto"]["Nome"].unique().tolist())
-        lista_cat = sorted(df_cad[df_cad["Tipo"].str.lower() == "categoria"]["Nome"].unique().tolist())
+        catalogo = catalogo_cadastros()
+        lista_proj, lista_cat = catalogo["projeto"], catalogo["categoria"]
 
-    df_orc_agg = build_orcamentos_table(df_lanc) if not df_lanc.empty else pd.DataFrame()
+    candidatos = indice_candidatos(anos)
 
     with st.form("form_novo", clear_on_submit=True):
         render_section_title("Dados Principais")
@@ -1228,12 +2136,8 @@ def tela_novo(df_lanc: pd.DataFrame, df_cad: pd.DataFrame):
         cat_sel = c4.selectbox("📂 Categoria", lista_cat, index=None, placeholder="Selecione...")
 
         orc_vinc = ""
-        if tipo == "Realizado" and proj_sel and cat_sel and not df_orc_agg.empty:
-            mes0 = mes_str_from_date(data_inicial)
-            ano0 = data_inicial.year
-            cand = df_orc_agg[(df_orc_agg["Projeto"] == proj_sel) & (df_orc_agg["Categoria"] == cat_sel)].copy()
-            cand["prio"] = np.where((cand["Ano"] == ano0) & (cand["Mês"] == mes0), 0, 1)
-            cand = cand.sort_values(["prio", "Ano", "Mes_Num", "Orcado_Total"], ascending=[True, False, False, False]).head(30)
+        if tipo == "Realizado" and proj_sel and cat_sel and not candidatos.tabela.empty:
+            cand = candidatos.candidatos(proj_sel, cat_sel, data_inicial.year, mes_str_from_date(data_inicial))
 
             options = ["(Sem vínculo — automático por grupo)"]
             label_to_id = {"(Sem vínculo — automático por grupo)": ""}
@@ -1306,188 +2210,565 @@ def tela_novo(df_lanc: pd.DataFrame, df_cad: pd.DataFrame):
                         st.rerun()
 
 
-def tela_dados(df: pd.DataFrame):
+def tela_importar(df_cad: pd.DataFrame):
+    st.markdown(
+        "<h1>Importar Lançamentos</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Carregue um CSV ou XLSX com vários lançamentos de uma vez</p>",
+        unsafe_allow_html=True,
+    )
+    if df_cad.empty:
+        st.warning("Nenhum Projeto ou Categoria cadastrado. Acesse **Cadastros** primeiro.")
+        return
+
+    st.caption(
+        f"Colunas: **{', '.join(COLS_IMPORTACAO_OBRIG)}** (obrigatórias) e "
+        f"{', '.join(c for c in COLS_IMPORTACAO if c not in COLS_IMPORTACAO_OBRIG)} (opcionais). "
+        "Data em dd/mm/aaaa; Valor é o valor de cada parcela; Parcelas vazio = 1."
+    )
+    tipos = ["csv"] + (["xlsx"] if "XLSX" in formatos_exportacao() else [])
+    arquivo = st.file_uploader("📄 Arquivo", type=tipos)
+
+    c1, c2 = st.columns(2)
+    simular = c1.button("🔎 Validar (sem gravar)", disabled=arquivo is None, use_container_width=True)
+    importar = c2.button("📥 Importar", type="primary", disabled=arquivo is None, use_container_width=True)
+
+    if arquivo is not None and (simular or importar):
+        andamento = st.empty()
+
+        def _progresso(r):
+            andamento.caption(f"{r['lidas']} linha(s) lida(s) · {r['aceitas']} válida(s)")
+
+        try:
+            with st.spinner("Validando..." if simular else "Importando..."):
+                arquivo.seek(0)
+                r = importar_lancamentos(arquivo, arquivo.name, simular=simular, progresso=_progresso)
+        except Exception as e:
+            st.error(f"Erro na importação: {e}")
+            return
+        st.session_state.importacao = dict(r, simulada=simular, arquivo=arquivo.name)
+        if not simular and r["lancamentos"]:
+            st.toast(f"{r['lancamentos']} lançamento(s) registrado(s)!", icon="✅")
+
+    r = st.session_state.get("importacao")
+    if not r:
+        return
+
+    render_section_title(f"{'Simulação' if r['simulada'] else 'Importação'} · {r['arquivo']}")
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Linhas lidas", r["lidas"])
+    k2.metric("Válidas", r["aceitas"])
+    k3.metric("Lançamentos (parcelas)", r["lancamentos"])
+    k4.metric("Valor total", fmt_real(r["valor"]))
+
+    rejeitadas = r["rejeitadas"]
+    if rejeitadas.empty:
+        st.success("Nenhuma linha rejeitada.")
+        return
+    st.warning(f"{len(rejeitadas)} linha(s) rejeitada(s){'' if r['simulada'] else ' — não foram gravadas'}.")
+    st.dataframe(rejeitadas, use_container_width=True, hide_index=True)
+    st.download_button(
+        "⬇️ Baixar rejeitadas (CSV)",
+        data=rejeitadas.to_csv(index=False).encode("utf-8"),
+        file_name="importacao_rejeitadas.csv",
+        mime="text/csv",
+        use_container_width=True,
+    )
+
+
+def tela_planejamento(anos_disponiveis: List[int], df_cad: pd.DataFrame):
+    st.markdown(
+        "<h1>Planejamento Anual</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Monte o orçado do ano numa grade Projeto × Categoria × mês</p>",
+        unsafe_allow_html=True,
+    )
+    if df_cad.empty:
+        st.warning("Nenhum Projeto ou Categoria cadastrado. Acesse **Cadastros** primeiro.")
+        return
+    fragmento_planejamento(anos_disponiveis)
+
+
+@st.fragment
+def fragmento_planejamento(anos_disponiveis: List[int]):
+    """A grade só gera linhas no clique: um registro no journal por shard e uma invalidação de cache."""
+    catalogo = catalogo_cadastros()
+    rollup = rollup_mensal(versao_planilha(), versao_dados())
+    orcado = rollup[rollup["Tipo"] == "Orçado"]
+    ano_atual = date.today().year
+
+    with st.container(border=True):
+        c1, c2 = st.columns([1, 2])
+        anos = sorted(set(anos_disponiveis) | {ano_atual, ano_atual + 1}, reverse=True)
+        ano = c1.selectbox("📅 Ano planejado", anos, index=anos.index(ano_atual + 1))
+        bases = sorted(orcado["Ano"].unique().tolist(), reverse=True)
+        base = c2.selectbox(
+            "Valores iniciais", [None, *bases],
+            format_func=lambda a: "Em branco" if a is None else f"Copiar orçado de {a}",
+        )
+        c3, c4 = st.columns(2)
+        proj_sel = c3.multiselect("🏢 Projetos", catalogo["projeto"])
+        cat_sel = c4.multiselect("📂 Categorias", catalogo["categoria"])
+
+    meses = list(MESES_CURTOS.values())
+    grade = pd.DataFrame(
+        [(p, c) for p in proj_sel for c in cat_sel], columns=["Projeto", "Categoria"]
+    )
+    if base is not None and not grade.empty:
+        valores = (
+            orcado[orcado["Ano"] == base]
+            .pivot_table(index=["Projeto", "Categoria"], columns="Mes_Num", values="Valor_num", aggfunc="sum")
+            .rename(columns=MESES_CURTOS)
+            .reset_index()
+        )
+        grade = grade.merge(valores, on=["Projeto", "Categoria"], how="left")
+    grade = grade.reindex(columns=["Projeto", "Categoria", *meses]).fillna({m: 0.0 for m in meses})
+
+    chave = hashlib.sha1(repr((ano, base, proj_sel, cat_sel)).encode("utf-8")).hexdigest()[:12]
+    editada = st.data_editor(
+        grade,
+        key=f"plano_{chave}",
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Projeto": st.column_config.SelectboxColumn("Projeto", options=catalogo["projeto"], required=True),
+            "Categoria": st.column_config.SelectboxColumn("Categoria", options=catalogo["categoria"], required=True),
+            **{m: st.column_config.NumberColumn(m, min_value=0.0, step=100.0, format="R$ %.2f") for m in meses},
+        },
+    )
+
+    valores = editada[meses].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    celulas = int((valores > 0).sum().sum())
+    total = float(valores.sum().sum())
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Linhas da grade", len(editada))
+    k2.metric("Orçados a gerar", celulas)
+    k3.metric("Total planejado", fmt_real(total))
+
+    pares = editada[["Projeto", "Categoria"]].dropna()
+    if pares.duplicated().any():
+        st.warning("Há combinações Projeto × Categoria repetidas na grade; cada uma gera seus próprios orçados.")
+    existente = orcado[orcado["Ano"] == ano].merge(pares.drop_duplicates(), on=["Projeto", "Categoria"])
+    if not existente.empty:
+        st.info(f"Já existe orçado de **{fmt_real(existente['Valor_num'].sum())}** em {ano} para essas combinações; "
+                "o planejamento será somado a ele.")
+
+    descricao = st.text_input("📝 Descrição", value=f"Planejamento {ano}")
+    if st.button("💾 Gerar orçados", type="primary", disabled=celulas == 0, use_container_width=True):
+        linhas = linhas_planejamento(editada, ano, descricao)
+        with st.spinner("Salvando planejamento..."):
+            # Até 12 linhas por linha da grade: um único append por shard, sem o fatiamento da importação.
+            if salvar_lancamentos(linhas, lote_unico=True):
+                st.toast(f"{len(linhas)} orçado(s) de {ano} registrado(s)!", icon="✅")
+                st.rerun()
+
+
+def botao_exportar(df: pd.DataFrame, nome: str, rotulo: str, filtros: Tuple, chave: str):
+    """Formato + botão de download; o arquivo só é gerado quando o usuário clica."""
+    formatos = formatos_exportacao()
+    c1, c2 = st.columns([1, 3])
+    formato = c1.selectbox("Formato", formatos, key=f"{chave}_formato", label_visibility="collapsed")
+    ext, mime, _ = FORMATOS_EXPORTACAO[formato]
+    assinatura = (nome, versao_planilha(), versao_dados(), filtros)
+    c2.download_button(
+        f"⬇️ {rotulo} ({formato})",
+        data=lambda: gerar_exportacao(df, formato, assinatura),
+        file_name=f"{nome}.{ext}",
+        mime=mime,
+        on_click="ignore",
+        key=f"{chave}_baixar",
+        use_container_width=True,
+    )
+
+
+COLS_EDITAVEIS = ["Data", "Tipo", "Projeto", "Categoria", "Valor", "Descrição", "Envolvidos", "Info Gerais"]
+
+
+def diff_edicoes(original: pd.DataFrame, editado: pd.DataFrame) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+    """Células alteradas no editor, por Lanc_ID e já no formato da planilha, e os erros de validação.
+
+    `original` são as linhas limpas exibidas; `editado` é a saída do data_editor (mesmo índice).
+    Linhas marcadas para exclusão são ignoradas; linhas cujo Lanc_ID ainda não está
+    gravado na planilha (gerado na leitura) não podem ser editadas.
+    """
+    orig = original.drop(columns="Valor").rename(columns={"Valor_num": "Valor"})
+    provisorio = lanc_id_provisorio(orig)
+    ed = editado[COLS_EDITAVEIS]
+    mudou = pd.DataFrame({
+        c: ~np.isclose(pd.to_numeric(ed[c], errors="coerce").fillna(-1.0), orig[c]) if c == "Valor"
+        else ed[c].fillna("").astype(str).str.strip() != orig[c].astype(str)
+        for c in COLS_EDITAVEIS
+    }, index=ed.index)
+    linhas = mudou.index[mudou.any(axis=1) & ~editado["Excluir"].astype(bool)]
+    if linhas.empty:
+        return {}, []
+
+    # Só a Data editada é validada: a já gravada pode estar fora do dd/mm/aaaa estrito e não bloqueia outras edições.
+    data = pd.to_datetime(ed.loc[linhas[mudou.loc[linhas, "Data"]], "Data"], format="%d/%m/%Y", errors="coerce")
+    valor = pd.to_numeric(ed.loc[linhas, "Valor"], errors="coerce")
+    varios_shards = len(nomes_shards()) > 1
+
+    campos_por_id, erros = {}, []
+    for i in linhas:
+        rotulo = f"{orig.at[i, 'Data']} · {orig.at[i, 'Projeto']} / {orig.at[i, 'Categoria']}"
+        novo = {
+            c: "" if pd.isna(ed.at[i, c]) else str(ed.at[i, c]).strip()
+            for c in COLS_EDITAVEIS if c != "Valor" and mudou.at[i, c]
+        }
+        if provisorio[i]:
+            erros.append(f"{rotulo}: lançamento sem Lanc_ID na planilha (rode `python AppOrc.py migrar` antes de editar).")
+            continue
+        if "Data" in novo and (pd.isna(data[i]) or data[i].year != int(orig.at[i, "Ano"])):
+            erros.append(f"{rotulo}: Data deve ser dd/mm/aaaa dentro de {orig.at[i, 'Ano']} (para mudar o ano, exclua e recrie).")
+            continue
+        if novo.get("Tipo", "Orçado") not in ("Orçado", "Realizado") or "" in (novo.get("Projeto", "x"), novo.get("Categoria", "x")):
+            erros.append(f"{rotulo}: Tipo, Projeto e Categoria são obrigatórios.")
+            continue
+        if varios_shards and "Projeto" in novo and shard_do_projeto(novo["Projeto"]) != orig.at[i, "Shard"]:
+            erros.append(f"{rotulo}: o projeto {novo['Projeto']} fica em outra unidade (exclua e recrie).")
+            continue
+        if mudou.at[i, "Valor"]:
+            if pd.isna(valor[i]) or valor[i] <= 0:
+                erros.append(f"{rotulo}: Valor deve ser maior que zero.")
+                continue
+            novo["Valor"] = fmt_real(valor[i])
+        if "Data" in novo:
+            novo["Mês"] = mes_str_from_date(data[i])
+        campos_por_id[orig.at[i, "Lanc_ID"]] = novo
+    return campos_por_id, erros
+
+
+def tela_dados(anos_disp: List[int]):
     st.markdown(
         "<h1>Base de Dados</h1><p style='color:#8E8E93; margin-top:-8px; margin-bottom:20px;'>Visualize, filtre e gerencie todos os lançamentos</p>",
         unsafe_allow_html=True,
     )
 
-    if df.empty:
+    if not anos_disp:
         st.info("A planilha está vazia.")
         return
 
-    tabs = st.tabs(["📄 Lançamentos (linhas)", "📦 Orçamentos (agregado)"])
+    tabs = st.tabs(["📄 Lançamentos (linhas)", "📦 Orçamentos (agregado)", "👥 Rateio por centro de custo"])
 
     # TAB 1: LANÇAMENTOS
     with tabs[0]:
-        with st.form("form_filtros_dados"):
-            render_section_title("Filtros de Pesquisa")
-            c1, c2 = st.columns(2)
-            anos_disp = sorted(df["Ano"].unique(), reverse=True)
-            ano_atual = date.today().year
-            default_ano = [ano_atual] if ano_atual in anos_disp else ([anos_disp[0]] if anos_disp else [])
-            filtro_ano = c1.multiselect("📅 Ano (obrigatório)", anos_disp, default=default_ano)
-
-            meses_disp = sorted(df["Mês"].unique(), key=mes_num)
-            filtro_mes = c2.multiselect("🗓️ Mês", meses_disp)
-
-            c3, c4, c5 = st.columns(3)
-            filtro_proj = c3.multiselect("🏢 Projeto", sorted(df["Projeto"].unique()))
-            filtro_tipo = c4.multiselect("🏷️ Tipo", sorted(df["Tipo"].unique()))
-            filtro_cat = c5.multiselect("📂 Categoria", sorted(df["Categoria"].unique()))
-            st.form_submit_button("Aplicar Filtros", type="primary", use_container_width=True)
-
-        if not filtro_ano:
-            st.warning("Selecione pelo menos um **Ano** para visualizar os dados.")
-            return
+        fragmento_dados_lancamentos(anos_disp)
+
+    # TAB 2: ORÇAMENTOS AGREGADOS
+    with tabs[1]:
+        fragmento_dados_orcamentos(anos_disp)
 
-        df_view = df[df["Ano"].isin(filtro_ano)].copy()
-        if filtro_mes:
-            df_view = df_view[df_view["Mês"].isin(filtro_mes)]
-        if filtro_proj:
-            df_view = df_view[df_view["Projeto"].isin(filtro_proj)]
-        if filtro_tipo:
-            df_view = df_view[df_view["Tipo"].isin(filtro_tipo)]
-        if filtro_cat:
-            df_view = df_view[df_view["Categoria"].isin(filtro_cat)]
-
-        tot_orc = df_view[df_view["Tipo"] == "Orçado"]["Valor_num"].sum()
-        tot_real = df_view[df_view["Tipo"] == "Realizado"]["Valor_num"].sum()
-
-        m1, m2, m3, m4 = st.columns(4)
-        m1.metric("📋 Registros", len(df_view))
-        m2.metric("💰 Total Orçado", fmt_real(tot_orc))
-        m3.metric("✅ Total Realizado", fmt_real(tot_real))
-        m4.metric("📊 Saldo", fmt_real(tot_orc - tot_real),
-                  delta_color="normal" if tot_orc >= tot_real else "inverse")
+    # TAB 3: RATEIO DO REALIZADO PELAS HORAS DOS ENVOLVIDOS
+    with tabs[2]:
+        fragmento_dados_rateio(anos_disp)
 
-        st.markdown("<hr>", unsafe_allow_html=True)
 
-        cols_export = ["Data", "Ano", "Mês", "Tipo", "Projeto", "Categoria", "Valor_num",
-                       "Descrição", "Parcela", "Envolvidos", "Info Gerais",
-                       "Lanc_ID", "Grupo_ID", "Orcado_Vinculo", "Criado_Em"]
-        cols_export = [c for c in cols_export if c in df_view.columns]
-        csv = df_view[cols_export].rename(columns={"Valor_num": "Valor"})
-        st.download_button(
-            "⬇️ Baixar CSV (filtro atual)",
-            data=csv.to_csv(index=False).encode("utf-8"),
-            file_name="lancamentos_filtrados.csv",
-            mime="text/csv",
-            use_container_width=True,
+@st.fragment
+def fragmento_dados_lancamentos(anos_disp: List[int]):
+    """Filtros + tabela paginada: filtrar, paginar, editar células e marcar exclusões reexecuta só este trecho."""
+    anos_carga = tuple(st.session_state.get("dados_anos", [ano_padrao(anos_disp)]))
+    indice = indice_lancamentos(anos_carga)
+    df = indice.df
+
+    with st.form("form_filtros_dados"):
+        render_section_title("Filtros de Pesquisa")
+        c1, c2 = st.columns(2)
+        filtro_ano = c1.multiselect(
+            "📅 Ano (obrigatório)", anos_disp, default=[ano_padrao(anos_disp)], key="dados_anos"
         )
 
-        st.markdown("<div style='height:10px;'></div>", unsafe_allow_html=True)
-
-        tamanho_pagina = 50
-        total_paginas = max(1, math.ceil(len(df_view) / tamanho_pagina))
-        if total_paginas > 1:
-            col_p, col_info = st.columns([1, 3])
-            pagina_atual = col_p.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
-            col_info.markdown(
-                f"<p style='color:#8E8E93; font-size:13px; margin-top:32px;'>"
-                f"Página {pagina_atual} de {total_paginas} · {len(df_view)} registros</p>",
-                unsafe_allow_html=True,
-            )
-        else:
-            pagina_atual = 1
-
-        inicio = (pagina_atual - 1) * tamanho_pagina
-        fim = inicio + tamanho_pagina
-        df_paginado = df_view.iloc[inicio:fim].copy()
-        df_paginado["Excluir"] = False
-
-        colunas_show = ["Data", "Mês", "Tipo", "Projeto", "Categoria", "Valor_num",
-                        "Descrição", "Envolvidos", "Info Gerais", "Parcela", "Excluir"]
-        df_show = df_paginado[colunas_show].rename(columns={"Valor_num": "Valor"})
-
-        df_edited = st.data_editor(
-            df_show,
-            column_config={
-                "Excluir": st.column_config.CheckboxColumn("🗑️", width="small", default=False),
-                "Valor": st.column_config.NumberColumn("Valor (R$)", format="R$ %.2f"),
-            },
-            disabled=["Data", "Mês", "Tipo", "Projeto", "Categoria", "Valor", "Descrição", "Envolvidos", "Info Gerais", "Parcela"],
-            hide_index=True,
-            use_container_width=True,
-            key=f"editor_lanc_{pagina_atual}",
+        filtro_mes = c2.multiselect("🗓️ Mês", indice.opcoes("Mês"))
+
+        c3, c4, c5 = st.columns(3)
+        filtro_proj = c3.multiselect("🏢 Projeto", indice.opcoes("Projeto"))
+        filtro_tipo = c4.multiselect("🏷️ Tipo", indice.opcoes("Tipo"))
+        filtro_cat = c5.multiselect("📂 Categoria", indice.opcoes("Categoria"))
+
+        shards = nomes_shards()
+        filtro_shard = st.multiselect("🗄️ Unidade (shard)", shards) if len(shards) > 1 else []
+        busca = st.text_input(
+            "🔎 Buscar em Descrição, Envolvidos, Observações e Parcela",
+            placeholder="Ex: fornecedor x  (sem acento/maiúscula; aceita início de palavra)",
+        ).strip()
+        st.form_submit_button("Aplicar Filtros", type="primary", use_container_width=True)
+
+    if not filtro_ano:
+        st.warning("Selecione pelo menos um **Ano** para visualizar os dados.")
+        return
+
+    filtros_dim = {
+        "Ano": filtro_ano, "Mês": filtro_mes, "Projeto": filtro_proj,
+        "Tipo": filtro_tipo, "Categoria": filtro_cat, "Shard": filtro_shard,
+    }
+    if busca:
+        posicoes = np.intersect1d(
+            indice.posicoes(filtros_dim), indice_texto_lancamentos(anos_carga, indice).buscar(busca), assume_unique=True
         )
+        df_view = df.take(posicoes)
+    else:
+        df_view = indice.filtrar(filtros_dim)
 
-        linhas_excluir = df_edited[df_edited["Excluir"] == True]
-        if not linhas_excluir.empty:
-            st.error(f"⚠️ **{len(linhas_excluir)} registro(s)** marcado(s) para exclusão. Esta ação não pode ser desfeita.")
-            if st.button("🗑️ Confirmar Exclusão", type="primary", use_container_width=True):
-                ids = df_paginado.loc[linhas_excluir.index, "Lanc_ID"].tolist()
-                with st.spinner("Excluindo registros..."):
-                    if excluir_linhas_por_lanc_id(ids):
-                        st.success("Registros excluídos com sucesso!")
-                        st.rerun()
+    tot_orc = df_view[df_view["Tipo"] == "Orçado"]["Valor_num"].sum()
+    tot_real = df_view[df_view["Tipo"] == "Realizado"]["Valor_num"].sum()
 
-    # TAB 2: ORÇAMENTOS AGREGADOS
-    with tabs[1]:
-        df_orc_agg, df_alertas = compute_consumo(df)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("📋 Registros", len(df_view))
+    m2.metric("💰 Total Orçado", fmt_real(tot_orc))
+    m3.metric("✅ Total Realizado", fmt_real(tot_real))
+    m4.metric("📊 Saldo", fmt_real(tot_orc - tot_real),
+              delta_color="normal" if tot_orc >= tot_real else "inverse")
 
-        if df_orc_agg.empty:
-            st.info("Sem orçamentos cadastrados (tipo 'Orçado').")
-            return
+    st.markdown("<hr>", unsafe_allow_html=True)
 
-        with st.form("form_filtros_orc"):
-            render_section_title("Filtros (Orçamentos)")
-            c1, c2, c3 = st.columns(3)
-            anos = sorted(df_orc_agg["Ano"].unique(), reverse=True)
-            ano_sel = c1.multiselect("Ano", anos, default=[date.today().year] if date.today().year in anos else [anos[0]])
-            meses = sorted(df_orc_agg["Mês"].unique(), key=mes_num)
-            mes_sel = c2.multiselect("Mês", meses)
-            proj_sel = c3.multiselect("Projeto", sorted(df_orc_agg["Projeto"].unique()))
+    cols_export = ["Data", "Ano", "Mês", "Tipo", "Projeto", "Categoria", "Valor_num",
+                   "Descrição", "Parcela", "Envolvidos", "Info Gerais",
+                   "Lanc_ID", "Grupo_ID", "Orcado_Vinculo", "Criado_Em"]
+    cols_export = [c for c in cols_export if c in df_view.columns]
+    filtros = tuple(tuple(sorted(f)) for f in (filtro_ano, filtro_mes, filtro_proj, filtro_tipo, filtro_cat, filtro_shard))
+    filtros += (busca,)
+    botao_exportar(
+        df_view[cols_export].rename(columns={"Valor_num": "Valor"}),
+        "lancamentos_filtrados", "Baixar lançamentos (filtro atual)", filtros, "exp_lanc",
+    )
 
-            c4, c5 = st.columns(2)
-            cat_sel = c4.multiselect("Categoria", sorted(df_orc_agg["Categoria"].unique()))
-            status_sel = c5.multiselect("Status", sorted(df_orc_agg["Status"].unique()))
+    st.markdown("<div style='height:10px;'></div>", unsafe_allow_html=True)
 
-            st.form_submit_button("Aplicar", type="primary", use_container_width=True)
+    tamanho_pagina = 50
+    total_paginas = max(1, math.ceil(len(df_view) / tamanho_pagina))
+    if total_paginas > 1:
+        col_p, col_info = st.columns([1, 3])
+        pagina_atual = col_p.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+        col_info.markdown(
+            f"<p style='color:#8E8E93; font-size:13px; margin-top:32px;'>"
+            f"Página {pagina_atual} de {total_paginas} · {len(df_view)} registros</p>",
+            unsafe_allow_html=True,
+        )
+    else:
+        pagina_atual = 1
+
+    inicio = (pagina_atual - 1) * tamanho_pagina
+    fim = inicio + tamanho_pagina
+    df_paginado = df_view.iloc[inicio:fim].copy()
+    df_paginado["Excluir"] = False
+
+    colunas_show = ["Data", "Mês", "Tipo", "Projeto", "Categoria", "Valor_num",
+                    "Descrição", "Envolvidos", "Info Gerais", "Parcela", "Excluir"]
+    df_show = df_paginado[colunas_show].rename(columns={"Valor_num": "Valor"})
+
+    catalogo = catalogo_cadastros()
+    chave_editor = f"editor_lanc_{pagina_atual}"
+    df_edited = st.data_editor(
+        df_show,
+        column_config={
+            "Excluir": st.column_config.CheckboxColumn("🗑️", width="small", default=False),
+            "Valor": st.column_config.NumberColumn("Valor (R$)", format="R$ %.2f", min_value=0.01),
+            "Data": st.column_config.TextColumn("Data", validate=r"^\d{2}/\d{2}/\d{4}$"),
+            "Tipo": st.column_config.SelectboxColumn("Tipo", options=["Orçado", "Realizado"], required=True),
+            "Projeto": st.column_config.SelectboxColumn(
+                "Projeto", options=sorted(set(catalogo["projeto"]) | set(df_show["Projeto"])), required=True
+            ),
+            "Categoria": st.column_config.SelectboxColumn(
+                "Categoria", options=sorted(set(catalogo["categoria"]) | set(df_show["Categoria"])), required=True
+            ),
+        },
+        disabled=["Mês", "Parcela"],
+        hide_index=True,
+        use_container_width=True,
+        key=chave_editor,
+    )
+
+    campos_por_id, erros = diff_edicoes(df_paginado, df_edited)
+    for erro in erros:
+        st.error(erro)
+    if campos_por_id:
+        n_celulas = sum(len(c) for c in campos_por_id.values())
+        st.info(f"✏️ **{len(campos_por_id)} registro(s)** alterado(s) ({n_celulas} célula(s)).")
+        if st.button("💾 Salvar alterações", type="primary", disabled=bool(erros), use_container_width=True):
+            with st.spinner("Salvando alterações..."):
+                if editar_lancamentos(df_paginado, campos_por_id):
+                    st.session_state.pop(chave_editor, None)
+                    st.toast(f"{len(campos_por_id)} registro(s) atualizado(s)!", icon="✅")
+                    st.rerun()
+
+    linhas_excluir = df_edited[df_edited["Excluir"] == True]
+    if not linhas_excluir.empty:
+        confirmar_exclusao(df_paginado.loc[linhas_excluir.index], "marcado(s) para exclusão", "excl_marcados")
 
-        view = df_orc_agg.copy()
-        if ano_sel:
-            view = view[view["Ano"].isin(ano_sel)]
-        if mes_sel:
-            view = view[view["Mês"].isin(mes_sel)]
-        if proj_sel:
-            view = view[view["Projeto"].isin(proj_sel)]
-        if cat_sel:
-            view = view[view["Categoria"].isin(cat_sel)]
-        if status_sel:
-            view = view[view["Status"].isin(status_sel)]
-
-        tot_orc = view["Orcado_Total"].sum()
-        tot_real = view["Realizado_Total"].sum()
-        saldo = tot_orc - tot_real
-
-        a1, a2, a3, a4 = st.columns(4)
-        a1.metric("📦 Orçamentos", len(view))
-        a2.metric("💰 Orçado (agregado)", fmt_real(tot_orc))
-        a3.metric("✅ Realizado (alocado)", fmt_real(tot_real))
-        a4.metric("📊 Saldo", fmt_real(saldo), delta_color="normal" if saldo >= 0 else "inverse")
-
-        if not df_alertas.empty:
-            with st.expander(f"⚠️ Alertas ({len(df_alertas)})", expanded=False):
-                st.dataframe(df_alertas, use_container_width=True, hide_index=True)
-
-        # ✅ Correção do KeyError:
-        show_cols = ["Ano", "Mês", "Projeto", "Categoria", "Orcado_Total", "Realizado_Total", "Saldo", "Uso_%", "Status", "Orc_ID"]
-        view_sorted = view.sort_values(["Ano", "Mes_Num", "Projeto", "Categoria"], ascending=[False, False, True, True])
-        out = view_sorted[show_cols].copy()
-
-        st.dataframe(
-            out,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "Orcado_Total": st.column_config.NumberColumn("Orçado", format="R$ %.2f"),
-                "Realizado_Total": st.column_config.NumberColumn("Realizado", format="R$ %.2f"),
-                "Saldo": st.column_config.NumberColumn("Saldo", format="R$ %.2f"),
-                "Uso_%": st.column_config.NumberColumn("Uso %", format="%.1f"),
-                "Orc_ID": st.column_config.TextColumn("Orc_ID"),
-            },
+    with st.expander(f"🗑️ Excluir todo o resultado do filtro ({len(df_view)} registro(s))"):
+        confirmar_exclusao(df_view, "do filtro atual", "excl_filtro")
+
+
+def confirmar_exclusao(alvo: pd.DataFrame, descricao: str, chave: str):
+    """Contagem e valor do que será excluído, com opção de levar as séries (Grupo_ID) inteiras.
+
+    Tudo vai num único registro de exclusão por shard (um batch_update de ranges contíguos).
+    Linhas sem Lanc_ID gravado na planilha ficam de fora (e o total avisa quantas).
+    """
+    if alvo.empty:
+        st.caption("Nada a excluir.")
+        return
+    grupos = set(alvo["Grupo_ID"]) - {""}
+    if grupos and st.checkbox("Incluir as demais parcelas das mesmas séries (Grupo_ID)", key=f"{chave}_series"):
+        with st.spinner("Localizando parcelas..."):
+            alvo = pd.concat([alvo, membros_grupos(alvo)], ignore_index=True).drop_duplicates("Lanc_ID")
+
+    provisorio = lanc_id_provisorio(alvo)
+    if provisorio.any():
+        st.warning(
+            f"{int(provisorio.sum())} registro(s) sem Lanc_ID na planilha ficam fora da exclusão "
+            "(rode `python AppOrc.py migrar` para incluí-los)."
         )
+        alvo = alvo[~provisorio]
+        if alvo.empty:
+            return
+
+    tot_orc = alvo.loc[alvo["Tipo"] == "Orçado", "Valor_num"].sum()
+    tot_real = alvo.loc[alvo["Tipo"] == "Realizado", "Valor_num"].sum()
+    st.error(
+        f"⚠️ **{len(alvo)} registro(s)** {descricao} · {fmt_real(alvo['Valor_num'].sum())} "
+        f"(Orçado {fmt_real(tot_orc)} · Realizado {fmt_real(tot_real)}). Esta ação não pode ser desfeita."
+    )
+    if st.button("🗑️ Confirmar Exclusão", type="primary", key=f"{chave}_confirmar", use_container_width=True):
+        with st.spinner("Excluindo registros..."):
+            if excluir_lancamentos(alvo):
+                st.success("Registros excluídos com sucesso!")
+                st.rerun()
+
+
+@st.fragment
+def fragmento_dados_orcamentos(anos_disp: List[int]):
+    """Orçamentos agregados, com filtros próprios e carga só dos anos escolhidos."""
+    anos_carga = tuple(st.session_state.get("orc_anos", [ano_padrao(anos_disp)]))
+    indice_orc, df_alertas = indice_orcamentos(anos_carga)
+    df_orc_agg = indice_orc.df
+
+    with st.form("form_filtros_orc"):
+        render_section_title("Filtros (Orçamentos)")
+        c1, c2, c3 = st.columns(3)
+        ano_sel = c1.multiselect("Ano", anos_disp, default=[ano_padrao(anos_disp)], key="orc_anos")
+        mes_sel = c2.multiselect("Mês", indice_orc.opcoes("Mês"))
+        proj_sel = c3.multiselect("Projeto", indice_orc.opcoes("Projeto"))
+
+        c4, c5 = st.columns(2)
+        cat_sel = c4.multiselect("Categoria", indice_orc.opcoes("Categoria"))
+        status_sel = c5.multiselect("Status", indice_orc.opcoes("Status"))
+
+        st.form_submit_button("Aplicar", type="primary", use_container_width=True)
+
+    if df_orc_agg.empty:
+        st.info("Sem orçamentos cadastrados (tipo 'Orçado') nos anos selecionados.")
+        return
+
+    view = indice_orc.filtrar({
+        "Ano": ano_sel, "Mês": mes_sel, "Projeto": proj_sel, "Categoria": cat_sel, "Status": status_sel,
+    })
+
+    tot_orc = view["Orcado_Total"].sum()
+    tot_real = view["Realizado_Total"].sum()
+    saldo = tot_orc - tot_real
+
+    a1, a2, a3, a4 = st.columns(4)
+    a1.metric("📦 Orçamentos", len(view))
+    a2.metric("💰 Orçado (agregado)", fmt_real(tot_orc))
+    a3.metric("✅ Realizado (alocado)", fmt_real(tot_real))
+    a4.metric("📊 Saldo", fmt_real(saldo), delta_color="normal" if saldo >= 0 else "inverse")
+
+    if not df_alertas.empty:
+        with st.expander(f"⚠️ Alertas ({len(df_alertas)})", expanded=False):
+            st.dataframe(df_alertas, use_container_width=True, hide_index=True)
+
+    # ✅ Correção do KeyError:
+    show_cols = ["Ano", "Mês", "Projeto", "Categoria", "Orcado_Total", "Realizado_Total", "Saldo", "Uso_%", "Status",
+                 "Projecao", "Estouro_Previsto", "Orc_ID"]
+    view_sorted = view.sort_values(["Ano", "Mes_Num", "Projeto", "Categoria"], ascending=[False, False, True, True])
+    out = view_sorted[show_cols].copy()
+
+    filtros = tuple(tuple(sorted(f)) for f in (ano_sel, mes_sel, proj_sel, cat_sel, status_sel))
+    botao_exportar(out, "orcamentos_agregados", "Baixar orçamentos (visão agregada)", filtros, "exp_orc")
+
+    st.dataframe(
+        out,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Orcado_Total": st.column_config.NumberColumn("Orçado", format="R$ %.2f"),
+            "Realizado_Total": st.column_config.NumberColumn("Realizado", format="R$ %.2f"),
+            "Saldo": st.column_config.NumberColumn("Saldo", format="R$ %.2f"),
+            "Uso_%": st.column_config.NumberColumn("Uso %", format="%.1f"),
+            "Projecao": st.column_config.NumberColumn("Projeção", format="R$ %.2f", help="Gasto previsto no fim do período (run-rate)"),
+            "Estouro_Previsto": st.column_config.DateColumn("Estouro previsto", format="DD/MM/YYYY"),
+            "Orc_ID": st.column_config.TextColumn("Orc_ID"),
+        },
+    )
+
+
+@st.fragment
+def fragmento_dados_rateio(anos_disp: List[int]):
+    """Realizado de cada projeto/mês dividido entre os envolvidos pelas horas dedicadas."""
+    indice, sem_rateio = indice_rateio()
+    if not indice.n:
+        st.info("Cadastre envolvidos (em **Cadastros**) para ratear o realizado por pessoa e centro de custo.")
+        return
+
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        anos = indice.opcoes("Ano")[::-1]
+        ano_sel = c1.selectbox("📅 Ano", anos, index=anos.index(ano_padrao(anos)) if ano_padrao(anos) in anos else 0,
+                               key="rateio_ano")
+        proj_sel = c2.multiselect("🏢 Projeto", indice.opcoes("Projeto"), key="rateio_proj")
+        cc_sel = c3.multiselect("🏦 Centro de Custo", indice.opcoes("Centro de Custo"), key="rateio_cc")
+
+    df_r = indice.filtrar({"Ano": [ano_sel], "Projeto": proj_sel, "Centro de Custo": cc_sel})
+    sem = sem_rateio[(sem_rateio["Ano"] == ano_sel) & (sem_rateio["Projeto"].isin(proj_sel) if proj_sel else True)]
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("⏰ Horas", f"{df_r['Horas'].sum():,.1f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    m2.metric("💸 Custo rateado", fmt_real(df_r["Custo_Rateado"].sum()))
+    m3.metric("👤 Pessoas", df_r["Nome"].nunique())
+    m4.metric("⚠️ Realizado sem envolvidos", fmt_real(sem["Realizado_Projeto"].sum()) if not cc_sel else "—",
+              help="Realizado de projeto/mês sem horas cadastradas: não entra no rateio.")
+
+    horas = horas_envolvidos(versao_planilha(), versao_dados())
+    horas = horas[(horas["Ano"] == ano_sel)
+                  & (horas["Projeto"].isin(proj_sel) if proj_sel else True)
+                  & (horas["Centro de Custo"].isin(cc_sel) if cc_sel else True)]
+    filtros = (ano_sel, tuple(sorted(proj_sel)), tuple(sorted(cc_sel)))
+    spec = figura_em_cache("rateio_horas", filtros, lambda: figura_horas(horas))
+    if spec:
+        render_section_title("Horas por mês")
+        st.plotly_chart(spec, use_container_width=True, config=PLOTLY_CONFIG)
+
+    por_cc = (
+        df_r.groupby("Centro de Custo", as_index=False)
+        .agg(Horas=("Horas", "sum"), Custo=("Custo_Rateado", "sum"), Pessoas=("Nome", "nunique"))
+        .sort_values("Custo", ascending=False)
+    )
+    por_cc["Custo_Hora"] = por_cc["Custo"] / por_cc["Horas"].where(por_cc["Horas"] > 0)
+    render_section_title("Por centro de custo")
+    st.dataframe(
+        por_cc, use_container_width=True, hide_index=True,
+        column_config={
+            "Horas": st.column_config.NumberColumn("Horas", format="%.1f"),
+            "Custo": st.column_config.NumberColumn("Custo rateado", format="R$ %.2f"),
+            "Custo_Hora": st.column_config.NumberColumn("Custo/hora", format="R$ %.2f"),
+        },
+    )
+
+    por_pessoa = (
+        df_r.groupby(["Nome", "Cargo/Função", "Centro de Custo"], as_index=False)
+        .agg(Horas=("Horas", "sum"), Custo=("Custo_Rateado", "sum"), Projetos=("Projeto", "nunique"))
+        .sort_values("Custo", ascending=False)
+    )
+    render_section_title("Por pessoa")
+    st.dataframe(
+        por_pessoa, use_container_width=True, hide_index=True,
+        column_config={
+            "Horas": st.column_config.NumberColumn("Horas", format="%.1f"),
+            "Custo": st.column_config.NumberColumn("Custo rateado", format="R$ %.2f"),
+        },
+    )
+
+    botao_exportar(
+        df_r.sort_values(["Mes_Num", "Projeto", "Nome"]).drop(columns="Mes_Num"),
+        "rateio_custos", "Baixar rateio (filtro atual)", filtros, "exp_rateio",
+    )
 
 
 def tela_cadastros(df_cad: pd.DataFrame, df_env: pd.DataFrame):
@@ -1496,25 +2777,27 @@ def tela_cadastros(df_cad: pd.DataFrame, df_env: pd.DataFrame):
         unsafe_allow_html=True,
     )
 
+    catalogo = catalogo_cadastros()
     c1, c2 = st.columns(2, gap="medium")
 
     with c1:
         render_section_title("🏢 Projetos")
         with st.form("form_proj", clear_on_submit=True):
             novo_proj = st.text_input("Nome do Projeto", placeholder="Ex: Reforma Sede 2025")
+            shards = nomes_shards()
+            shard_proj = st.selectbox("Unidade (shard)", shards) if len(shards) > 1 else None
             if st.form_submit_button("Adicionar Projeto", type="primary", use_container_width=True):
                 if novo_proj.strip():
                     with st.spinner("Salvando..."):
-                        if salvar_cadastro_novo("Projeto", novo_proj.strip()):
+                        if salvar_cadastro_novo("Projeto", novo_proj.strip(), shard=shard_proj):
                             st.success(f"Projeto '{novo_proj}' adicionado!")
                             st.rerun()
                 else:
                     st.warning("Digite um nome válido.")
-        if not df_cad.empty:
-            proj_lista = df_cad[df_cad["Tipo"].str.lower() == "projeto"][["Nome"]].reset_index(drop=True)
-            if not proj_lista.empty:
-                st.caption(f"{len(proj_lista)} projeto(s) cadastrado(s)")
-                st.dataframe(proj_lista, use_container_width=True, hide_index=True)
+        if catalogo["projeto"]:
+            proj_lista = pd.DataFrame({"Nome": catalogo["projeto"]})
+            st.caption(f"{len(proj_lista)} projeto(s) cadastrado(s)")
+            st.dataframe(proj_lista, use_container_width=True, hide_index=True)
 
     with c2:
         render_section_title("📂 Categorias")
@@ -1528,11 +2811,10 @@ def tela_cadastros(df_cad: pd.DataFrame, df_env: pd.DataFrame):
                             st.rerun()
                 else:
                     st.warning("Digite um nome válido.")
-        if not df_cad.empty:
-            cat_lista = df_cad[df_cad["Tipo"].str.lower() == "categoria"][["Nome"]].reset_index(drop=True)
-            if not cat_lista.empty:
-                st.caption(f"{len(cat_lista)} categoria(s) cadastrada(s)")
-                st.dataframe(cat_lista, use_container_width=True, hide_index=True)
+        if catalogo["categoria"]:
+            cat_lista = pd.DataFrame({"Nome": catalogo["categoria"]})
+            st.caption(f"{len(cat_lista)} categoria(s) cadastrada(s)")
+            st.dataframe(cat_lista, use_container_width=True, hide_index=True)
 
     st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -1542,10 +2824,7 @@ def tela_cadastros(df_cad: pd.DataFrame, df_env: pd.DataFrame):
         unsafe_allow_html=True,
     )
 
-    if not df_cad.empty:
-        lista_proj = sorted(df_cad[df_cad["Tipo"].str.lower() == "projeto"]["Nome"].unique().tolist())
-    else:
-        lista_proj = []
+    lista_proj = catalogo["projeto"]
 
     ano_atual = date.today().year
     meses_opcoes = [f"{m:02d} - {MESES_PT[m]}" for m in range(1, 13)]
@@ -1571,29 +2850,32 @@ def tela_cadastros(df_cad: pd.DataFrame, df_env: pd.DataFrame):
             elif env_proj is None:
                 st.error("Selecione um projeto.")
             else:
-                linha = [str(env_ano), env_mes, env_proj, env_nome.strip(),
-                         env_cargo.strip(), env_cc.strip(), str(env_horas), env_obs.strip()]
+                linha = [int(env_ano), env_mes, env_proj, env_nome.strip(),
+                         env_cargo.strip(), env_cc.strip(), float(env_horas), env_obs.strip()]
                 with st.spinner("Salvando envolvido..."):
                     if salvar_envolvido(linha):
                         st.toast(f"{env_nome} cadastrado em {env_proj} ({env_mes})!", icon="✅")
                         st.success("Registro salvo.")
                         st.rerun()
 
-    if not df_env.empty:
+    fragmento_envolvidos()
+
+
+@st.fragment
+def fragmento_envolvidos():
+    """Lista de envolvidos: mexer nos filtros reexecuta só este trecho."""
+    indice = indice_envolvidos()
+    if indice.n:
         render_section_title("Envolvidos Cadastrados")
         fe1, fe2, fe3 = st.columns(3)
-        filtro_env_ano = fe1.selectbox("Filtrar Ano", sorted(df_env["Ano"].unique(), reverse=True), index=0, key="filtro_env_ano")
-        df_env_f = df_env[df_env["Ano"] == str(filtro_env_ano)]
+        filtro_env_ano = fe1.selectbox("Filtrar Ano", indice.opcoes("Ano")[::-1], index=0, key="filtro_env_ano")
+        df_env_ano = indice.filtrar({"Ano": [filtro_env_ano]})
 
-        meses_env_disp = sorted(df_env_f["Mês"].unique(), key=mes_num) if not df_env_f.empty else []
+        meses_env_disp = sorted(df_env_ano["Mês"].unique(), key=mes_num) if not df_env_ano.empty else []
         filtro_env_mes = fe2.multiselect("Filtrar Mês", meses_env_disp, key="filtro_env_mes")
-        if filtro_env_mes:
-            df_env_f = df_env_f[df_env_f["Mês"].isin(filtro_env_mes)]
-
-        proj_env_disp = sorted(df_env_f["Projeto"].unique()) if not df_env_f.empty else []
+        proj_env_disp = sorted(df_env_ano["Projeto"].unique()) if not df_env_ano.empty else []
         filtro_env_proj = fe3.multiselect("Filtrar Projeto", proj_env_disp, key="filtro_env_proj")
-        if filtro_env_proj:
-            df_env_f = df_env_f[df_env_f["Projeto"].isin(filtro_env_proj)]
+        df_env_f = indice.filtrar({"Ano": [filtro_env_ano], "Mês": filtro_env_mes, "Projeto": filtro_env_proj})
 
         if not df_env_f.empty:
             st.caption(f"{len(df_env_f)} registro(s) encontrado(s)")
@@ -1609,19 +2891,65 @@ def tela_cadastros(df_cad: pd.DataFrame, df_env: pd.DataFrame):
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-# 11. MAIN / MENU
+# 13. MAIN / MENU
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+def render_status_journal():
+    resumo = journal_resumo()
+    if resumo.get("pendente"):
+        st.caption(f"⏳ {resumo['pendente']} gravação(ões) aguardando sincronização com o Sheets")
+    if resumo.get("falha"):
+        st.warning(
+            f"⚠️ {resumo['falha']} gravação(ões) com falha — os dados continuam salvos localmente, "
+            "e as gravações seguintes do mesmo shard aguardam o reenvio."
+        )
+        with st.expander("Detalhes das falhas"):
+            for e in journal_listar(("falha",)):
+                st.caption(f"#{e['id']} · {e['op']} · {e['shard']} — {e['erro']}")
+        if st.button("🔁 Reenviar falhas", use_container_width=True):
+            journal_reprocessar_falhas()
+            iniciar_replayer().set()
+            st.rerun()
+
+
+def render_status_figuras():
+    est = estatisticas_figuras()
+    total = est["acertos"] + est["faltas"]
+    if total:
+        st.caption(f"📈 Gráficos em cache: {est['acertos'] / total:.0%} de acerto "
+                   f"({est['acertos']}/{total}, {est['entradas']} guardado(s))")
+
+
+def ano_padrao(anos_disponiveis: List[int]) -> int:
+    ano_atual = date.today().year
+    if ano_atual in anos_disponiveis or not anos_disponiveis:
+        return ano_atual
+    return anos_disponiveis[0]
+
+
+def anos_da_pagina(pagina: str, anos_disponiveis: List[int]) -> Tuple[int, ...]:
+    """Partições de lançamentos que a página precisa já no main.
+
+    Painel e Dados carregam os próprios anos dentro dos fragmentos.
+    """
+    if pagina == "novo":
+        ano_atual = date.today().year
+        return tuple(a for a in anos_disponiveis if ano_atual - 1 <= a <= ano_atual + 1)
+    return ()
+
+
 def main():
+    configurar_pagina()
     # ✅ PRIMEIRO: senha (antes de carregar dados e desenhar o app)
     gate_password_screen()
 
     if "pagina" not in st.session_state:
         st.session_state.pagina = "painel"
-    if "cache_buster" not in st.session_state:
-        st.session_state.cache_buster = 0
+    iniciar_replayer()
 
     with st.spinner("Carregando dados..."):
-        df_lancamentos, df_cadastros, df_envolvidos = carregar_dados(st.session_state.cache_buster)
+        anos_disponiveis = sorted(set(listar_anos_lanc(versao_planilha())) | anos_no_journal(), reverse=True)
+        anos_carga = anos_da_pagina(st.session_state.pagina, anos_disponiveis)
+        _, df_cadastros, df_envolvidos = carregar_dados(versao_planilha(), anos_carga)
 
     with st.sidebar:
         st.markdown(
@@ -1640,7 +2968,10 @@ def main():
 
         menu_items = [
             {"key": "painel", "icon": "📊", "label": "Painel"},
+            {"key": "tendencias", "icon": "📈", "label": "Tendências"},
             {"key": "novo", "icon": "➕", "label": "Novo"},
+            {"key": "importar", "icon": "📥", "label": "Importar"},
+            {"key": "planejamento", "icon": "🗓️", "label": "Planejamento"},
             {"key": "dados", "icon": "📂", "label": "Dados"},
             {"key": "cadastros", "icon": "⚙️", "label": "Cadastros"},
         ]
@@ -1688,6 +3019,9 @@ def main():
             invalidate_cache()
             st.rerun()
 
+        render_status_journal()
+        render_status_figuras()
+
         st.markdown(
             """
         <div style="margin-top:32px; font-size:11px; color:#C7C7CC; text-align:center;">
@@ -1698,14 +3032,107 @@ def main():
         )
 
     if st.session_state.pagina == "painel":
-        tela_resumo(df_lancamentos)
+        tela_resumo(anos_disponiveis)
+    elif st.session_state.pagina == "tendencias":
+        tela_tendencias()
     elif st.session_state.pagina == "novo":
-        tela_novo(df_lancamentos, df_cadastros)
+        tela_novo(anos_carga, df_cadastros)
+    elif st.session_state.pagina == "importar":
+        tela_importar(df_cadastros)
+    elif st.session_state.pagina == "planejamento":
+        tela_planejamento(anos_disponiveis, df_cadastros)
     elif st.session_state.pagina == "dados":
-        tela_dados(df_lancamentos)
+        tela_dados(anos_disponiveis)
     elif st.session_state.pagina == "cadastros":
         tela_cadastros(df_cadastros, df_envolvidos)
 
 
+def cli(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="AppOrc.py", description="Tarefas administrativas do Controle Orçamentário.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("particionar", help="Copia a aba única de lançamentos para abas anuais e arquiva a antiga.")
+    sub.add_parser("sincronizar", help="Envia ao Sheets as gravações pendentes no journal local.")
+    p_migrar = sub.add_parser("migrar", help="Migra o schema das abas de lançamentos em lotes (retomável).")
+    p_migrar.add_argument("--shard", action="append", help="Shard a migrar (padrão: todos).")
+    p_migrar.add_argument("--lote", type=int, default=500, help="Células por batch_update.")
+    p_vincular = sub.add_parser("vincular", help="Grava em Orcado_Vinculo o orçamento dos realizados sem vínculo.")
+    p_vincular.add_argument("--simular", action="store_true", help="Só relata, sem gravar.")
+    p_razao = sub.add_parser("razao", help="Confere o razão de consumo por orçamento contra um recálculo completo.")
+    p_razao.add_argument("--reconstruir", action="store_true", help="Reconstrói sem comparar.")
+    p_importar = sub.add_parser("importar", help="Importa lançamentos de um CSV/XLSX (Data, Tipo, Projeto, Categoria, Valor...).")
+    p_importar.add_argument("arquivo")
+    p_importar.add_argument("--simular", action="store_true", help="Só valida e relata as linhas rejeitadas.")
+    p_importar.add_argument("--rejeitadas", help="Grava as linhas rejeitadas neste CSV.")
+    p_rel = sub.add_parser("relatorios", help="Gera os relatórios de consumo e alertas de cada Projeto/Ano (fechamento).")
+    argumentos_relatorios(p_rel, ["sheets", "snapshots", "arquivo"])
+    args = parser.parse_args(argv)
+
+    if args.comando == "particionar":
+        for shard in nomes_shards():
+            contagem = particionar_legado(shard)
+            for ano, n in sorted(contagem.items()):
+                print(f"[{shard}] {nome_particao(ano)}: {n} linha(s)")
+            print(f"[{shard}] Total: {sum(contagem.values())} linha(s) em {len(contagem)} partição(ões).")
+    elif args.comando == "migrar":
+        for shard in args.shard or nomes_shards():
+            sh = abrir_shard(shard)
+            if not sh:
+                print(f"[{shard}] sem conexão.")
+                return 1
+            abas = listar_particoes(sh)
+            legado = get_ws_lanc(sh)
+            alvos = [(ano, ws) for ano, ws in sorted(abas.items())] + ([(None, legado)] if legado else [])
+            for ano, ws in alvos:
+                def _progresso(feitas, total, titulo=ws.title):
+                    print(f"[{shard}] {titulo}: {feitas}/{total} célula(s)", flush=True)
+
+                r = migrar_schema_lanc(ws, tamanho_lote=args.lote, progresso=_progresso)
+                print(f"[{shard}] {ws.title}: concluída ({r['celulas']} célula(s) preenchida(s)).")
+                if ano is not None:
+                    descartar_snapshot(shard, ano)
+        invalidate_cache()
+    elif args.comando == "sincronizar":
+        feitas = replay_journal()
+        resumo = journal_resumo()
+        print(f"{feitas} entrada(s) enviada(s); pendentes: {resumo.get('pendente', 0)}; falhas: {resumo.get('falha', 0)}.")
+    elif args.comando == "vincular":
+        n, sem_orcamento = vincular_realizados(simular=args.simular)
+        print(f"{n} realizado(s) {'a vincular' if args.simular else 'vinculado(s)'}; "
+              f"{len(sem_orcamento)} sem orçamento correspondente.")
+        if not sem_orcamento.empty:
+            print(sem_orcamento.to_string(index=False))
+    elif args.comando == "razao":
+        r = razao_verificar(forcar=args.reconstruir)
+        print(f"{r['orcamentos']} linha(s) de orçamento; {r['divergencias']} divergência(s); "
+              f"{'reconstruído' if r['reconstruido'] else 'conferido'}.")
+    elif args.comando == "importar":
+        def _progresso(r):
+            print(f"{r['lidas']} linha(s) lida(s); {r['aceitas']} válida(s)", flush=True)
+
+        r = importar_lancamentos(args.arquivo, args.arquivo, simular=args.simular, progresso=_progresso)
+        print(f"{r['lancamentos']} lançamento(s) {'a gravar' if args.simular else 'registrado(s)'} "
+              f"({fmt_real(r['valor'])}); {len(r['rejeitadas'])} linha(s) rejeitada(s).")
+        if args.rejeitadas:
+            r["rejeitadas"].to_csv(args.rejeitadas, index=False)
+        elif not r["rejeitadas"].empty:
+            print(r["rejeitadas"][["Linha", "Motivo"]].to_string(index=False))
+        if r["lancamentos"] and not args.simular:
+            feitas = replay_journal()
+            resumo = journal_resumo()
+            print(f"{feitas} entrada(s) enviada(s); pendentes: {resumo.get('pendente', 0)}; falhas: {resumo.get('falha', 0)}.")
+    elif args.comando == "relatorios":
+        def _carregar_sheets(anos):
+            vp = versao_planilha()
+            return carregar_dados(vp, tuple(anos or listar_anos_lanc(vp)))[0]
+
+        return rodar_relatorios(args, carregar_sheets=_carregar_sheets)
+    return 0
+
+
 if __name__ == "__main__":
+    # `python AppOrc.py <comando>` roda as tarefas administrativas; `streamlit run` abre o app.
+    if len(sys.argv) > 1 and not st.runtime.exists():
+        sys.exit(cli(sys.argv[1:]))
     main()
@@ -0,0 +1,14 @@
+"""Núcleo do Controle Orçamentário, sem dependência de Streamlit, Plotly ou gspread.
+
+- config: constantes de schema, caminhos locais e tamanhos de lote
+- dados: formatos, limpeza das linhas do Sheets, snapshots e validação de importação
+- exportacao: gravação de CSV/Parquet/XLSX em lotes
+- agregado: orçado x realizado, projeção, KPIs e relatórios em lote
+- razao / journal: razão de consumo e journal de gravações (SQLite)
+- indices: índices dos filtros e da busca textual
+- bench: lançamentos sintéticos e benchmark de tempo/memória das etapas
+
+`python -m orcamento relatorios` gera relatórios a partir de snapshots ou arquivos locais
+e `python -m orcamento bench` mede as etapas em 10k/100k/1M linhas sintéticas;
+o acesso ao Sheets (credenciais em st.secrets) continua no AppOrc.py.
+"""
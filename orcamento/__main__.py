@@ -0,0 +1,5 @@
+import sys
+
+from orcamento.cli import main
+
+sys.exit(main())
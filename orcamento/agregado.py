@@ -0,0 +1,377 @@
+"""Orçado x realizado: tabela de orçamentos, consumo, projeção, KPIs e relatórios em lote."""
+
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from orcamento.config import COLS_RELATORIO, FORMATOS_EXPORTACAO
+from orcamento.dados import fmt_real, fmt_real_series, mes_num, pct
+from orcamento.exportacao import gravar_exportacao
+
+
+def build_orcamentos_table(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=["Orc_ID", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria", "Orcado_Total"])
+
+    df_orc = df[df["Tipo"] == "Orçado"].copy()
+    if df_orc.empty:
+        return pd.DataFrame(columns=["Orc_ID", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria", "Orcado_Total"])
+
+    if "Mes_Num" not in df_orc.columns:
+        df_orc["Mes_Num"] = df_orc["Mês"].apply(mes_num)
+
+    df_orc["Orc_ID"] = df_orc["Grupo_ID"].where(
+        df_orc["Grupo_ID"].astype(str).str.strip() != "",
+        df_orc["Lanc_ID"]
+    )
+
+    agg = (
+        df_orc.groupby(["Orc_ID", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria"], dropna=False)
+        .agg(Orcado_Total=("Valor_num", "sum"))
+        .reset_index()
+    )
+    return agg
+
+
+CHAVE_GRUPO = ["Ano", "Mês", "Projeto", "Categoria"]
+
+
+class IndiceCandidatos:
+    """Orçamentos (build_orcamentos_table) indexados para vínculo e fallback do consumo.
+
+    - (Projeto, Categoria) -> orçamentos por Ano, Mes_Num e Orcado_Total decrescentes;
+    - (Ano, Mês, Projeto, Categoria) -> Orc_ID de maior Orcado_Total (`maior_orc`).
+    """
+
+    def __init__(self, df_orc: pd.DataFrame):
+        self.tabela = df_orc
+        self._ordenado = df_orc.sort_values(
+            ["Projeto", "Categoria", "Ano", "Mes_Num", "Orcado_Total"],
+            ascending=[True, True, False, False, False], kind="stable",
+        ).reset_index(drop=True)
+        self._por_proj_cat = self._ordenado.groupby(["Projeto", "Categoria"], sort=False).indices
+        self.maior_orc = (
+            df_orc.sort_values(["Orcado_Total", "Orc_ID"], ascending=[False, True], kind="stable")
+            .drop_duplicates(CHAVE_GRUPO)
+            .set_index(CHAVE_GRUPO)["Orc_ID"]
+        )
+
+    def candidatos(self, projeto: str, categoria: str, ano: int, mes: str, limite: int = 30) -> pd.DataFrame:
+        """Orçamentos do par Projeto/Categoria, os do mês (ano, mes) primeiro."""
+        pos = self._por_proj_cat.get((projeto, categoria))
+        if pos is None:
+            return self._ordenado.iloc[:0]
+        cand = self._ordenado.take(pos)
+        do_mes = (cand["Ano"] == ano) & (cand["Mês"] == mes)
+        return pd.concat([cand[do_mes], cand[~do_mes]]).head(limite)
+
+    def maior_orc_id(self, grupos: pd.DataFrame) -> pd.DataFrame:
+        """`grupos` (com as colunas de CHAVE_GRUPO) + coluna Orc_ID (NaN se não houver orçamento)."""
+        return grupos.join(self.maior_orc, on=CHAVE_GRUPO)
+
+
+def compute_consumo(df: pd.DataFrame, candidatos: Optional[IndiceCandidatos] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Consumo por orçamento + alertas. `candidatos` (dos mesmos dados) evita reconstruir os orçamentos."""
+    alerts = []
+
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame(columns=["Tipo", "Mensagem"])
+
+    df = df.copy()
+    if "Mes_Num" not in df.columns:
+        df["Mes_Num"] = df["Mês"].apply(mes_num)
+
+    if candidatos is None:
+        candidatos = IndiceCandidatos(build_orcamentos_table(df))
+    df_orc = candidatos.tabela.copy()
+    df_real = df[df["Tipo"] == "Realizado"].copy()
+
+    if df_orc.empty:
+        if not df_real.empty:
+            grp = df_real.groupby(["Ano", "Mês", "Projeto", "Categoria"], dropna=False)["Valor_num"].sum().reset_index()
+            for _, r in grp.iterrows():
+                alerts.append({
+                    "Tipo": "Realizado sem Orçado",
+                    "Mensagem": f"Realizado {fmt_real(r['Valor_num'])} em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}) sem orçamento."
+                })
+        return df_orc, pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
+
+    if df_real.empty:
+        df_orc["Realizado_Total"] = 0.0
+        df_orc["Saldo"] = df_orc["Orcado_Total"]
+        df_orc["Uso_%"] = df_orc.apply(lambda r: pct(r["Realizado_Total"], r["Orcado_Total"]), axis=1)
+        df_orc["Status"] = np.where(df_orc["Saldo"] < 0, "Estouro", "OK")
+        return df_orc, pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
+
+    df_real["Orc_Vinc"] = df_real["Orcado_Vinculo"].astype(str).fillna("").str.strip()
+
+    vinc = df_real[df_real["Orc_Vinc"] != ""]
+    consumo_vinc = (
+        vinc.groupby("Orc_Vinc")["Valor_num"].sum().reset_index()
+        .rename(columns={"Orc_Vinc": "Orc_ID", "Valor_num": "Realizado_Vinculado"})
+    )
+
+    sem_vinc = df_real[df_real["Orc_Vinc"] == ""]
+    if not sem_vinc.empty:
+        sem_vinc_grp = (
+            sem_vinc.groupby(["Ano", "Mês", "Projeto", "Categoria"], dropna=False)["Valor_num"].sum().reset_index()
+        )
+
+        sem_vinc_mapped = candidatos.maior_orc_id(sem_vinc_grp)
+        consumo_fallback = (
+            sem_vinc_mapped.dropna(subset=["Orc_ID"])
+            .groupby("Orc_ID")["Valor_num"].sum().reset_index()
+            .rename(columns={"Valor_num": "Realizado_Fallback"})
+        )
+
+        nao_achou = sem_vinc_mapped[sem_vinc_mapped["Orc_ID"].isna()]
+        if not nao_achou.empty:
+            for _, r in nao_achou.iterrows():
+                alerts.append({
+                    "Tipo": "Realizado sem Orçado",
+                    "Mensagem": f"Realizado {fmt_real(r['Valor_num'])} em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}) sem orçamento correspondente."
+                })
+    else:
+        consumo_fallback = pd.DataFrame(columns=["Orc_ID", "Realizado_Fallback"])
+
+    df_orc2 = df_orc.merge(consumo_vinc, on="Orc_ID", how="left")
+    df_orc2["Realizado_Vinculado"] = df_orc2.get("Realizado_Vinculado", 0.0).fillna(0.0)
+
+    if not consumo_fallback.empty:
+        df_orc2 = df_orc2.merge(consumo_fallback, on="Orc_ID", how="left")
+        df_orc2["Realizado_Fallback"] = df_orc2.get("Realizado_Fallback", 0.0).fillna(0.0)
+    else:
+        df_orc2["Realizado_Fallback"] = 0.0
+
+    if "Mes_Num" not in df_orc2.columns:
+        df_orc2["Mes_Num"] = df_orc2["Mês"].apply(mes_num)
+
+    df_orc2["Realizado_Total"] = df_orc2["Realizado_Vinculado"] + df_orc2["Realizado_Fallback"]
+    df_orc2["Saldo"] = df_orc2["Orcado_Total"] - df_orc2["Realizado_Total"]
+    df_orc2["Uso_%"] = df_orc2.apply(lambda r: pct(r["Realizado_Total"], r["Orcado_Total"]), axis=1)
+    df_orc2["Status"] = np.where(df_orc2["Saldo"] < 0, "Estouro", "OK")
+
+    estouros = df_orc2[df_orc2["Saldo"] < 0]
+    for _, r in estouros.iterrows():
+        alerts.append({
+            "Tipo": "Estouro",
+            "Mensagem": f"Estouro em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}): saldo {fmt_real(r['Saldo'])}."
+        })
+
+    return df_orc2, pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
+
+
+def projetar_consumo(df_orc: pd.DataFrame, hoje: Optional[date] = None) -> pd.DataFrame:
+    """Acrescenta Projecao (gasto previsto no fim do período) e Estouro_Previsto a cada linha de consumo.
+
+    Modelo de run-rate por Orc_ID, vetorizado: realizado até `hoje` / dias decorridos,
+    estendido até o fim do período (do 1º ao último mês do Orc_ID). Períodos encerrados
+    ou futuros ficam com a projeção igual ao realizado.
+    """
+    df = df_orc.copy()
+    if df.empty:
+        df["Projecao"] = pd.Series(dtype=float)
+        df["Estouro_Previsto"] = pd.Series(dtype="datetime64[ns]")
+        return df
+
+    hoje = np.datetime64(hoje or date.today(), "D")
+    codes, uniques = pd.factorize(df["Orc_ID"])
+    n = len(uniques)
+    mes = (df["Ano"].to_numpy(dtype=np.int64) - 1970) * 12 + df["Mes_Num"].to_numpy(dtype=np.int64) - 1
+    mes_ini = np.full(n, np.iinfo(np.int64).max)
+    mes_fim = np.full(n, np.iinfo(np.int64).min)
+    np.minimum.at(mes_ini, codes, mes)
+    np.maximum.at(mes_fim, codes, mes)
+    orcado = np.bincount(codes, weights=df["Orcado_Total"].to_numpy(dtype=float), minlength=n)
+    realizado = np.zeros(n)
+    realizado[codes] = df["Realizado_Total"].to_numpy(dtype=float)  # já é o total do Orc_ID
+
+    inicio = mes_ini.astype("datetime64[M]").astype("datetime64[D]")
+    fim = (mes_fim + 1).astype("datetime64[M]").astype("datetime64[D]") - np.timedelta64(1, "D")
+    duracao = (fim - inicio).astype(np.int64) + 1
+    decorrido = np.clip((np.minimum(hoje, fim) - inicio).astype(np.int64) + 1, 0, None)
+    em_curso = (decorrido > 0) & (decorrido < duracao)
+
+    taxa = np.divide(realizado, decorrido, out=np.zeros(n), where=decorrido > 0)
+    projecao = np.where(em_curso, taxa * duracao, realizado)
+    previsto = em_curso & (orcado > 0) & (realizado <= orcado) & (projecao > orcado)
+    dias = np.floor(np.divide(orcado, taxa, out=np.zeros(n), where=previsto)).astype(np.int64)
+    data_estouro = np.where(previsto, inicio + dias.astype("timedelta64[D]"), np.datetime64("NaT"))
+
+    df["Projecao"] = projecao[codes]
+    df["Estouro_Previsto"] = pd.to_datetime(data_estouro[codes])
+    return df
+
+
+def alertas_previsao(df_proj: pd.DataFrame) -> pd.DataFrame:
+    """Alertas "Estouro previsto" (um por Orc_ID) a partir de projetar_consumo."""
+    alerts = []
+    if "Estouro_Previsto" in df_proj.columns:
+        previstos = df_proj[df_proj["Estouro_Previsto"].notna()]
+        previstos = previstos.assign(
+            Orcado_Total=previstos.groupby("Orc_ID")["Orcado_Total"].transform("sum")
+        ).drop_duplicates("Orc_ID")
+        for _, r in previstos.sort_values("Estouro_Previsto").iterrows():
+            alerts.append({
+                "Tipo": "Estouro previsto",
+                "Mensagem": f"Estouro previsto em {r['Projeto']} / {r['Categoria']} ({r['Mês']} {r['Ano']}) "
+                            f"a partir de {r['Estouro_Previsto']:%d/%m/%Y}: projeção {fmt_real(r['Projecao'])} "
+                            f"para orçado {fmt_real(r['Orcado_Total'])}.",
+            })
+    return pd.DataFrame(alerts, columns=["Tipo", "Mensagem"])
+
+
+def kpis_lancamentos(df: pd.DataFrame) -> Dict:
+    """KPIs do Painel: orçado e realizado (soma das linhas), saldo, % de uso e projetos ativos."""
+    orcado = float(df.loc[df["Tipo"] == "Orçado", "Valor_num"].sum())
+    realizado = float(df.loc[df["Tipo"] == "Realizado", "Valor_num"].sum())
+    return {
+        "Orcado": orcado, "Realizado": realizado, "Saldo": orcado - realizado,
+        "Uso_%": pct(realizado, orcado), "Projetos": int(df["Projeto"].nunique()),
+    }
+
+
+CSS_RELATORIO = (
+    "body{font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',sans-serif;color:#1C1C1E;margin:32px;}"
+    "h1{font-size:22px;}h2{font-size:16px;margin-top:28px;color:#3A3A3C;}"
+    "table{border-collapse:collapse;font-size:13px;}th,td{padding:6px 10px;border-bottom:1px solid #F0F0F0;text-align:left;}"
+    "th{color:#8E8E93;font-weight:600;}"
+)
+
+
+def html_relatorio(titulo: str, kpis: Dict, consumo: pd.DataFrame, alertas: pd.DataFrame) -> str:
+    """Página HTML autocontida com KPIs, consumo por orçamento e alertas."""
+    linhas_kpi = "".join(
+        f"<tr><th>{html.escape(k)}</th><td>{v}</td></tr>" for k, v in [
+            ("Orçado", fmt_real(kpis["Orcado"])), ("Realizado", fmt_real(kpis["Realizado"])),
+            ("Saldo", fmt_real(kpis["Saldo"])), ("Uso", f"{kpis['Uso_%']:.1f}%"),
+        ]
+    )
+    tabela = consumo.reindex(columns=[
+        "Mês", "Categoria", "Orcado_Total", "Realizado_Total", "Saldo", "Uso_%", "Status", "Projecao", "Estouro_Previsto",
+    ]).sort_values(["Mês", "Categoria"], kind="stable")
+    for col in ("Orcado_Total", "Realizado_Total", "Saldo", "Projecao"):
+        tabela[col] = fmt_real_series(tabela[col])
+    tabela["Uso_%"] = pd.to_numeric(tabela["Uso_%"], errors="coerce").map("{:.1f}%".format)
+    tabela["Estouro_Previsto"] = pd.to_datetime(tabela["Estouro_Previsto"]).dt.strftime("%d/%m/%Y").fillna("")
+    tabela["Status"] = tabela["Status"].fillna("")
+    corpo_alertas = (
+        alertas[["Tipo", "Mensagem"]].to_html(index=False, border=0) if not alertas.empty else "<p>Sem alertas.</p>"
+    )
+    return (
+        f"<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'><title>{html.escape(titulo)}</title>"
+        f"<style>{CSS_RELATORIO}</style></head><body><h1>{html.escape(titulo)}</h1>"
+        f"<table>{linhas_kpi}</table>"
+        f"<h2>Consumo por orçamento</h2>{tabela.to_html(index=False, border=0, na_rep='')}"
+        f"<h2>Alertas ({len(alertas)})</h2>{corpo_alertas}</body></html>"
+    )
+
+
+def _nome_arquivo_relatorio(projeto: str, ano: int) -> str:
+    return f"{re.sub(r'[^0-9A-Za-z_-]', '_', projeto) or '_'}_{int(ano)}.html"
+
+
+def relatorio_projeto_ano(tarefa: Tuple) -> Dict:
+    """Consumo, alertas (inclusive previstos) e KPIs de um Projeto/Ano — o mesmo que o Painel mostra
+    com esses dois filtros. Roda num processo do pool; com `pasta_html`, grava a página do grupo."""
+    projeto, ano, df, hoje, pasta_html = tarefa
+    consumo, alertas = compute_consumo(df)
+    consumo = projetar_consumo(consumo, hoje)
+    alertas = pd.concat([alertas, alertas_previsao(consumo)], ignore_index=True)
+    status = consumo["Status"] if "Status" in consumo.columns else pd.Series(dtype=str)
+    resumo = {
+        "Projeto": projeto, "Ano": int(ano), **kpis_lancamentos(df),
+        "Lancamentos": len(df), "Orcamentos": int(consumo["Orc_ID"].nunique()) if not consumo.empty else 0,
+        "Estouros": int((status == "Estouro").sum()), "Alertas": len(alertas),
+    }
+    if pasta_html:
+        caminho = os.path.join(pasta_html, _nome_arquivo_relatorio(projeto, ano))
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write(html_relatorio(f"{projeto} · {ano}", resumo, consumo, alertas))
+    return {
+        "resumo": resumo,
+        "consumo": consumo,
+        "alertas": alertas.assign(Projeto=projeto, Ano=int(ano))[["Projeto", "Ano", "Tipo", "Mensagem"]],
+    }
+
+
+def gerar_relatorios(
+    df: pd.DataFrame,
+    saida: str,
+    formatos: Iterable[str],
+    processos: Optional[int] = None,
+    hoje: Optional[date] = None,
+    progresso=None,
+) -> pd.DataFrame:
+    """Relatórios de cada Projeto/Ano de `df`, calculados em paralelo num pool de processos.
+
+    Grava resumo/consumo/alertas consolidados em `saida` em cada formato tabular (FORMATOS_EXPORTACAO)
+    e, com "HTML", uma página por Projeto/Ano mais um index.html. `progresso(feitos, total, resumo)`
+    é chamado a cada grupo concluído. Retorna o resumo.
+    """
+    formatos = list(dict.fromkeys(formatos))
+    os.makedirs(saida, exist_ok=True)
+    pasta_html = os.path.join(saida, "html") if "HTML" in formatos else ""
+    if pasta_html:
+        os.makedirs(pasta_html, exist_ok=True)
+
+    base = df[df["Tipo"].isin(["Orçado", "Realizado"])][COLS_RELATORIO]
+    tarefas = [
+        (projeto, int(ano), parte, hoje, pasta_html)
+        for (projeto, ano), parte in base.groupby(["Projeto", "Ano"], sort=True)
+    ]
+    processos = max(1, min(processos or os.cpu_count() or 1, len(tarefas)))
+
+    resultados = []
+    if processos == 1:
+        for r in map(relatorio_projeto_ano, tarefas):
+            resultados.append(r)
+            if progresso:
+                progresso(len(resultados), len(tarefas), r["resumo"])
+    else:
+        lote = max(1, len(tarefas) // (processos * 4))
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            for r in pool.map(relatorio_projeto_ano, tarefas, chunksize=lote):
+                resultados.append(r)
+                if progresso:
+                    progresso(len(resultados), len(tarefas), r["resumo"])
+
+    resumo = pd.DataFrame([r["resumo"] for r in resultados], columns=[
+        "Projeto", "Ano", "Orcado", "Realizado", "Saldo", "Uso_%", "Projetos",
+        "Lancamentos", "Orcamentos", "Estouros", "Alertas",
+    ]).drop(columns="Projetos")
+    tabelas = {
+        "resumo": resumo,
+        "consumo": pd.concat([r["consumo"] for r in resultados if not r["consumo"].empty] or [pd.DataFrame()], ignore_index=True),
+        "alertas": pd.concat([r["alertas"] for r in resultados] or [pd.DataFrame(columns=["Projeto", "Ano", "Tipo", "Mensagem"])], ignore_index=True),
+    }
+    for formato in formatos:
+        if formato == "HTML":
+            continue
+        ext = FORMATOS_EXPORTACAO[formato][0]
+        for nome, tabela in tabelas.items():
+            gravar_exportacao(tabela, formato, os.path.join(saida, f"{nome}.{ext}"))
+
+    if pasta_html:
+        indice = resumo.assign(
+            Projeto=[
+                f"<a href='html/{html.escape(_nome_arquivo_relatorio(p, a))}'>{html.escape(p)}</a>"
+                for p, a in zip(resumo["Projeto"], resumo["Ano"])
+            ],
+            **{c: fmt_real_series(resumo[c]) for c in ("Orcado", "Realizado", "Saldo")},
+            **{"Uso_%": resumo["Uso_%"].map("{:.1f}%".format)},
+        )
+        with open(os.path.join(saida, "index.html"), "w", encoding="utf-8") as f:
+            f.write(
+                f"<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'><title>Relatórios</title>"
+                f"<style>{CSS_RELATORIO}</style></head><body><h1>Relatórios por Projeto/Ano</h1>"
+                f"<p>Gerado em {datetime.now():%d/%m/%Y %H:%M} · {len(resumo)} relatório(s).</p>"
+                f"{indice.to_html(index=False, border=0, escape=False)}</body></html>"
+            )
+    return resumo
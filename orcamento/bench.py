@@ -0,0 +1,238 @@
+"""Lançamentos sintéticos e benchmark das etapas de limpeza, consumo e filtros.
+
+`gerar_lancamentos` devolve linhas no formato lido do Sheets (cabeçalho + strings),
+com a sujeira que a limpeza precisa tratar; `medir_etapas` cronometra cada etapa e
+registra o pico de memória alocada nela (tracemalloc, numa execução à parte).
+"""
+
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from orcamento.agregado import IndiceCandidatos, build_orcamentos_table, compute_consumo
+from orcamento.config import COLS_LANC, MESES_PT
+from orcamento.dados import limpar_lancamentos
+from orcamento.indices import DIMENSOES_LANC, IndiceFiltros, IndiceTexto
+
+BENCH_TAMANHOS = (10_000, 100_000, 1_000_000)
+BENCH_COLUNAS = ["Linhas", "Etapa", "Segundos", "Pico_MB", "Linhas_s"]
+
+PROJETOS = [f"Projeto {i:02d}" for i in range(1, 41)]
+CATEGORIAS = [
+    "Passagens", "Hospedagem", "Alimentação", "Consultoria", "Licenças", "Equipamentos", "Eventos",
+    "Marketing", "Treinamento", "Serviços", "Manutenção", "Logística", "Locação", "Impostos", "Diversos",
+]
+# Grafias que normalize_tipo precisa reconhecer (caixa, acento, espaços e sinônimos).
+TIPOS_ORCADO = ["Orçado", "orçado", "orcado", "ORÇADO", " Planejado ", "planejado"]
+TIPOS_REALIZADO = ["Realizado", "realizado", "REALIZADO ", "Efetivado", " efetivado"]
+PALAVRAS = [
+    "reunião", "cliente", "viagem", "fornecedor", "contrato", "nota", "fiscal", "aditivo",
+    "visita", "técnica", "implantação", "suporte", "anual", "mensal", "revisão", "orçamento",
+]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Élida", "Fábio", "Gustavo", "Helena", "Íris", "João"]
+CONSULTAS_TEXTO = ("reuniao", "contrato anual", "joão viag")
+
+
+def _hex_ids(rng: np.random.Generator, n: int) -> np.ndarray:
+    alto = rng.integers(0, 2 ** 63, size=n, dtype=np.int64)
+    baixo = rng.integers(0, 2 ** 63, size=n, dtype=np.int64)
+    return np.array([f"{a:016x}{b:016x}" for a, b in zip(alto.tolist(), baixo.tolist())], dtype=object)
+
+
+def _moeda_mista(rng: np.random.Generator, centavos: np.ndarray) -> np.ndarray:
+    """Valores como digitados no Sheets: "R$ 1.234,56", "1234,56", "1.234,56", "1234.56", "1.234", "1234" ou vazio."""
+    formato = rng.integers(0, 7, size=len(centavos))
+    out = np.empty(len(centavos), dtype=object)
+    for i, (c, f) in enumerate(zip(centavos.tolist(), formato.tolist())):
+        inteiro, dec = divmod(c, 100)
+        milhar = f"{inteiro:,}".replace(",", ".")
+        if f == 0:
+            out[i] = f"R$ {milhar},{dec:02d}"
+        elif f == 1:
+            out[i] = f"{inteiro},{dec:02d}"
+        elif f == 2:
+            out[i] = f"{milhar},{dec:02d}"
+        elif f == 3:
+            out[i] = f"{inteiro}.{dec:02d}"
+        elif f == 4:
+            out[i] = f"R${milhar}" if inteiro >= 1000 else f"R${inteiro}"
+        elif f == 5:
+            out[i] = str(inteiro)
+        else:
+            out[i] = "" if c % 50 == 0 else f" {inteiro},{dec:02d} "
+    return out
+
+
+def _texto(rng: np.random.Generator, n: int, vocab: Sequence[str], palavras: int) -> np.ndarray:
+    escolhas = np.asarray(vocab, dtype=object)[rng.integers(0, len(vocab), size=(n, palavras))]
+    return np.array([" ".join(linha) for linha in escolhas.tolist()], dtype=object)
+
+
+def gerar_lancamentos(n: int, seed: int = 0, anos: Sequence[int] = (2023, 2024, 2025)) -> List[List[str]]:
+    """`n` linhas de lançamentos (+ cabeçalho COLS_LANC), como as devolvidas por get_all_values.
+
+    - ~40% Orçado em séries de parcelas (Grupo_ID comum, "k de n" em Parcela);
+    - Realizado vinculado (Orcado_Vinculo), sem vínculo no mês de um orçamento
+      (fallback) e sem orçamento algum (alerta);
+    - Tipo, Valor, Ano e Mês sujos ou vazios, e alguns Lanc_ID em branco.
+    """
+    rng = np.random.default_rng(seed)
+    anos = np.asarray(anos)
+
+    # Orçado: séries de 1 a 12 parcelas mensais.
+    n_orc = max(1, int(n * 0.4))
+    tamanhos = rng.integers(1, 13, size=n_orc)
+    tamanhos = tamanhos[:np.searchsorted(np.cumsum(tamanhos), n_orc) + 1]
+    tamanhos[-1] -= tamanhos.sum() - n_orc
+    serie = np.repeat(np.arange(len(tamanhos)), tamanhos)
+    k = np.arange(n_orc) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+    inicio = anos[rng.integers(0, len(anos), size=len(tamanhos))] * 12 + rng.integers(0, 12, size=len(tamanhos))
+    mes_abs_orc = inicio[serie] + k
+    proj_orc = rng.integers(0, len(PROJETOS), size=len(tamanhos))[serie]
+    cat_orc = rng.integers(0, len(CATEGORIAS), size=len(tamanhos))[serie]
+    ids_orc = _hex_ids(rng, n_orc)
+    grupos = _hex_ids(rng, len(tamanhos))
+    grupo_orc = np.where(tamanhos[serie] > 1, grupos[serie], "")
+    orc_id = np.where(grupo_orc != "", grupo_orc, ids_orc)
+
+    # Realizado: 60% vinculado, 30% sem vínculo num mês orçado, 10% fora de qualquer orçamento.
+    n_real = n - n_orc
+    ref = rng.integers(0, n_orc, size=n_real)
+    modo = rng.choice(3, size=n_real, p=[0.6, 0.3, 0.1])
+    mes_abs_real = mes_abs_orc[ref]
+    proj_real = proj_orc[ref]
+    cat_real = np.where(modo == 2, rng.integers(0, len(CATEGORIAS), size=n_real), cat_orc[ref])
+    vinculo = np.where(modo == 0, orc_id[ref], "")
+
+    orcado = np.r_[np.ones(n_orc, dtype=bool), np.zeros(n_real, dtype=bool)]
+    mes_abs = np.r_[mes_abs_orc, mes_abs_real]
+    ano, mes = mes_abs // 12, mes_abs % 12 + 1
+    dia = rng.integers(1, 29, size=n)
+    tipo = np.where(
+        orcado,
+        np.asarray(TIPOS_ORCADO, dtype=object)[rng.integers(0, len(TIPOS_ORCADO), size=n)],
+        np.asarray(TIPOS_REALIZADO, dtype=object)[rng.integers(0, len(TIPOS_REALIZADO), size=n)],
+    )
+    centavos = np.where(orcado, rng.integers(50_000, 5_000_000, size=n), rng.integers(1_000, 200_000, size=n))
+    parcela = np.r_[
+        pd.Series(k + 1).astype(str).to_numpy(dtype=object) + " de " + pd.Series(tamanhos[serie]).astype(str).to_numpy(dtype=object),
+        np.full(n_real, "", dtype=object),
+    ]
+    parcela[np.r_[tamanhos[serie] == 1, np.zeros(n_real, dtype=bool)]] = ""
+
+    nomes_mes = np.array([""] + [f"{m:02d} - {MESES_PT[m]}" for m in range(1, 13)], dtype=object)
+    sorteio = rng.random((3, n))
+    df = pd.DataFrame({
+        "Data": [f"{d:02d}/{m:02d}/{a}" for d, m, a in zip(dia.tolist(), mes.tolist(), ano.tolist())],
+        "Ano": np.where(sorteio[0] < 0.05, "", ano.astype(str).astype(object)),
+        "Mês": np.where(sorteio[1] < 0.10, "", nomes_mes[mes]),
+        "Tipo": tipo,
+        "Projeto": np.asarray(PROJETOS, dtype=object)[np.r_[proj_orc, proj_real]],
+        "Categoria": np.asarray(CATEGORIAS, dtype=object)[np.r_[cat_orc, cat_real]],
+        "Valor": _moeda_mista(rng, centavos),
+        "Descrição": _texto(rng, n, PALAVRAS, 3),
+        "Parcela": parcela,
+        "Abatido": np.where(orcado, "Não", ""),
+        "Envolvidos": _texto(rng, n, NOMES, 2),
+        "Info Gerais": np.where(sorteio[2] < 0.7, "", _texto(rng, n, PALAVRAS, 2)),
+        "Lanc_ID": np.r_[ids_orc, _hex_ids(rng, n_real)],
+        "Grupo_ID": np.r_[grupo_orc, np.full(n_real, "", dtype=object)],
+        "Orcado_Vinculo": np.r_[np.full(n_orc, "", dtype=object), vinculo],
+        "Criado_Em": "2025-01-01 00:00:00",
+    })
+    # Alguns Lanc_ID em branco (linhas antigas): a limpeza gera um id para cada.
+    sem_id = rng.random(n) < 0.02
+    df.loc[sem_id & ~(df["Lanc_ID"].isin(set(vinculo.tolist()))).to_numpy(), "Lanc_ID"] = ""
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    return [list(COLS_LANC)] + df[COLS_LANC].to_numpy(dtype=object).tolist()
+
+
+def _medir(fn: Callable, repeticoes: int, memoria: bool):
+    """(resultado, melhor tempo em s, pico alocado em MB ou NaN)."""
+    melhor, res = float("inf"), None
+    for _ in range(max(1, repeticoes)):
+        t0 = time.perf_counter()
+        res = fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    pico = float("nan")
+    if memoria:
+        del res
+        tracemalloc.start()
+        try:
+            res = fn()
+            pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return res, melhor, pico
+
+
+def consultas_filtros(df: pd.DataFrame, indice: IndiceFiltros) -> List[dict]:
+    """Combinações de filtros medidas (ano mais frequente, com e sem outras dimensões)."""
+    ano = int(df["Ano"].mode().iloc[0])
+    return [
+        {"Ano": [ano]},
+        {"Ano": [ano], "Projeto": PROJETOS[:3]},
+        {"Ano": [ano], "Mês": indice.opcoes("Mês")[:3], "Tipo": ["Realizado"]},
+        {"Projeto": PROJETOS[:10], "Categoria": CATEGORIAS[:5]},
+    ]
+
+
+def medir_etapas(values: List[List[str]], repeticoes: int = 1, memoria: bool = True) -> pd.DataFrame:
+    """Tempo e pico de memória de cada etapa, na ordem em que o app as executa."""
+    linhas = len(values) - 1
+    out = []
+
+    def _etapa(nome: str, fn: Callable, n: int = linhas):
+        res, seg, pico = _medir(fn, repeticoes, memoria)
+        out.append({"Linhas": linhas, "Etapa": nome, "Segundos": seg, "Pico_MB": pico,
+                    "Linhas_s": n / seg if seg else float("nan")})
+        return res
+
+    df = _etapa("limpar_lancamentos", lambda: limpar_lancamentos(values).assign(Shard="principal"))
+    candidatos = _etapa("orcamentos", lambda: IndiceCandidatos(build_orcamentos_table(df)))
+    _etapa("compute_consumo", lambda: compute_consumo(df, candidatos))
+    indice = _etapa("indice_filtros", lambda: IndiceFiltros(df, DIMENSOES_LANC))
+
+    consultas = consultas_filtros(df, indice)
+    _etapa("filtrar", lambda: [indice.filtrar(f) for f in consultas], n=linhas * len(consultas))
+    texto = _etapa("indice_texto", lambda: IndiceTexto.construir(df))
+    _etapa("buscar", lambda: [texto.buscar(q) for q in CONSULTAS_TEXTO], n=linhas * len(CONSULTAS_TEXTO))
+    return pd.DataFrame(out, columns=BENCH_COLUNAS)
+
+
+def comparar(atual: pd.DataFrame, base: pd.DataFrame, tolerancia: float) -> pd.DataFrame:
+    """Razão atual/base do tempo por (Linhas, Etapa); Regressao quando passa de `tolerancia`."""
+    cmp = atual.merge(base[["Linhas", "Etapa", "Segundos", "Pico_MB"]], on=["Linhas", "Etapa"],
+                      how="left", suffixes=("", "_Base"))
+    cmp["Razao"] = cmp["Segundos"] / cmp["Segundos_Base"]
+    cmp["Regressao"] = cmp["Razao"] > tolerancia
+    return cmp
+
+
+def rodar_bench(tamanhos: Sequence[int], seed: int = 0, repeticoes: int = 1, memoria: bool = True,
+                progresso: Optional[Callable[[pd.DataFrame], None]] = None) -> pd.DataFrame:
+    """Gera os dados de cada tamanho e mede as etapas; `progresso(parcial)` a cada tamanho."""
+    partes = []
+    for n in tamanhos:
+        values = gerar_lancamentos(n, seed=seed)
+        parcial = medir_etapas(values, repeticoes=repeticoes, memoria=memoria)
+        del values
+        if progresso:
+            progresso(parcial)
+        partes.append(parcial)
+    return pd.concat(partes, ignore_index=True)
+
+
+def tabela_bench(df: pd.DataFrame) -> str:
+    vis = df.copy()
+    vis["Segundos"] = vis["Segundos"].map(lambda v: f"{v:.3f}")
+    vis["Pico_MB"] = vis["Pico_MB"].map(lambda v: "-" if pd.isna(v) else f"{v:.1f}")
+    vis["Linhas_s"] = vis["Linhas_s"].map(lambda v: f"{v:,.0f}".replace(",", "."))
+    if "Razao" in vis.columns:
+        vis["Razao"] = vis["Razao"].map(lambda v: "-" if pd.isna(v) else f"{v:.2f}x")
+    cols = [c for c in [*BENCH_COLUNAS, "Razao"] if c in vis.columns]
+    return vis[cols].to_string(index=False)
+
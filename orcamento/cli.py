@@ -0,0 +1,108 @@
+"""Comandos de `python -m orcamento`; `relatorios` é compartilhado com `python AppOrc.py` (+ Sheets)."""
+
+import argparse
+import os
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from orcamento.agregado import gerar_relatorios
+from orcamento.bench import BENCH_TAMANHOS, comparar, rodar_bench, tabela_bench
+from orcamento.config import FORMATOS_EXPORTACAO, RELATORIOS_DIR
+from orcamento.dados import ler_lancamentos_arquivo, ler_snapshots
+from orcamento.exportacao import formatos_exportacao
+
+
+def argumentos_relatorios(parser: argparse.ArgumentParser, origens: List[str]):
+    parser.add_argument("--origem", choices=origens, default=origens[0],
+                        help=f"De onde ler os lançamentos (padrão: {origens[0]}).")
+    parser.add_argument("--arquivo", help="CSV/Parquet/pickle de lançamentos (com --origem arquivo).")
+    parser.add_argument("--ano", type=int, action="append", help="Ano a incluir (padrão: todos).")
+    parser.add_argument("--projeto", action="append", help="Projeto a incluir (padrão: todos).")
+    parser.add_argument("--formato", action="append", choices=[*FORMATOS_EXPORTACAO, "HTML"],
+                        help="Formato de saída; repita para vários (padrão: CSV e HTML).")
+    parser.add_argument("--saida", help=f"Pasta de saída (padrão: {RELATORIOS_DIR}/<data_hora>).")
+    parser.add_argument("--processos", type=int, help="Processos do pool (padrão: núcleos da máquina).")
+    parser.add_argument("--data-base", help="Data (dd/mm/aaaa) usada nas projeções de estouro (padrão: hoje).")
+
+
+def rodar_relatorios(args: argparse.Namespace, carregar_sheets: Optional[Callable[[List[int]], pd.DataFrame]] = None) -> int:
+    """Carrega os lançamentos da origem escolhida e gera os relatórios; `carregar_sheets(anos)` atende --origem sheets."""
+    formatos = args.formato or ["CSV", "HTML"]
+    faltando = [f for f in formatos if f != "HTML" and f not in formatos_exportacao()]
+    if faltando:
+        print(f"Formato(s) sem o módulo necessário instalado: {', '.join(faltando)}.")
+        return 1
+    if args.origem == "arquivo" and not args.arquivo:
+        print("--origem arquivo exige --arquivo.")
+        return 1
+    hoje = datetime.strptime(args.data_base, "%d/%m/%Y").date() if args.data_base else None
+
+    if args.origem == "sheets":
+        df = carregar_sheets(args.ano or [])
+    elif args.origem == "snapshots":
+        df = ler_snapshots(args.ano or ())
+    else:
+        df = ler_lancamentos_arquivo(args.arquivo)
+        if args.ano:
+            df = df[df["Ano"].isin(args.ano)]
+    if args.projeto and not df.empty:
+        df = df[df["Projeto"].isin(args.projeto)]
+    if df.empty:
+        print("Sem lançamentos para os filtros informados.")
+        return 1
+
+    saida = args.saida or os.path.join(RELATORIOS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+    def _progresso(feitos, total, r):
+        print(f"[{feitos}/{total}] {r['Projeto']} {r['Ano']}: {r['Estouros']} estouro(s), {r['Alertas']} alerta(s)", flush=True)
+
+    resumo = gerar_relatorios(df, saida, formatos, processos=args.processos, hoje=hoje, progresso=_progresso)
+    print(f"{len(resumo)} relatório(s) em {saida} ({', '.join(formatos)}); "
+          f"{int(resumo['Estouros'].sum())} estouro(s), {int(resumo['Alertas'].sum())} alerta(s).")
+    return 0
+
+
+def rodar_bench_cli(args: argparse.Namespace) -> int:
+    """Mede as etapas em cada tamanho; com --base, sai com 1 se alguma etapa ficou mais lenta que a tolerância."""
+    base = pd.read_csv(args.base) if args.base else None
+
+    def _progresso(parcial):
+        print(tabela_bench(parcial), end="\n\n", flush=True)
+
+    res = rodar_bench(args.linhas or BENCH_TAMANHOS, seed=args.seed, repeticoes=args.repeticoes,
+                      memoria=not args.sem_memoria, progresso=_progresso)
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        res.to_csv(args.saida, index=False)
+        print(f"Resultado gravado em {args.saida}.")
+    if base is None:
+        return 0
+    cmp = comparar(res, base, args.tolerancia)
+    print(tabela_bench(cmp))
+    regressoes = cmp[cmp["Regressao"]]
+    for _, r in regressoes.iterrows():
+        print(f"Regressão: {r['Etapa']} com {r['Linhas']} linhas levou {r['Razao']:.2f}x o tempo da base.")
+    return 1 if len(regressoes) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m orcamento", description="Tarefas do Controle Orçamentário sem o Sheets.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_rel = sub.add_parser("relatorios", help="Gera os relatórios de consumo e alertas de cada Projeto/Ano a partir de dados locais.")
+    argumentos_relatorios(p_rel, ["snapshots", "arquivo"])
+    p_bench = sub.add_parser("bench", help="Mede limpeza, consumo e filtros sobre lançamentos sintéticos de vários tamanhos.")
+    p_bench.add_argument("--linhas", type=int, action="append",
+                         help=f"Tamanho a medir; repita para vários (padrão: {', '.join(map(str, BENCH_TAMANHOS))}).")
+    p_bench.add_argument("--seed", type=int, default=0, help="Semente do gerador (padrão: 0).")
+    p_bench.add_argument("--repeticoes", type=int, default=1, help="Execuções por etapa; vale o melhor tempo (padrão: 1).")
+    p_bench.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (pula a execução com tracemalloc).")
+    p_bench.add_argument("--saida", help="CSV onde gravar o resultado (para usar depois como --base).")
+    p_bench.add_argument("--base", help="CSV de uma execução anterior para comparar os tempos.")
+    p_bench.add_argument("--tolerancia", type=float, default=1.25,
+                         help="Razão tempo/base acima da qual a etapa conta como regressão (padrão: 1.25).")
+    args = parser.parse_args(argv)
+    if args.comando == "bench":
+        return rodar_bench_cli(args)
+    return rodar_relatorios(args)
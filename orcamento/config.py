@@ -0,0 +1,87 @@
+"""Constantes de schema, caminhos locais e parâmetros de lote (sem dependência de UI)."""
+
+import os
+import re
+
+MESES_PT = {
+    1: "JANEIRO", 2: "FEVEREIRO", 3: "MARÇO", 4: "ABRIL",
+    5: "MAIO", 6: "JUNHO", 7: "JULHO", 8: "AGOSTO",
+    9: "SETEMBRO", 10: "OUTUBRO", 11: "NOVEMBRO", 12: "DEZEMBRO"
+}
+MESES_CURTOS = {m: nome[:3].title() for m, nome in MESES_PT.items()}  # colunas da grade de planejamento
+
+SHEET_NAME = "dados_app_orcamento"
+
+# Shards: uma planilha por unidade de negócio / centro de custo, cada uma com
+# suas próprias abas de lançamentos/cadastros/envolvidos. Configure em
+# secrets.toml ([[shards]] nome, planilha, projetos) ou ORC_SHARDS (JSON).
+SHARDS_PADRAO = [{"nome": "principal", "planilha": SHEET_NAME, "projetos": []}]
+TAB_LANC = "lançamentos"
+TAB_LANC_FALLBACK = ["lancamentos", "Lancamentos", "LANÇAMENTOS", "Lançamentos"]
+TAB_CAD = "cadastros"
+TAB_ENV = "envolvidos"
+TAB_LOG = "logs"
+
+# Partições anuais de lançamentos: uma aba por ano ("lançamentos_2025").
+# A aba única antiga (TAB_LANC) continua sendo lida como "legado" até ser
+# particionada com `python AppOrc.py particionar`.
+TAB_LANC_ANO = "lançamentos_{ano}"
+TAB_LANC_ARQUIVO = "lançamentos_legado_arquivo"
+PARTICAO_RE = re.compile(r"^lan[cç]amentos[_ ](\d{4})$", re.IGNORECASE)
+
+# Anos fechados (anteriores ao ano corrente) viram snapshots locais imutáveis.
+DATA_DIR = os.getenv("ORC_DATA_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".orcamento")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+
+# Journal local (write-ahead): gravações vão primeiro para o SQLite e um
+# replayer em segundo plano as envia ao Sheets em lotes.
+JOURNAL_PATH = os.path.join(DATA_DIR, "journal.sqlite3")
+JOURNAL_INTERVALO = 5          # segundos entre rodadas do replayer
+JOURNAL_MAX_TENTATIVAS = 5     # depois disso a entrada fica como "falha"
+JOURNAL_RETENCAO_DIAS = 7      # entradas já enviadas são apagadas depois disso
+
+# Razão local por orçamento: consumo mantido incrementalmente a cada gravação
+# e conferido periodicamente contra um compute_consumo completo.
+RAZAO_PATH = os.path.join(DATA_DIR, "razao.sqlite3")
+RAZAO_VERIFICACAO_INTERVALO = 3600   # segundos entre conferências completas
+
+# Migração de schema (explícita, via CLI): colunas derivadas preenchidas em lotes.
+MIGRACAO_DIR = os.path.join(DATA_DIR, "migracoes")
+MIGRACAO_PREENCHER = ["Lanc_ID", "Ano", "Mês"]
+
+# Exportações geradas só no clique, em lotes, e guardadas por versão dos dados + filtro.
+EXPORTACAO_DIR = os.path.join(DATA_DIR, "exportacoes")
+EXPORTACAO_LOTE = 50_000          # linhas por lote gravado
+EXPORTACAO_MAX_ARQUIVOS = 20      # arquivos mantidos (os mais antigos são apagados)
+FORMATOS_EXPORTACAO = {
+    # rótulo: (extensão, mime, módulo opcional necessário)
+    "CSV": ("csv", "text/csv", None),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", "pyarrow"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "openpyxl"),
+}
+
+# Importação em lote: o arquivo é lido e validado em blocos; o envio ao Sheets
+# é fatiado em appends menores, com pausa entre eles, para caber na cota de escrita.
+IMPORTACAO_LOTE = 5000            # linhas do arquivo lidas/validadas por vez
+IMPORTACAO_MAX_PARCELAS = 120
+COLS_IMPORTACAO = [
+    "Data", "Tipo", "Projeto", "Categoria", "Valor", "Parcelas",
+    "Descrição", "Envolvidos", "Info Gerais", "Orcado_Vinculo",
+]
+COLS_IMPORTACAO_OBRIG = ["Data", "Tipo", "Projeto", "Categoria", "Valor"]
+SHEETS_APPEND_LOTE = 2000         # linhas por append_rows
+SHEETS_APPEND_PAUSA = 1.0         # segundos entre appends de um mesmo lote
+
+# Relatórios em lote (`python AppOrc.py relatorios`): um por Projeto/Ano, num pool de processos.
+RELATORIOS_DIR = os.path.join(DATA_DIR, "relatorios")
+COLS_RELATORIO = [  # colunas que os processos do pool recebem (o que compute_consumo usa)
+    "Tipo", "Ano", "Mês", "Mes_Num", "Projeto", "Categoria", "Valor_num",
+    "Lanc_ID", "Grupo_ID", "Orcado_Vinculo",
+]
+
+COLS_LANC = [
+    "Data", "Ano", "Mês", "Tipo", "Projeto", "Categoria",
+    "Valor", "Descrição", "Parcela", "Abatido",
+    "Envolvidos", "Info Gerais",
+    "Lanc_ID", "Grupo_ID", "Orcado_Vinculo", "Criado_Em"
+]
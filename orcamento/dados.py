@@ -0,0 +1,408 @@
+"""Helpers de formato, limpeza das linhas do Sheets, snapshots locais e validação de importação."""
+
+import os
+import re
+import unicodedata
+import uuid
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from orcamento.config import (
+    COLS_IMPORTACAO, COLS_LANC, IMPORTACAO_LOTE, IMPORTACAO_MAX_PARCELAS, MESES_CURTOS, MESES_PT, SNAPSHOT_DIR,
+)
+
+
+def now_iso() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def uuid4() -> str:
+    return str(uuid.uuid4())
+
+
+def mes_str_from_date(d: date) -> str:
+    return f"{d.month:02d} - {MESES_PT[d.month]}"
+
+
+def mes_num(m: str) -> int:
+    try:
+        return int(str(m).split(" - ")[0])
+    except Exception:
+        return 0
+
+
+def fmt_real(v) -> str:
+    try:
+        v = float(v)
+    except Exception:
+        v = 0.0
+    if v < 0:
+        return f"-R$ {abs(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def fmt_real_series(s: pd.Series) -> pd.Series:
+    """fmt_real vetorizado (mesmo formato "R$ 1.234,56" e mesmo arredondamento do `:.2f`)."""
+    v = pd.to_numeric(s, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    # %.2f arredonda o valor binário exato, como o format de fmt_real (1234.565 -> 1234.57, 2.675 -> 2.67).
+    txt = pd.Series(np.char.mod("%.2f", np.where(v < 0, -v, v)).astype(str))
+    inteiro = txt.str[:-3].str.replace(r"\B(?=(\d{3})+(?!\d))", ".", regex=True)
+    decimal = txt.str[-2:]
+    sinal = pd.Series(np.where(v < 0, "-", ""))
+    return (sinal + "R$ " + inteiro + "," + decimal).set_axis(s.index)
+
+
+def normalizar_nome(v) -> str:
+    """Forma de comparação de nomes: sem acentos, casefold e espaços colapsados."""
+    s = unicodedata.normalize("NFKD", str(v))
+    return " ".join("".join(ch for ch in s if not unicodedata.combining(ch)).casefold().split())
+
+
+def normalizar_nome_series(s: pd.Series) -> pd.Series:
+    """normalizar_nome aplicado uma vez por valor distinto."""
+    return s.map({v: normalizar_nome(v) for v in s.unique()})
+
+
+def chave_cadastro(tipo: str, nome: str) -> Tuple[str, str]:
+    return normalizar_nome(tipo), normalizar_nome(nome)
+
+
+def pct(realizado, orcado) -> float:
+    try:
+        realizado = float(realizado)
+        orcado = float(orcado)
+    except Exception:
+        return 0.0
+    return (realizado / orcado * 100.0) if orcado else 0.0
+
+
+def moeda_to_float_series(s: pd.Series) -> pd.Series:
+    if s is None or len(s) == 0:
+        return pd.Series([], dtype="float64")
+
+    x = s.astype(str).fillna("").str.strip()
+    x = x.replace({"": "0", "None": "0", "nan": "0", "NaN": "0"})
+    x = x.str.replace("R$", "", regex=False).str.replace(" ", "", regex=False)
+
+    has_comma = x.str.contains(",", regex=False)
+    x = x.where(~has_comma, x.str.replace(".", "", regex=False))
+    x = x.where(~has_comma, x.str.replace(",", ".", regex=False))
+
+    dot_count = x.str.count(r"\.")
+    maybe_thousand = (dot_count == 1) & (x.str.split(".").str[-1].str.len() == 3)
+    x = x.where(~maybe_thousand, x.str.replace(".", "", regex=False))
+
+    return pd.to_numeric(x, errors="coerce").fillna(0.0).astype(float)
+
+
+def normalize_text_cols(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    for c in cols:
+        if c in df.columns:
+            df[c] = df[c].astype(str).fillna("").str.strip()
+    return df
+
+
+def normalize_tipo(df: pd.DataFrame) -> pd.DataFrame:
+    if "Tipo" not in df.columns:
+        return df
+    m = {
+        "orcado": "Orçado",
+        "orçado": "Orçado",
+        "planejado": "Orçado",
+        "realizado": "Realizado",
+        "efetivado": "Realizado",
+    }
+    df["Tipo"] = (
+        df["Tipo"]
+        .astype(str)
+        .fillna("")
+        .str.strip()
+        .apply(lambda v: m.get(v.lower(), v))
+    )
+    return df
+
+
+def derive_year_from_date(df: pd.DataFrame) -> pd.DataFrame:
+    df["Data_dt"] = pd.to_datetime(df.get("Data", ""), format="%d/%m/%Y", errors="coerce")
+
+    if "Ano" not in df.columns:
+        df["Ano"] = np.nan
+
+    ano_num = pd.to_numeric(df["Ano"], errors="coerce")
+    ano_from_data = df["Data_dt"].dt.year
+    ano_final = ano_num.where(~ano_num.isna(), ano_from_data)
+
+    df["Ano_Invalido"] = ano_final.isna()
+    df["Ano"] = ano_final.fillna(date.today().year).astype(int)
+    return df
+
+
+def ensure_month_consistency(df: pd.DataFrame) -> pd.DataFrame:
+    if "Mês" not in df.columns:
+        df["Mês"] = ""
+    mask = (df["Mês"].astype(str).str.strip() == "") & (df["Data_dt"].notna())
+    df.loc[mask, "Mês"] = df.loc[mask, "Data_dt"].dt.month.apply(
+        lambda m: f"{int(m):02d} - {MESES_PT[int(m)]}"
+    )
+    return df
+
+
+def limpar_lancamentos(values: List[List[str]]) -> pd.DataFrame:
+    header = [h.strip() for h in (values[0] if values else COLS_LANC)]
+    body = values[1:] if len(values) > 1 else []
+    df_lanc = pd.DataFrame(body, columns=header) if body else pd.DataFrame(columns=header)
+
+    for c in COLS_LANC:
+        if c not in df_lanc.columns:
+            df_lanc[c] = ""
+
+    df_lanc = normalize_text_cols(df_lanc, [
+        "Projeto", "Categoria", "Descrição", "Envolvidos", "Info Gerais",
+        "Parcela", "Abatido", "Lanc_ID", "Grupo_ID", "Orcado_Vinculo", "Criado_Em", "Mês"
+    ])
+    df_lanc = normalize_tipo(df_lanc)
+
+    df_lanc["Valor_num"] = moeda_to_float_series(df_lanc["Valor"]) if "Valor" in df_lanc.columns else 0.0
+
+    df_lanc = derive_year_from_date(df_lanc)
+    df_lanc = ensure_month_consistency(df_lanc)
+
+    df_lanc["Mes_Num"] = df_lanc["Mês"].apply(mes_num)
+
+    # Lanc_ID vazio na planilha: id gerado a cada leitura, até `migrar` gravá-lo.
+    df_lanc["Lanc_ID_Provisorio"] = df_lanc["Lanc_ID"] == ""
+    df_lanc["Lanc_ID"] = df_lanc["Lanc_ID"].replace({"": np.nan}).fillna(
+        df_lanc.apply(lambda _: uuid4(), axis=1)
+    )
+    df_lanc["Grupo_ID"] = df_lanc["Grupo_ID"].replace({"": np.nan}).fillna("")
+    df_lanc["Orcado_Vinculo"] = df_lanc["Orcado_Vinculo"].replace({"": np.nan}).fillna("")
+    return df_lanc
+
+
+def lanc_id_provisorio(df: pd.DataFrame) -> pd.Series:
+    """Linhas cujo Lanc_ID foi gerado na leitura (vazio na planilha); snapshots antigos não têm a coluna."""
+    if "Lanc_ID_Provisorio" not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df["Lanc_ID_Provisorio"].fillna(False).astype(bool)
+
+
+def tipar_envolvidos(df_env: pd.DataFrame) -> pd.DataFrame:
+    """Ano/Mes_Num inteiros e Horas numérico (aceita "7,5"); o resto continua texto."""
+    if df_env.empty:
+        return df_env.assign(Mes_Num=pd.Series(dtype=int), Horas=pd.Series(dtype=float))
+    return df_env.assign(
+        Ano=pd.to_numeric(df_env["Ano"], errors="coerce").fillna(0).astype(int),
+        Mes_Num=df_env["Mês"].map(mes_num).astype(int),
+        Horas=pd.to_numeric(df_env["Horas"].astype(str).str.replace(",", ".", regex=False), errors="coerce").fillna(0.0),
+    )
+
+
+def ano_fechado(ano: int) -> bool:
+    return int(ano) < date.today().year
+
+
+def caminho_snapshot(shard: str, ano: int) -> str:
+    pasta = re.sub(r"[^\w-]", "_", shard)
+    return os.path.join(SNAPSHOT_DIR, pasta, f"lancamentos_{int(ano)}.pkl")
+
+
+def ler_snapshot(shard: str, ano: int) -> Optional[pd.DataFrame]:
+    caminho = caminho_snapshot(shard, ano)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        return pd.read_pickle(caminho)
+    except Exception:
+        return None
+
+
+def gravar_snapshot(shard: str, ano: int, df: pd.DataFrame):
+    caminho = caminho_snapshot(shard, ano)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tmp = f"{caminho}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, caminho)
+
+
+def descartar_snapshot(shard: str, ano: int):
+    try:
+        os.remove(caminho_snapshot(shard, ano))
+    except FileNotFoundError:
+        pass
+
+
+def ler_snapshots(anos: Iterable[int] = ()) -> pd.DataFrame:
+    """Lançamentos dos snapshots locais (anos fechados), sem conexão com o Sheets."""
+    anos = {int(a) for a in anos}
+    partes = []
+    pastas = sorted(os.listdir(SNAPSHOT_DIR)) if os.path.isdir(SNAPSHOT_DIR) else []
+    for shard in pastas:
+        for arquivo in sorted(os.listdir(os.path.join(SNAPSHOT_DIR, shard))):
+            m = re.fullmatch(r"lancamentos_(\d{4})\.pkl", arquivo)
+            if m and (not anos or int(m.group(1)) in anos):
+                df = ler_snapshot(shard, int(m.group(1)))
+                if df is not None and not df.empty:
+                    partes.append(df.assign(Shard=shard))
+    if not partes:
+        return limpar_lancamentos([]).assign(Shard="")
+    return pd.concat(partes, ignore_index=True)
+
+
+def ler_lancamentos_arquivo(caminho: str) -> pd.DataFrame:
+    """Lançamentos de um arquivo local: pickle/Parquet já limpos (snapshot, exportação) ou
+    CSV/Parquet no formato das abas (COLS_LANC), que passa por limpar_lancamentos."""
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext in (".pkl", ".pickle"):
+        df = pd.read_pickle(caminho)
+    elif ext == ".parquet":
+        df = pd.read_parquet(caminho)
+    else:
+        df = pd.read_csv(caminho, dtype=str, keep_default_na=False, sep=None, engine="python")
+    if "Valor_num" not in df.columns or not pd.api.types.is_numeric_dtype(df["Valor_num"]):
+        texto = df.astype(object).where(df.notna(), "").astype(str)
+        df = limpar_lancamentos([list(texto.columns)] + texto.values.tolist())
+    if "Shard" not in df.columns:
+        df["Shard"] = ""
+    return df
+
+
+def _celula_importacao(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.strftime("%d/%m/%Y")
+    return str(v)
+
+
+def ler_arquivo_importacao(arquivo, nome: str) -> Iterable[pd.DataFrame]:
+    """Lê CSV (`;` ou `,`) ou XLSX em blocos de IMPORTACAO_LOTE linhas, tudo como texto."""
+    if isinstance(arquivo, str):
+        arquivo = open(arquivo, "rb")
+    with arquivo:
+        if nome.lower().endswith(".xlsx"):
+            from openpyxl import load_workbook
+
+            wb = load_workbook(arquivo, read_only=True, data_only=True)
+            linhas = wb.worksheets[0].iter_rows(values_only=True)
+            header = [_celula_importacao(h).strip() for h in next(linhas, ())]
+            bloco = []
+            for linha in linhas:
+                bloco.append([_celula_importacao(v) for v in linha[:len(header)]])
+                if len(bloco) == IMPORTACAO_LOTE:
+                    yield pd.DataFrame(bloco, columns=header)
+                    bloco = []
+            if bloco:
+                yield pd.DataFrame(bloco, columns=header)
+            wb.close()
+        else:
+            primeira = arquivo.readline().decode("utf-8-sig", errors="replace")
+            arquivo.seek(0)
+            sep = ";" if primeira.count(";") > primeira.count(",") else ","
+            yield from pd.read_csv(
+                arquivo, sep=sep, dtype=str, keep_default_na=False,
+                encoding="utf-8-sig", chunksize=IMPORTACAO_LOTE,
+            )
+
+
+def validar_importacao(df: pd.DataFrame, catalogo: Dict, inicio: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Separa o bloco em linhas válidas e rejeitadas (com Linha do arquivo e Motivo)."""
+    df = df.rename(columns=lambda c: str(c).strip())
+    for c in COLS_IMPORTACAO:
+        df[c] = df[c].astype(str).str.strip() if c in df.columns else ""
+    df = normalize_tipo(df[COLS_IMPORTACAO].reset_index(drop=True))
+    df.insert(0, "Linha", np.arange(inicio + 2, inicio + 2 + len(df)))
+    for c in ("Projeto", "Categoria"):
+        # Grafia cadastrada para variações de caixa/acento/espaços ("reforma  sede" -> "Reforma Sede").
+        canonico = {n: nome for (t, n), nome in catalogo["chaves"].items() if t == c.lower()}
+        df[c] = normalizar_nome_series(df[c]).map(canonico).fillna(df[c])
+
+    data = pd.to_datetime(df["Data"], format="%d/%m/%Y", errors="coerce")
+    data = data.fillna(pd.to_datetime(df["Data"], format="%Y-%m-%d", errors="coerce"))
+    valor = moeda_to_float_series(df["Valor"])
+    parcelas = pd.to_numeric(df["Parcelas"].replace("", "1"), errors="coerce")
+
+    motivos = pd.Series("", index=df.index)
+    checagens = [
+        (df["Data"] == "", "Data vazia"),
+        ((df["Data"] != "") & data.isna(), "Data inválida (use dd/mm/aaaa)"),
+        (~df["Tipo"].isin(["Orçado", "Realizado"]), "Tipo deve ser Orçado ou Realizado"),
+        (~df["Projeto"].isin(catalogo["projeto"]), "Projeto não cadastrado"),
+        (~df["Categoria"].isin(catalogo["categoria"]), "Categoria não cadastrada"),
+        (valor <= 0, "Valor inválido ou não positivo"),
+        (parcelas.isna() | (parcelas % 1 != 0) | (parcelas < 1) | (parcelas > IMPORTACAO_MAX_PARCELAS),
+         f"Parcelas deve ser inteiro entre 1 e {IMPORTACAO_MAX_PARCELAS}"),
+        ((df["Tipo"] == "Orçado") & (df["Orcado_Vinculo"] != ""), "Orcado_Vinculo só vale para Realizado"),
+    ]
+    for falha, motivo in checagens:
+        motivos = motivos.where(~falha, motivos + motivo + "; ")
+
+    ok = motivos == ""
+    rejeitadas = df[~ok].assign(Motivo=motivos[~ok].str.rstrip("; "))
+    validas = df[ok].assign(Data_dt=data[ok], Valor_num=valor[ok], Parcelas=parcelas[ok].astype(int))
+    return validas, rejeitadas[["Linha", "Motivo", *COLS_IMPORTACAO]]
+
+
+def expandir_parcelas(validas: pd.DataFrame) -> List[List]:
+    """Uma linha de lançamento por parcela (mesmo dia nos meses seguintes, como em Novo)."""
+    if validas.empty:
+        return []
+    n = validas["Parcelas"].to_numpy()
+    origem = np.repeat(np.arange(len(validas)), n)
+    k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    base = validas.iloc[origem].reset_index(drop=True)
+
+    meses = base["Data_dt"].dt.year.to_numpy() * 12 + base["Data_dt"].dt.month.to_numpy() - 1 + k
+    inicio_mes = pd.to_datetime(pd.DataFrame({"year": meses // 12, "month": meses % 12 + 1, "day": 1}))
+    dia = np.minimum(base["Data_dt"].dt.day.to_numpy(), inicio_mes.dt.days_in_month.to_numpy())
+    datas = inicio_mes + pd.to_timedelta(dia - 1, unit="D")
+
+    if "Grupo_ID" in validas.columns:
+        grupos = validas["Grupo_ID"].to_numpy(dtype=object)
+    else:
+        grupos = np.array([uuid4() for _ in range(len(validas))], dtype=object)
+    out = pd.DataFrame({
+        "Data": datas.dt.strftime("%d/%m/%Y"),
+        "Ano": datas.dt.year.astype(object),
+        "Mês": datas.dt.month.map(lambda m: f"{m:02d} - {MESES_PT[m]}"),
+        "Tipo": base["Tipo"],
+        "Projeto": base["Projeto"],
+        "Categoria": base["Categoria"],
+        "Valor": fmt_real_series(base["Valor_num"]),
+        "Descrição": base["Descrição"],
+        "Parcela": pd.Series(k + 1).astype(str) + " de " + base["Parcelas"].astype(str),
+        "Abatido": "Não",
+        "Envolvidos": base["Envolvidos"],
+        "Info Gerais": base["Info Gerais"],
+        "Lanc_ID": [uuid4() for _ in range(len(base))],
+        "Grupo_ID": grupos[origem],
+        "Orcado_Vinculo": base["Orcado_Vinculo"].where(base["Tipo"] == "Realizado", ""),
+        "Criado_Em": now_iso(),
+    })
+    return out[COLS_LANC].to_numpy(dtype=object).tolist()
+
+
+def linhas_planejamento(grade: pd.DataFrame, ano: int, descricao: str = "") -> List[List]:
+    """Uma linha "Orçado" (dia 1º) por célula preenchida da grade Projeto × Categoria × mês.
+
+    Cada linha da grade vira um Grupo_ID, para o ano planejado poder ser tratado em bloco.
+    """
+    grade = grade.dropna(subset=["Projeto", "Categoria"])
+    grade = grade[(grade["Projeto"] != "") & (grade["Categoria"] != "")].reset_index(drop=True)
+    if grade.empty:
+        return []
+    grade = grade.assign(Grupo_ID=[uuid4() for _ in range(len(grade))])
+    longa = grade.melt(
+        id_vars=["Projeto", "Categoria", "Grupo_ID"], value_vars=list(MESES_CURTOS.values()),
+        var_name="Mes_Curto", value_name="Valor_num",
+    )
+    longa["Valor_num"] = pd.to_numeric(longa["Valor_num"], errors="coerce").fillna(0.0)
+    longa = longa[longa["Valor_num"] > 0]
+    mes = longa["Mes_Curto"].map({v: k for k, v in MESES_CURTOS.items()})
+    validas = longa.assign(
+        Data_dt=pd.to_datetime(pd.DataFrame({"year": ano, "month": mes, "day": 1})),
+        Tipo="Orçado", Parcelas=1, Descrição=descricao, Envolvidos="", **{"Info Gerais": ""}, Orcado_Vinculo="",
+    )
+    return expandir_parcelas(validas)
@@ -0,0 +1,72 @@
+"""Gravação de tabelas em CSV/Parquet/XLSX em lotes, com cache de arquivos por assinatura."""
+
+import hashlib
+import importlib.util
+import os
+import threading
+from typing import List, Tuple
+
+import pandas as pd
+
+from orcamento.config import EXPORTACAO_DIR, EXPORTACAO_LOTE, EXPORTACAO_MAX_ARQUIVOS, FORMATOS_EXPORTACAO
+
+
+def formatos_exportacao() -> List[str]:
+    """Formatos cujo módulo opcional (pyarrow/openpyxl) está instalado."""
+    return [f for f, (_, _, mod) in FORMATOS_EXPORTACAO.items() if mod is None or importlib.util.find_spec(mod)]
+
+
+def gravar_exportacao(df: pd.DataFrame, formato: str, caminho: str):
+    """Grava `df` em lotes de EXPORTACAO_LOTE linhas, sem montar o arquivo inteiro em memória."""
+    lotes = [df.iloc[i:i + EXPORTACAO_LOTE] for i in range(0, len(df), EXPORTACAO_LOTE)] or [df]
+    if formato == "CSV":
+        for k, lote in enumerate(lotes):
+            lote.to_csv(caminho, mode="a" if k else "w", header=k == 0, index=False, encoding="utf-8")
+    elif formato == "Parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        escritor = None
+        for lote in lotes:
+            tabela = pa.Table.from_pandas(lote, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema)
+            escritor.write_table(tabela.cast(escritor.schema))
+        escritor.close()
+    elif formato == "XLSX":
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("dados")
+        ws.append(list(df.columns))
+        for lote in lotes:
+            for linha in lote.astype(object).where(lote.notna(), None).itertuples(index=False, name=None):
+                ws.append(list(linha))
+        wb.save(caminho)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+
+def gerar_exportacao(df: pd.DataFrame, formato: str, assinatura: Tuple) -> bytes:
+    """Arquivo de exportação de `df`, reaproveitado enquanto `assinatura` (versão + filtro) não mudar."""
+    os.makedirs(EXPORTACAO_DIR, exist_ok=True)
+    ext = FORMATOS_EXPORTACAO[formato][0]
+    nome = hashlib.sha1(repr((formato, assinatura)).encode("utf-8")).hexdigest()
+    caminho = os.path.join(EXPORTACAO_DIR, f"{nome}.{ext}")
+    if not os.path.exists(caminho):
+        tmp = f"{caminho}.{threading.get_ident()}.tmp"
+        gravar_exportacao(df, formato, tmp)
+        os.replace(tmp, caminho)
+        antigos = sorted(
+            (os.path.join(EXPORTACAO_DIR, f) for f in os.listdir(EXPORTACAO_DIR) if not f.endswith(".tmp")),
+            key=os.path.getmtime, reverse=True,
+        )
+        for velho in antigos[EXPORTACAO_MAX_ARQUIVOS:]:
+            try:
+                os.remove(velho)
+            except OSError:
+                pass
+    else:
+        os.utime(caminho)
+    with open(caminho, "rb") as f:
+        return f.read()
@@ -0,0 +1,134 @@
+"""Índices em memória para os filtros das telas: posições por dimensão e busca textual."""
+
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from orcamento.dados import mes_num
+
+
+DIMENSOES_LANC = ["Ano", "Mês", "Projeto", "Categoria", "Tipo", "Shard"]
+DIMENSOES_ORC = ["Ano", "Mês", "Projeto", "Categoria", "Status"]
+DIMENSOES_ENV = ["Ano", "Mês", "Projeto"]
+DIMENSOES_RATEIO = ["Ano", "Projeto", "Centro de Custo"]
+COLS_TEXTO = ["Descrição", "Envolvidos", "Info Gerais", "Parcela"]
+TEXTO_TOKEN_RE = r"\w+"
+
+
+class IndiceFiltros:
+    """Posições de linha (np.ndarray ordenado) por valor de cada dimensão de um DataFrame.
+
+    Filtros combinam posições com união dentro da dimensão e interseção entre
+    dimensões; o DataFrame só é copiado uma vez, no `take` final. O índice guarda
+    o próprio `df` (compartilhado entre sessões): não modifique o resultado.
+
+    `catalogo[dim]` traz os valores distintos já ordenados (Mês pelo número do mês),
+    com contagem e datas mín./máx. — é a fonte das opções dos filtros.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensoes: List[str]):
+        self.df = df
+        self.n = len(df)
+        self.indices: Dict[str, Dict] = {}
+        self.catalogo: Dict[str, pd.DataFrame] = {}
+        self.texto = None  # IndiceTexto, criado sob demanda por indice_texto_lancamentos
+        datas = df["Data_dt"] if "Data_dt" in df.columns else pd.Series(pd.NaT, index=df.index)
+        for dim in dimensoes:
+            if dim not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[dim])
+            ordem = np.argsort(codes, kind="stable")
+            limites = np.searchsorted(codes[ordem], np.arange(len(uniques) + 1))
+            self.indices[dim] = {
+                v: ordem[limites[i]:limites[i + 1]] for i, v in enumerate(uniques)
+            }
+            faixa = datas.groupby(codes).agg(["min", "max"]).reindex(range(len(uniques)))
+            cat = pd.DataFrame({
+                "n": np.diff(limites),
+                "data_min": faixa["min"].to_numpy(),
+                "data_max": faixa["max"].to_numpy(),
+            }, index=pd.Index(uniques, name=dim))
+            chave = (lambda idx: idx.map(mes_num)) if dim == "Mês" else None
+            self.catalogo[dim] = cat.sort_index(key=chave)
+
+    def opcoes(self, dim: str) -> List:
+        """Valores distintos ordenados da dimensão (vazio se a dimensão não existir)."""
+        cat = self.catalogo.get(dim)
+        return [] if cat is None else cat.index.tolist()
+
+    def posicoes(self, filtros: Dict[str, Iterable]) -> np.ndarray:
+        res = None
+        for dim, valores in filtros.items():
+            if not valores:
+                continue
+            idx = self.indices[dim]
+            partes = [idx[v] for v in valores if v in idx]
+            pos = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.intp)
+            res = pos if res is None else np.intersect1d(res, pos, assume_unique=True)
+            if len(res) == 0:
+                break
+        return np.arange(self.n) if res is None else res
+
+    def filtrar(self, filtros: Dict[str, Iterable]) -> pd.DataFrame:
+        if not any(filtros.values()):
+            return self.df
+        return self.df.take(self.posicoes(filtros))
+
+
+def normalizar_texto_series(s: pd.Series) -> pd.Series:
+    """Sem acentos e casefold, vetorizado (forma usada pelo índice de texto e pelas consultas)."""
+    sem_acento = s.astype(str).str.normalize("NFKD").str.replace("[\u0300-\u036f]", "", regex=True)
+    # object: findall/regex seguem o `re` do Python (\w com Unicode) com qualquer backend de string.
+    return sem_acento.str.casefold().astype(object)
+
+
+class IndiceTexto:
+    """Índice invertido (termo -> posições de linha ordenadas) sobre COLS_TEXTO.
+
+    A busca é por prefixo, sem acento nem caixa; termos diferentes da consulta
+    combinam por interseção. `estender` devolve um novo índice com linhas acrescentadas
+    ao final, sem reprocessar as antigas (o índice original continua válido).
+    """
+
+    def __init__(self, ids: np.ndarray, postings: Dict[str, np.ndarray]):
+        self.ids = ids
+        self.n = len(ids)
+        self.postings = postings
+        self.vocab = np.array(sorted(postings), dtype=str)
+
+    @classmethod
+    def construir(cls, df: pd.DataFrame) -> "IndiceTexto":
+        return cls(np.empty(0, dtype=object), {}).estender(df)
+
+    def estender(self, df_novo: pd.DataFrame) -> "IndiceTexto":
+        texto = df_novo[COLS_TEXTO[0]].astype(str)
+        for c in COLS_TEXTO[1:]:
+            texto = texto + " " + df_novo[c].astype(str)
+        termos = normalizar_texto_series(texto).str.findall(TEXTO_TOKEN_RE)
+        termos = pd.Series(termos.to_numpy(), index=np.arange(self.n, self.n + len(df_novo))).explode().dropna()
+        pares = pd.DataFrame({"pos": termos.index.to_numpy(), "termo": termos.to_numpy()}).drop_duplicates()
+
+        postings = dict(self.postings)
+        if not pares.empty:
+            codes, uniques = pd.factorize(pares["termo"])
+            ordem = np.argsort(codes, kind="stable")
+            limites = np.searchsorted(codes[ordem], np.arange(len(uniques) + 1))
+            pos = pares["pos"].to_numpy(dtype=np.int64)[ordem]
+            for i, termo in enumerate(uniques):
+                novas = pos[limites[i]:limites[i + 1]]
+                antigas = postings.get(termo)
+                postings[termo] = novas if antigas is None else np.concatenate([antigas, novas])
+        return IndiceTexto(np.concatenate([self.ids, df_novo["Lanc_ID"].to_numpy(dtype=object)]), postings)
+
+    def buscar(self, consulta: str) -> np.ndarray:
+        """Posições (ordenadas) das linhas que têm, para cada termo da consulta, algum termo com esse prefixo."""
+        res = None
+        for termo in normalizar_texto_series(pd.Series([consulta])).str.findall(TEXTO_TOKEN_RE).iloc[0]:
+            ini, fim = np.searchsorted(self.vocab, [termo, termo + "\uffff"])
+            partes = [self.postings[t] for t in self.vocab[ini:fim]]
+            pos = np.unique(np.concatenate(partes)) if partes else np.empty(0, dtype=np.int64)
+            res = pos if res is None else np.intersect1d(res, pos, assume_unique=True)
+            if len(res) == 0:
+                break
+        return np.arange(self.n) if res is None else res
@@ -0,0 +1,164 @@
+"""Journal local (write-ahead) em SQLite e a sobreposição das gravações pendentes aos dados lidos."""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from orcamento.config import COLS_LANC, JOURNAL_MAX_TENTATIVAS, JOURNAL_PATH, JOURNAL_RETENCAO_DIAS
+from orcamento.dados import limpar_lancamentos, now_iso
+
+
+def _journal_conn() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    conn = sqlite3.connect(JOURNAL_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            criado_em TEXT NOT NULL,
+            op TEXT NOT NULL,
+            shard TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT NOT NULL DEFAULT '',
+            atualizado_em TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    return conn
+
+
+def journal_registrar(op: str, shard: str, payload: Dict) -> int:
+    with closing(_journal_conn()) as conn, conn:
+        cur = conn.execute(
+            "INSERT INTO journal (criado_em, op, shard, payload) VALUES (?, ?, ?, ?)",
+            (now_iso(), op, shard, json.dumps(payload, ensure_ascii=False)),
+        )
+        return int(cur.lastrowid)
+
+
+def journal_listar(status: Tuple[str, ...] = ("pendente", "falha")) -> List[Dict]:
+    marcadores = ",".join("?" * len(status))
+    with closing(_journal_conn()) as conn:
+        rows = conn.execute(
+            f"SELECT id, op, shard, payload, status, tentativas, erro FROM journal "
+            f"WHERE status IN ({marcadores}) ORDER BY id",
+            status,
+        ).fetchall()
+    return [
+        {"id": r[0], "op": r[1], "shard": r[2], "payload": json.loads(r[3]),
+         "status": r[4], "tentativas": r[5], "erro": r[6]}
+        for r in rows
+    ]
+
+
+def journal_resumo() -> Dict[str, int]:
+    with closing(_journal_conn()) as conn:
+        rows = conn.execute("SELECT status, COUNT(*) FROM journal WHERE status != 'feito' GROUP BY status").fetchall()
+    return {status: n for status, n in rows}
+
+
+def journal_marcar(ids: List[int], status: str, erro: str = ""):
+    marcadores = ",".join("?" * len(ids))
+    with closing(_journal_conn()) as conn, conn:
+        if status == "feito":
+            conn.execute(
+                f"UPDATE journal SET status = 'feito', erro = '', atualizado_em = ? WHERE id IN ({marcadores})",
+                (now_iso(), *ids),
+            )
+        else:
+            conn.execute(
+                f"UPDATE journal SET tentativas = tentativas + 1, erro = ?, atualizado_em = ?, "
+                f"status = CASE WHEN tentativas + 1 >= ? THEN 'falha' ELSE 'pendente' END "
+                f"WHERE id IN ({marcadores})",
+                (erro[:500], now_iso(), JOURNAL_MAX_TENTATIVAS, *ids),
+            )
+
+
+def journal_reprocessar_falhas() -> int:
+    with closing(_journal_conn()) as conn, conn:
+        cur = conn.execute("UPDATE journal SET status = 'pendente', tentativas = 0 WHERE status = 'falha'")
+        return cur.rowcount
+
+
+def journal_compactar():
+    limite = (datetime.now() - relativedelta(days=JOURNAL_RETENCAO_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+    with closing(_journal_conn()) as conn, conn:
+        conn.execute("DELETE FROM journal WHERE status = 'feito' AND atualizado_em < ?", (limite,))
+
+
+def lancamentos_alterados(df: pd.DataFrame, campos_por_id: Dict[str, Dict[str, str]]) -> pd.DataFrame:
+    """Linhas de `df` cujo Lanc_ID está em `campos_por_id`, com os campos trocados e colunas derivadas recalculadas."""
+    alvo = df[df["Lanc_ID"].isin(campos_por_id)]
+    if alvo.empty:
+        return alvo
+    brutas = alvo[COLS_LANC].astype(str).set_index("Lanc_ID", drop=False)
+    brutas.update(pd.DataFrame.from_dict(campos_por_id, orient="index"))
+    limpas = limpar_lancamentos([COLS_LANC] + brutas[COLS_LANC].to_numpy().tolist())
+    extras = [c for c in alvo.columns if c not in limpas.columns]
+    return limpas.assign(**{c: alvo[c].to_numpy() for c in extras}).set_axis(alvo.index)
+
+
+def aplicar_journal(
+    df_lanc: pd.DataFrame, df_cad: pd.DataFrame, df_env: pd.DataFrame, anos: Tuple[int, ...]
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Sobrepõe aos dados do Sheets as gravações que ainda estão só no journal."""
+    entradas = journal_listar()
+    if not entradas:
+        return df_lanc, df_cad, df_env
+
+    novas, shards_novas, excluir, cad, env, alterar = [], [], set(), [], [], {}
+    for e in entradas:
+        p = e["payload"]
+        if e["op"] == "append_lancamentos":
+            novas.extend([str(v) for v in linha] for linha in p["linhas"])
+            shards_novas.extend([e["shard"]] * len(p["linhas"]))
+        elif e["op"] == "delete_lancamentos":
+            excluir.update(p["lanc_ids"])
+        elif e["op"] == "update_lancamentos":
+            for a in p["alteracoes"]:
+                alterar.setdefault(a["lanc_id"], {}).update(a["campos"])
+        elif e["op"] == "append_cadastro":
+            cad.append({"Tipo": p["tipo"], "Nome": p["nome"], "Shard": e["shard"]})
+        elif e["op"] == "append_envolvido":
+            env.append(dict(zip(["Ano", "Mês", "Projeto", "Nome", "Cargo/Função", "Centro de Custo", "Horas", "Observações"],
+                                [str(v) for v in p["linha"]]), Shard=e["shard"]))
+
+    if novas and anos:
+        df_novas = limpar_lancamentos([COLS_LANC] + novas).assign(Shard=shards_novas)
+        df_novas = df_novas[df_novas["Ano"].isin(anos)]
+        if "Lanc_ID" in df_lanc.columns:
+            df_novas = df_novas[~df_novas["Lanc_ID"].isin(df_lanc["Lanc_ID"])]
+        if not df_novas.empty:
+            df_lanc = pd.concat([df_lanc, df_novas], ignore_index=True) if not df_lanc.empty else df_novas.reset_index(drop=True)
+    if alterar and not df_lanc.empty:
+        alteradas = lancamentos_alterados(df_lanc, alterar)
+        if not alteradas.empty:
+            df_lanc = df_lanc.copy()
+            for c in df_lanc.columns.intersection(alteradas.columns):
+                df_lanc.loc[alteradas.index, c] = alteradas[c]
+    if excluir and not df_lanc.empty:
+        df_lanc = df_lanc[~df_lanc["Lanc_ID"].isin(excluir)].reset_index(drop=True)
+    if cad:
+        df_cad = pd.concat([df_cad, pd.DataFrame(cad)], ignore_index=True)
+    if env:
+        df_env = pd.concat([df_env, pd.DataFrame(env)], ignore_index=True)
+    return df_lanc, df_cad, df_env
+
+
+def anos_no_journal() -> set:
+    idx_ano = COLS_LANC.index("Ano")
+    return {
+        int(linha[idx_ano])
+        for e in journal_listar()
+        if e["op"] == "append_lancamentos"
+        for linha in e["payload"]["linhas"]
+    }
@@ -0,0 +1,302 @@
+"""Razão de consumo por orçamento em SQLite, mantido incrementalmente.
+
+Mesmo resultado de compute_consumo sobre todos os anos, mas mantido linha a
+linha: gravar/excluir lançamentos só recalcula os grupos (Ano, Mês, Projeto,
+Categoria) e Orc_IDs tocados. Tabelas:
+  razao_linhas  — contribuição de cada lançamento
+  razao_grupos  — maior orçado do grupo e realizado sem vínculo (fallback)
+  razao         — linhas do consumo (Orc_ID x grupo), com saldo e status
+  razao_alertas — "Estouro" por Orc_ID e "Realizado sem Orçado" por grupo
+  razao_mensal  — totais por Ano/Mês x Projeto x Categoria x Tipo (tendências)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from orcamento.agregado import compute_consumo
+from orcamento.config import RAZAO_PATH
+from orcamento.dados import fmt_real, now_iso
+
+
+log = logging.getLogger(__name__)
+
+COLS_RAZAO_LINHAS = ["lanc_id", "tipo", "orc_id", "vinculo", "ano", "mes", "mes_num", "projeto", "categoria", "valor"]
+GRUPO_SQL = "ano = ? AND mes = ? AND projeto = ? AND categoria = ?"
+
+# Serializa as escritas no razão dentro do processo (gravações da UI, replayer e conferências).
+RAZAO_LOCK = threading.Lock()
+
+
+def _razao_conn() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(RAZAO_PATH), exist_ok=True)
+    conn = sqlite3.connect(RAZAO_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS razao_linhas (
+            lanc_id TEXT PRIMARY KEY, tipo TEXT NOT NULL, orc_id TEXT NOT NULL, vinculo TEXT NOT NULL,
+            ano INTEGER NOT NULL, mes TEXT NOT NULL, mes_num INTEGER NOT NULL,
+            projeto TEXT NOT NULL, categoria TEXT NOT NULL, valor REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS razao_linhas_orc ON razao_linhas (orc_id);
+        CREATE INDEX IF NOT EXISTS razao_linhas_vinc ON razao_linhas (vinculo);
+        CREATE INDEX IF NOT EXISTS razao_linhas_grupo ON razao_linhas (ano, mes, projeto, categoria);
+        CREATE TABLE IF NOT EXISTS razao_grupos (
+            ano INTEGER NOT NULL, mes TEXT NOT NULL, projeto TEXT NOT NULL, categoria TEXT NOT NULL,
+            maior_orc TEXT, sem_vinculo REAL NOT NULL,
+            PRIMARY KEY (ano, mes, projeto, categoria)
+        );
+        CREATE INDEX IF NOT EXISTS razao_grupos_maior ON razao_grupos (maior_orc);
+        CREATE TABLE IF NOT EXISTS razao (
+            orc_id TEXT NOT NULL, ano INTEGER NOT NULL, mes TEXT NOT NULL, mes_num INTEGER NOT NULL,
+            projeto TEXT NOT NULL, categoria TEXT NOT NULL, orcado_total REAL NOT NULL,
+            realizado_vinculado REAL NOT NULL, realizado_fallback REAL NOT NULL,
+            saldo REAL NOT NULL, status TEXT NOT NULL,
+            PRIMARY KEY (orc_id, ano, mes, projeto, categoria)
+        );
+        CREATE INDEX IF NOT EXISTS razao_ano ON razao (ano);
+        CREATE TABLE IF NOT EXISTS razao_alertas (
+            tipo TEXT NOT NULL, chave TEXT NOT NULL, orc_id TEXT NOT NULL, ano INTEGER NOT NULL,
+            mensagem TEXT NOT NULL, PRIMARY KEY (tipo, chave)
+        );
+        CREATE TABLE IF NOT EXISTS razao_mensal (
+            ano INTEGER NOT NULL, mes_num INTEGER NOT NULL, projeto TEXT NOT NULL, categoria TEXT NOT NULL,
+            tipo TEXT NOT NULL, valor REAL NOT NULL, n INTEGER NOT NULL,
+            PRIMARY KEY (ano, mes_num, projeto, categoria, tipo)
+        );
+        CREATE TABLE IF NOT EXISTS razao_meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+        """
+    )
+    return conn
+
+
+def _razao_linhas_do_df(df: pd.DataFrame) -> List[Tuple]:
+    """Lançamentos limpos -> tuplas de razao_linhas (Orçado: Orc_ID; Realizado: vínculo)."""
+    df = df[df["Tipo"].isin(["Orçado", "Realizado"])]
+    if df.empty:
+        return []
+    eh_orc = df["Tipo"] == "Orçado"
+    orc_id = df["Grupo_ID"].where(df["Grupo_ID"].astype(str).str.strip() != "", df["Lanc_ID"])
+    linhas = pd.DataFrame({
+        "lanc_id": df["Lanc_ID"].astype(str),
+        "tipo": df["Tipo"],
+        "orc_id": orc_id.where(eh_orc, "").astype(str),
+        "vinculo": df["Orcado_Vinculo"].astype(str).str.strip().where(~eh_orc, ""),
+        "ano": df["Ano"].astype(int),
+        "mes": df["Mês"].astype(str),
+        "mes_num": df["Mes_Num"].astype(int),
+        "projeto": df["Projeto"].astype(str),
+        "categoria": df["Categoria"].astype(str),
+        "valor": df["Valor_num"].astype(float),
+    })
+    return list(linhas.itertuples(index=False, name=None))
+
+
+def _razao_tocados(linhas: Iterable[Tuple], grupos: set, orcs: set):
+    for _, tipo, orc_id, vinculo, ano, mes, _, projeto, categoria, _ in linhas:
+        grupos.add((ano, mes, projeto, categoria))
+        if tipo == "Orçado":
+            orcs.add(orc_id)
+        elif vinculo:
+            orcs.add(vinculo)
+
+
+def _razao_recalcular(conn: sqlite3.Connection, grupos: set, orcs: set):
+    """Recalcula fallback/alertas dos `grupos` e as linhas de consumo dos `orcs` afetados."""
+    orcs = set(orcs)
+    for g in grupos:
+        ano, mes, projeto, categoria = g
+        chave = f"{ano}|{mes}|{projeto}|{categoria}"
+        maior = conn.execute(
+            f"SELECT orc_id FROM razao_linhas WHERE tipo = 'Orçado' AND {GRUPO_SQL} "
+            f"GROUP BY orc_id ORDER BY SUM(valor) DESC, orc_id LIMIT 1", g,
+        ).fetchone()
+        sem_vinculo, n_sem = conn.execute(
+            f"SELECT COALESCE(SUM(valor), 0), COUNT(*) FROM razao_linhas "
+            f"WHERE tipo = 'Realizado' AND vinculo = '' AND {GRUPO_SQL}", g,
+        ).fetchone()
+        antigo = conn.execute(f"SELECT maior_orc FROM razao_grupos WHERE {GRUPO_SQL}", g).fetchone()
+        maior = maior[0] if maior else None
+        orcs.update(o for o in (antigo[0] if antigo else None, maior) if o)
+
+        conn.execute(f"DELETE FROM razao_grupos WHERE {GRUPO_SQL}", g)
+        if maior or n_sem:
+            conn.execute("INSERT INTO razao_grupos VALUES (?, ?, ?, ?, ?, ?)", (*g, maior, sem_vinculo))
+        conn.execute("DELETE FROM razao_alertas WHERE tipo = 'Realizado sem Orçado' AND chave = ?", (chave,))
+        if n_sem and not maior:
+            conn.execute(
+                "INSERT INTO razao_alertas VALUES ('Realizado sem Orçado', ?, '', ?, ?)",
+                (chave, ano, f"Realizado {fmt_real(sem_vinculo)} em {projeto} / {categoria} ({mes} {ano}) sem orçamento correspondente."),
+            )
+
+    for orc in orcs:
+        vinculado = conn.execute(
+            "SELECT COALESCE(SUM(valor), 0) FROM razao_linhas WHERE tipo = 'Realizado' AND vinculo = ?", (orc,)
+        ).fetchone()[0]
+        fallback = conn.execute(
+            "SELECT COALESCE(SUM(sem_vinculo), 0) FROM razao_grupos WHERE maior_orc = ?", (orc,)
+        ).fetchone()[0]
+        conn.execute("DELETE FROM razao WHERE orc_id = ?", (orc,))
+        conn.execute("DELETE FROM razao_alertas WHERE tipo = 'Estouro' AND orc_id = ?", (orc,))
+        for ano, mes, mes_num, projeto, categoria, orcado in conn.execute(
+            "SELECT ano, mes, mes_num, projeto, categoria, SUM(valor) FROM razao_linhas "
+            "WHERE tipo = 'Orçado' AND orc_id = ? GROUP BY ano, mes, projeto, categoria", (orc,),
+        ).fetchall():
+            saldo = orcado - vinculado - fallback
+            conn.execute(
+                "INSERT INTO razao VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (orc, ano, mes, mes_num, projeto, categoria, orcado, vinculado, fallback, saldo,
+                 "Estouro" if saldo < 0 else "OK"),
+            )
+            if saldo < 0:
+                conn.execute(
+                    "INSERT INTO razao_alertas VALUES ('Estouro', ?, ?, ?, ?)",
+                    (f"{orc}|{ano}|{mes}|{projeto}|{categoria}", orc, ano,
+                     f"Estouro em {projeto} / {categoria} ({mes} {ano}): saldo {fmt_real(saldo)}."),
+                )
+
+
+def _razao_mensal_somar(conn: sqlite3.Connection, linhas: List[Tuple], sinal: int):
+    """Soma (sinal=1) ou subtrai (sinal=-1) as `linhas` de razao_mensal."""
+    conn.executemany(
+        "INSERT INTO razao_mensal VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (ano, mes_num, projeto, categoria, tipo) "
+        "DO UPDATE SET valor = valor + excluded.valor, n = n + excluded.n",
+        [(ano, mes_num, projeto, categoria, tipo, sinal * valor, sinal)
+         for _, tipo, _, _, ano, _, mes_num, projeto, categoria, valor in linhas],
+    )
+    conn.execute("DELETE FROM razao_mensal WHERE n <= 0")
+
+
+def _razao_mensal_divergencias(conn: sqlite3.Connection) -> int:
+    esperado = (
+        "SELECT ano, mes_num, projeto, categoria, tipo, ROUND(SUM(valor), 2), COUNT(*) "
+        "FROM razao_linhas GROUP BY ano, mes_num, projeto, categoria, tipo"
+    )
+    atual = "SELECT ano, mes_num, projeto, categoria, tipo, ROUND(valor, 2), n FROM razao_mensal"
+    return conn.execute(
+        f"SELECT (SELECT COUNT(*) FROM ({esperado} EXCEPT {atual})) + (SELECT COUNT(*) FROM ({atual} EXCEPT {esperado}))"
+    ).fetchone()[0]
+
+
+def _razao_pronta(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM razao_meta WHERE chave = 'construida_em'").fetchone() is not None
+
+
+def razao_aplicar(novas: Optional[pd.DataFrame] = None, remover: Iterable[str] = ()):
+    """Aplica ao razão lançamentos gravados (`novas`, já limpos) e/ou excluídos (`remover`, Lanc_IDs).
+
+    Se algo falhar, o razão é marcado para reconstrução na próxima leitura.
+    """
+    try:
+        with RAZAO_LOCK, closing(_razao_conn()) as conn, conn:
+            if not _razao_pronta(conn):
+                return
+            linhas = _razao_linhas_do_df(novas) if novas is not None else []
+            ids = list(remover) + [l[0] for l in linhas]
+            grupos, orcs = set(), set()
+            for i in range(0, len(ids), 500):
+                lote = ids[i:i + 500]
+                marcadores = ",".join("?" * len(lote))
+                antigas = conn.execute(
+                    f"SELECT {', '.join(COLS_RAZAO_LINHAS)} FROM razao_linhas WHERE lanc_id IN ({marcadores})", lote
+                ).fetchall()
+                _razao_tocados(antigas, grupos, orcs)
+                _razao_mensal_somar(conn, antigas, -1)
+                conn.execute(f"DELETE FROM razao_linhas WHERE lanc_id IN ({marcadores})", lote)
+            conn.executemany(f"INSERT INTO razao_linhas VALUES ({', '.join('?' * len(COLS_RAZAO_LINHAS))})", linhas)
+            _razao_mensal_somar(conn, linhas, 1)
+            _razao_tocados(linhas, grupos, orcs)
+            _razao_recalcular(conn, grupos, orcs)
+    except Exception:
+        log.exception("Falha ao aplicar lançamentos ao razão; reconstrução completa na próxima leitura.")
+        with closing(_razao_conn()) as conn, conn:
+            conn.execute("DELETE FROM razao_meta WHERE chave = 'construida_em'")
+
+
+def razao_reconstruir(df: pd.DataFrame):
+    """Reconstrói o razão inteiro a partir dos lançamentos (todos os anos)."""
+    linhas = _razao_linhas_do_df(df) if not df.empty else []
+    with closing(_razao_conn()) as conn, conn:
+        for tabela in ("razao_linhas", "razao_grupos", "razao", "razao_alertas", "razao_mensal"):
+            conn.execute(f"DELETE FROM {tabela}")
+        conn.executemany(f"INSERT OR REPLACE INTO razao_linhas VALUES ({', '.join('?' * len(COLS_RAZAO_LINHAS))})", linhas)
+        conn.execute(
+            "INSERT INTO razao_mensal SELECT ano, mes_num, projeto, categoria, tipo, SUM(valor), COUNT(*) "
+            "FROM razao_linhas GROUP BY ano, mes_num, projeto, categoria, tipo"
+        )
+        grupos, orcs = set(), set()
+        _razao_tocados(linhas, grupos, orcs)
+        _razao_recalcular(conn, grupos, orcs)
+        conn.execute("INSERT OR REPLACE INTO razao_meta VALUES ('construida_em', ?)", (now_iso(),))
+
+
+def razao_tabela(anos: Optional[Iterable[int]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Consumo por orçamento e alertas do razão, no formato de compute_consumo (None = todos os anos)."""
+    filtro, params = "", ()
+    if anos is not None:
+        params = tuple(int(a) for a in anos)
+        filtro = f" WHERE ano IN ({','.join('?' * len(params))})" if params else " WHERE 0"
+    with closing(_razao_conn()) as conn:
+        df = pd.read_sql_query(
+            "SELECT orc_id AS Orc_ID, ano AS Ano, mes AS 'Mês', mes_num AS Mes_Num, projeto AS Projeto, "
+            "categoria AS Categoria, orcado_total AS Orcado_Total, realizado_vinculado AS Realizado_Vinculado, "
+            f"realizado_fallback AS Realizado_Fallback, saldo AS Saldo, status AS Status FROM razao{filtro}",
+            conn, params=params,
+        )
+        alertas = pd.read_sql_query(
+            f"SELECT tipo AS Tipo, mensagem AS Mensagem FROM razao_alertas{filtro} ORDER BY tipo DESC, ano, chave",
+            conn, params=params,
+        )
+    df["Realizado_Total"] = df["Realizado_Vinculado"] + df["Realizado_Fallback"]
+    df["Uso_%"] = (df["Realizado_Total"] / df["Orcado_Total"].replace(0, np.nan) * 100.0).fillna(0.0)
+    return df, alertas
+
+
+def _razao_diferencas(esperado: pd.DataFrame, atual: pd.DataFrame) -> int:
+    chave = ["Orc_ID", "Ano", "Mês", "Projeto", "Categoria"]
+    valores = ["Orcado_Total", "Realizado_Total"]
+    if esperado.empty or atual.empty:
+        return len(esperado) + len(atual)
+    a = esperado[chave + valores].merge(atual[chave + valores], on=chave, how="outer", suffixes=("_e", "_a"), indicator=True)
+    difere = a["_merge"] != "both"
+    for v in valores:
+        difere |= ~np.isclose(a[f"{v}_e"].fillna(0), a[f"{v}_a"].fillna(0), atol=0.005)
+    return int(difere.sum())
+
+
+def razao_pronta() -> bool:
+    """O razão já foi construído (e não foi marcado para reconstrução)?"""
+    with closing(_razao_conn()) as conn:
+        return _razao_pronta(conn)
+
+
+def razao_conferir(df: pd.DataFrame, forcar: bool = False) -> Dict[str, int]:
+    """Compara o razão com um compute_consumo completo de `df` (todos os anos) e reconstrói se
+    houver divergência, ou sempre com `forcar`. O chamador segura RAZAO_LOCK desde a leitura de `df`."""
+    divergencias = -1
+    if razao_pronta() and not forcar:
+        esperado, _ = compute_consumo(df)
+        divergencias = _razao_diferencas(esperado, razao_tabela()[0])
+        with closing(_razao_conn()) as conn:
+            divergencias += _razao_mensal_divergencias(conn)
+    if divergencias:
+        razao_reconstruir(df)
+    return {"divergencias": max(divergencias, 0), "reconstruido": int(divergencias != 0), "orcamentos": len(razao_tabela()[0])}
+
+
+def razao_mensal_tabela() -> pd.DataFrame:
+    """Totais mensais por Projeto/Categoria/Tipo (todos os anos), de razao_mensal."""
+    with closing(_razao_conn()) as conn:
+        return pd.read_sql_query(
+            "SELECT ano AS Ano, mes_num AS Mes_Num, projeto AS Projeto, categoria AS Categoria, "
+            "tipo AS Tipo, valor AS Valor_num FROM razao_mensal WHERE mes_num BETWEEN 1 AND 12",
+            conn,
+        )
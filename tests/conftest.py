@@ -0,0 +1,39 @@
+"""Fixtures comuns: dados sintéticos e journal/razão em SQLite temporários."""
+
+import os
+import sys
+import tempfile
+
+# Antes de importar `orcamento`: DATA_DIR é lido na importação e nada pode ir para o .orcamento/ real.
+os.environ["ORC_DATA_DIR"] = tempfile.mkdtemp(prefix="orcamento-testes-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from orcamento import journal, razao  # noqa: E402
+from orcamento.bench import gerar_lancamentos  # noqa: E402
+from orcamento.config import COLS_LANC  # noqa: E402
+from orcamento.dados import limpar_lancamentos, uuid4  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_local(tmp_path, monkeypatch):
+    """Journal e razão vazios, só deste teste."""
+    monkeypatch.setattr(journal, "JOURNAL_PATH", str(tmp_path / "journal.sqlite3"))
+    monkeypatch.setattr(razao, "RAZAO_PATH", str(tmp_path / "razao.sqlite3"))
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def values_lanc():
+    """3.000 linhas brutas do gerador, todas com Lanc_ID (limpar_lancamentos fica determinístico)."""
+    values = gerar_lancamentos(3000, seed=7)
+    i = COLS_LANC.index("Lanc_ID")
+    for linha in values[1:]:
+        linha[i] = linha[i] or uuid4()
+    return values
+
+
+@pytest.fixture(scope="session")
+def df_lanc(values_lanc):
+    return limpar_lancamentos(values_lanc).assign(Shard="principal")
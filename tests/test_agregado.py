@@ -0,0 +1,54 @@
+"""projetar_consumo x run-rate calculado Orc_ID a Orc_ID com datetime."""
+
+import math
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from orcamento.agregado import compute_consumo, projetar_consumo
+
+
+def _projetar_orc(g: pd.DataFrame, hoje: date):
+    """(Projecao, Estouro_Previsto) de um Orc_ID."""
+    meses = sorted(zip(g["Ano"], g["Mes_Num"]))
+    inicio = date(meses[0][0], meses[0][1], 1)
+    fim = date(meses[-1][0], meses[-1][1], 1) + relativedelta(months=1) - timedelta(days=1)
+    duracao = (fim - inicio).days + 1
+    decorrido = max((min(hoje, fim) - inicio).days + 1, 0)
+    realizado, orcado = g["Realizado_Total"].iloc[0], g["Orcado_Total"].sum()
+    if not 0 < decorrido < duracao:
+        return realizado, pd.NaT
+    taxa = realizado / decorrido
+    projecao = taxa * duracao
+    if orcado > 0 and realizado <= orcado and projecao > orcado:
+        return projecao, pd.Timestamp(inicio + timedelta(days=math.floor(orcado / taxa)))
+    return projecao, pd.NaT
+
+
+@pytest.fixture(scope="module")
+def consumo(df_lanc):
+    df_orc = compute_consumo(df_lanc)[0]
+    assert df_orc["Mes_Num"].between(1, 12).all()
+    return df_orc
+
+
+@pytest.mark.parametrize("hoje", [date(2022, 12, 31), date(2023, 1, 1), date(2024, 2, 29), date(2024, 7, 15),
+                                  date(2025, 6, 30), date(2025, 12, 31), date(2027, 1, 1)])
+@pytest.mark.parametrize("fator", [1.0, 4.0])
+def test_projetar_igual_ao_calculo_por_orc_id(consumo, hoje, fator):
+    df_orc = consumo.assign(Realizado_Total=consumo["Realizado_Total"] * fator)
+    out = projetar_consumo(df_orc, hoje=hoje)
+
+    ref = {orc: _projetar_orc(g, hoje) for orc, g in df_orc.groupby("Orc_ID")}
+    projecao = out["Orc_ID"].map(lambda o: ref[o][0])
+    estouro = pd.to_datetime(out["Orc_ID"].map(lambda o: ref[o][1]))
+    pd.testing.assert_series_equal(out["Projecao"], projecao, check_names=False)
+    pd.testing.assert_series_equal(out["Estouro_Previsto"], estouro, check_names=False, check_dtype=False)
+    pd.testing.assert_frame_equal(out[df_orc.columns], df_orc)
+
+
+def test_projetar_vazio():
+    out = projetar_consumo(pd.DataFrame(columns=["Orc_ID", "Ano", "Mes_Num", "Orcado_Total", "Realizado_Total"]))
+    assert out.empty and {"Projecao", "Estouro_Previsto"} <= set(out.columns)
@@ -0,0 +1,81 @@
+"""Etapas de orcamento.bench sob pytest-benchmark, com o pico de memória em extra_info.
+
+Tamanhos em ORC_BENCH_TAMANHOS (padrão 10000; ex.: "10000,100000,1000000"). Para acompanhar
+regressões: `pytest tests/test_bench.py --benchmark-autosave` e depois `--benchmark-compare`.
+"""
+
+import os
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from orcamento.agregado import IndiceCandidatos, build_orcamentos_table, compute_consumo  # noqa: E402
+from orcamento.bench import CONSULTAS_TEXTO, consultas_filtros, gerar_lancamentos  # noqa: E402
+from orcamento.dados import limpar_lancamentos  # noqa: E402
+from orcamento.indices import DIMENSOES_LANC, IndiceFiltros, IndiceTexto  # noqa: E402
+
+TAMANHOS = [int(n) for n in os.getenv("ORC_BENCH_TAMANHOS", "10000").split(",")]
+
+
+@pytest.fixture(scope="module", params=TAMANHOS, ids=lambda n: f"{n}_linhas")
+def etapas(request):
+    """Entradas de cada etapa, já prontas (só a etapa medida entra no tempo)."""
+    values = gerar_lancamentos(request.param, seed=0)
+    df = limpar_lancamentos(values).assign(Shard="principal")
+    indice = IndiceFiltros(df, DIMENSOES_LANC)
+    return {
+        "values": values,
+        "df": df,
+        "candidatos": IndiceCandidatos(build_orcamentos_table(df)),
+        "indice": indice,
+        "consultas": consultas_filtros(df, indice),
+        "texto": IndiceTexto.construir(df),
+    }
+
+
+def _medir(benchmark, fn):
+    """Pico de memória numa execução à parte (tracemalloc distorce o tempo) e depois o tempo."""
+    tracemalloc.start()
+    try:
+        fn()
+        benchmark.extra_info["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    finally:
+        tracemalloc.stop()
+    return benchmark(fn)
+
+
+def test_limpar_lancamentos(benchmark, etapas):
+    df = _medir(benchmark, lambda: limpar_lancamentos(etapas["values"]))
+    assert len(df) == len(etapas["values"]) - 1
+
+
+def test_orcamentos(benchmark, etapas):
+    candidatos = _medir(benchmark, lambda: IndiceCandidatos(build_orcamentos_table(etapas["df"])))
+    assert not candidatos.tabela.empty
+
+
+def test_compute_consumo(benchmark, etapas):
+    df_orc, _ = _medir(benchmark, lambda: compute_consumo(etapas["df"], etapas["candidatos"]))
+    assert len(df_orc) == len(etapas["candidatos"].tabela)
+
+
+def test_indice_filtros(benchmark, etapas):
+    indice = _medir(benchmark, lambda: IndiceFiltros(etapas["df"], DIMENSOES_LANC))
+    assert indice.n == len(etapas["df"])
+
+
+def test_filtrar(benchmark, etapas):
+    res = _medir(benchmark, lambda: [etapas["indice"].filtrar(f) for f in etapas["consultas"]])
+    assert all(len(r) for r in res)
+
+
+def test_indice_texto(benchmark, etapas):
+    texto = _medir(benchmark, lambda: IndiceTexto.construir(etapas["df"]))
+    assert texto.n == len(etapas["df"])
+
+
+def test_buscar(benchmark, etapas):
+    res = _medir(benchmark, lambda: [etapas["texto"].buscar(q) for q in CONSULTAS_TEXTO])
+    assert all(len(r) for r in res)
@@ -0,0 +1,148 @@
+"""validar_importacao, expandir_parcelas e fmt_real_series x versões linha a linha."""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from orcamento.config import COLS_IMPORTACAO, COLS_LANC, IMPORTACAO_MAX_PARCELAS, MESES_PT
+from orcamento.dados import (
+    chave_cadastro, expandir_parcelas, fmt_real, fmt_real_series, moeda_to_float_series, normalizar_nome,
+    validar_importacao,
+)
+
+CATALOGO = {
+    "projeto": ["Reforma Sede", "Projeto 01"],
+    "categoria": ["Passagens", "Hospedagem"],
+    "chaves": {
+        chave_cadastro(t, n): n
+        for t, nomes in (("Projeto", ["Reforma Sede", "Projeto 01"]), ("Categoria", ["Passagens", "Hospedagem"]))
+        for n in nomes
+    },
+}
+OPCOES = {
+    "Data": ["05/03/2025", "2025-03-05", "31/01/2025", "29/02/2024", "31/02/2025", "", "ontem", "15/12/2025"],
+    "Tipo": ["Orçado", "orcado", " Planejado ", "realizado", "Efetivado", "gasto", ""],
+    "Projeto": ["Reforma Sede", "reforma  sede", "REFORMA SÉDE", "Projeto 01", "Outro", ""],
+    "Categoria": ["Passagens", " passagens", "Hospedagem", "Nada"],
+    "Valor": ["R$ 1.234,56", "1234,56", "12.5", "1.234", "0", "-5", "abc", ""],
+    "Parcelas": ["", "1", "3", "14", "3.0", "0", "2.5", "x", str(IMPORTACAO_MAX_PARCELAS), str(IMPORTACAO_MAX_PARCELAS + 1)],
+    "Descrição": ["", "compra", "visita técnica"],
+    "Envolvidos": ["", "Ana; Bruno"],
+    "Orcado_Vinculo": ["", "abc123"],
+}
+TIPOS = {"orcado": "Orçado", "orçado": "Orçado", "planejado": "Orçado", "realizado": "Realizado", "efetivado": "Realizado"}
+
+
+def _arquivo(n: int, seed: int) -> pd.DataFrame:
+    """Bloco como lido do CSV: cabeçalho com espaços e sem a coluna Info Gerais."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({c: rng.choice(np.asarray(v, dtype=object), size=n) for c, v in OPCOES.items()})
+    return df.rename(columns={"Data": " Data ", "Valor": "Valor "})
+
+
+def _data(texto: str):
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    return None
+
+
+def _validar_linha(r: dict, valor: float):
+    canonico = {n: nome for (_, n), nome in CATALOGO["chaves"].items()}
+    tipo = TIPOS.get(r["Tipo"].strip().lower(), r["Tipo"].strip())
+    projeto = canonico.get(normalizar_nome(r["Projeto"]), r["Projeto"].strip())
+    categoria = canonico.get(normalizar_nome(r["Categoria"]), r["Categoria"].strip())
+    data = _data(r["Data"].strip())
+    try:
+        parcelas = float(r["Parcelas"].strip() or "1")
+    except ValueError:
+        parcelas = float("nan")
+    motivos = [
+        motivo for falha, motivo in [
+            (r["Data"].strip() == "", "Data vazia"),
+            (r["Data"].strip() != "" and data is None, "Data inválida (use dd/mm/aaaa)"),
+            (tipo not in ("Orçado", "Realizado"), "Tipo deve ser Orçado ou Realizado"),
+            (projeto not in CATALOGO["projeto"], "Projeto não cadastrado"),
+            (categoria not in CATALOGO["categoria"], "Categoria não cadastrada"),
+            (valor <= 0, "Valor inválido ou não positivo"),
+            (not (parcelas % 1 == 0 and 1 <= parcelas <= IMPORTACAO_MAX_PARCELAS),
+             f"Parcelas deve ser inteiro entre 1 e {IMPORTACAO_MAX_PARCELAS}"),
+            (tipo == "Orçado" and r["Orcado_Vinculo"].strip() != "", "Orcado_Vinculo só vale para Realizado"),
+        ] if falha
+    ]
+    return "; ".join(motivos), tipo, projeto, categoria, data, valor, parcelas
+
+
+def test_validar_importacao_igual_a_linha_a_linha():
+    arquivo = _arquivo(2000, seed=1)
+    validas, rejeitadas = validar_importacao(arquivo, CATALOGO, inicio=5000)
+
+    assert list(rejeitadas.columns) == ["Linha", "Motivo", *COLS_IMPORTACAO]
+    assert sorted([*validas["Linha"], *rejeitadas["Linha"]]) == list(range(5002, 7002))
+    motivos = rejeitadas.set_index("Linha")["Motivo"]
+    validas = validas.set_index("Linha")
+    brutas = arquivo.rename(columns=str.strip).assign(**{"Info Gerais": ""})
+    valores = moeda_to_float_series(brutas["Valor"].str.strip())  # mesma conversão de moeda; aqui se confere a validação
+    for linha, r, valor in zip(range(5002, 7002), brutas.to_dict("records"), valores):
+        motivo, tipo, projeto, categoria, data, valor, parcelas = _validar_linha(r, valor)
+        if motivo:
+            assert motivos[linha] == motivo, linha
+            continue
+        v = validas.loc[linha]
+        assert (v["Tipo"], v["Projeto"], v["Categoria"]) == (tipo, projeto, categoria)
+        assert (v["Data_dt"], v["Valor_num"], v["Parcelas"]) == (pd.Timestamp(data), valor, int(parcelas))
+    assert len(validas) > 50 and len(rejeitadas) > 50
+
+
+def _expandir_linha(r) -> list:
+    linhas = []
+    for k in range(r["Parcelas"]):
+        d = r["Data_dt"].date() + relativedelta(months=k)  # dia 31 -> último dia do mês
+        linhas.append([
+            d.strftime("%d/%m/%Y"), d.year, f"{d.month:02d} - {MESES_PT[d.month]}", r["Tipo"], r["Projeto"],
+            r["Categoria"], fmt_real(r["Valor_num"]), r["Descrição"], f"{k + 1} de {r['Parcelas']}", "Não",
+            r["Envolvidos"], r["Info Gerais"], r["Orcado_Vinculo"] if r["Tipo"] == "Realizado" else "",
+        ])
+    return linhas
+
+
+def test_expandir_parcelas_igual_a_linha_a_linha():
+    validas, _ = validar_importacao(_arquivo(1500, seed=2), CATALOGO)
+    linhas = expandir_parcelas(validas)
+
+    esperado = [linha for _, r in validas.iterrows() for linha in _expandir_linha(r)]
+    comparadas = [c for c in COLS_LANC if c not in ("Lanc_ID", "Grupo_ID", "Criado_Em")]
+    idx = [COLS_LANC.index(c) for c in comparadas]
+    assert [[linha[i] for i in idx] for linha in linhas] == esperado
+
+    out = pd.DataFrame(linhas, columns=COLS_LANC)
+    origem = np.repeat(np.arange(len(validas)), validas["Parcelas"].to_numpy())
+    assert out["Lanc_ID"].is_unique
+    assert (out.groupby(origem)["Grupo_ID"].nunique() == 1).all()
+    assert out.groupby(origem)["Grupo_ID"].first().is_unique
+
+
+def test_expandir_parcelas_mantem_grupo_id_informado():
+    validas, _ = validar_importacao(_arquivo(300, seed=3), CATALOGO)
+    validas = validas.assign(Grupo_ID=[f"g{i}" for i in range(len(validas))])
+    out = pd.DataFrame(expandir_parcelas(validas), columns=COLS_LANC)
+    assert out["Grupo_ID"].tolist() == np.repeat(validas["Grupo_ID"].to_numpy(), validas["Parcelas"].to_numpy()).tolist()
+    assert expandir_parcelas(validas.iloc[:0]) == []
+
+
+def test_fmt_real_series_igual_a_fmt_real():
+    rng = np.random.default_rng(0)
+    valores = np.r_[
+        np.arange(0, 20_000) / 1000 + 0.005,  # x.xx5: o arredondamento tem que ser o do :.2f
+        rng.uniform(-1e7, 1e7, 20_000).round(3),
+        [0.0, -0.0, -0.001, 0.005, 2.675, 1234.565, 1e12, np.nan],
+    ]
+    s = pd.Series(valores, index=np.arange(len(valores)) * 2)
+    out = fmt_real_series(s)
+    assert out.index.equals(s.index)
+    assert out.tolist() == [fmt_real(0.0 if np.isnan(v) else v) for v in valores]
+    assert fmt_real_series(pd.Series([], dtype=float)).tolist() == []
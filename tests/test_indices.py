@@ -0,0 +1,80 @@
+"""IndiceFiltros x máscara booleana e IndiceTexto x busca linha a linha."""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from orcamento.dados import mes_num
+from orcamento.indices import COLS_TEXTO, DIMENSOES_LANC, IndiceFiltros, IndiceTexto
+
+
+def _mascara(df, filtros):
+    mascara = pd.Series(True, index=df.index)
+    for dim, valores in filtros.items():
+        if valores:
+            mascara &= df[dim].isin(list(valores))
+    return mascara
+
+
+def test_filtrar_igual_a_mascara(df_lanc):
+    df = df_lanc.reset_index(drop=True)
+    indice = IndiceFiltros(df, DIMENSOES_LANC)
+    rng = np.random.default_rng(5)
+    for _ in range(200):
+        filtros = {}
+        for dim in rng.choice(DIMENSOES_LANC, size=rng.integers(0, 4), replace=False):
+            opcoes = indice.opcoes(dim) + ["valor que não existe"]
+            filtros[dim] = list(rng.choice(np.asarray(opcoes, dtype=object), size=min(rng.integers(0, 4), len(opcoes)), replace=False))
+        pd.testing.assert_frame_equal(indice.filtrar(filtros), df[_mascara(df, filtros)])
+
+
+def test_catalogo_igual_a_value_counts(df_lanc):
+    indice = IndiceFiltros(df_lanc, DIMENSOES_LANC)
+    for dim in DIMENSOES_LANC:
+        contagem = df_lanc[dim].value_counts()
+        cat = indice.catalogo[dim]
+        assert cat["n"].to_dict() == contagem.to_dict()
+        chave = mes_num if dim == "Mês" else (lambda v: v)
+        assert indice.opcoes(dim) == sorted(contagem.index, key=chave)
+        datas = df_lanc.groupby(dim)["Data_dt"].agg(["min", "max"])
+        assert (cat["data_min"] == datas["min"].reindex(cat.index)).all()
+        assert (cat["data_max"] == datas["max"].reindex(cat.index)).all()
+
+
+def _normalizar(texto: str) -> str:
+    sem_acento = "".join(ch for ch in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(ch))
+    return sem_acento.casefold()
+
+
+def _buscar_linha_a_linha(df, consulta):
+    termos = re.findall(r"\w+", _normalizar(consulta))
+    achou = []
+    for pos, linha in enumerate(df[COLS_TEXTO].astype(str).itertuples(index=False)):
+        palavras = re.findall(r"\w+", _normalizar(" ".join(linha)))
+        if all(any(p.startswith(t) for p in palavras) for t in termos):
+            achou.append(pos)
+    return np.array(achou, dtype=np.int64)
+
+
+CONSULTAS = [
+    "reuniao", "REUNIÃO", "contrato anual", "joão viag", "joao", "Élida", "eli", "técn impl", "1 de", "de 12",
+    "fiscal nota revisão", "xyz", "a", "   ", "", "orçamento-mensal",
+]
+
+
+@pytest.mark.parametrize("consulta", CONSULTAS)
+def test_buscar_igual_a_busca_linha_a_linha(df_lanc, consulta):
+    df = df_lanc.iloc[:1500]
+    indice = IndiceTexto.construir(df)
+    np.testing.assert_array_equal(indice.buscar(consulta), _buscar_linha_a_linha(df, consulta))
+
+
+def test_estender_igual_a_construir(df_lanc):
+    inteiro = IndiceTexto.construir(df_lanc)
+    estendido = IndiceTexto.construir(df_lanc.iloc[:1000]).estender(df_lanc.iloc[1000:2200]).estender(df_lanc.iloc[2200:])
+    np.testing.assert_array_equal(estendido.ids, inteiro.ids)
+    for consulta in CONSULTAS:
+        np.testing.assert_array_equal(estendido.buscar(consulta), inteiro.buscar(consulta))
@@ -0,0 +1,139 @@
+"""Sobreposição do journal aos dados lidos e ordem do replay por shard."""
+
+import pandas as pd
+import pytest
+
+from orcamento import journal
+from orcamento.bench import gerar_lancamentos
+from orcamento.config import COLS_LANC
+from orcamento.dados import limpar_lancamentos, uuid4
+from orcamento.journal import (
+    aplicar_journal, anos_no_journal, journal_listar, journal_marcar, journal_registrar, journal_resumo,
+)
+
+COLS_COMPARAR = [*COLS_LANC, "Valor_num", "Mes_Num", "Shard"]
+
+
+def _limpo(linhas, shards):
+    return limpar_lancamentos([COLS_LANC] + linhas).assign(Shard=shards)
+
+
+def _ordenado(df):
+    return df[COLS_COMPARAR].astype(str).sort_values("Lanc_ID").reset_index(drop=True)
+
+
+def test_sobreposicao_igual_a_aplicar_nas_linhas_brutas(sqlite_local, values_lanc):
+    i_id, i_ano = COLS_LANC.index("Lanc_ID"), COLS_LANC.index("Ano")
+    base = [list(map(str, l)) for l in values_lanc[1:1001]]
+    df_base = _limpo(base, "a")
+    anos = (2024, 2025)
+
+    novas = [list(map(str, l)) for l in gerar_lancamentos(300, seed=11, anos=(2024, 2025, 2026))[1:]]
+    for l in novas:  # como o app grava: sempre com Lanc_ID e Ano
+        l[i_id] = l[i_id] or uuid4()
+        l[i_ano] = l[i_ano] or l[0][-4:]
+    novas.insert(1, list(base[df_base.index[df_base["Ano"].isin(anos)][0]]))  # já lida do Sheets: não duplica
+    journal_registrar("append_lancamentos", "b", {"linhas": novas[:150]})
+    enviada = journal_registrar("append_lancamentos", "b", {"linhas": novas[150:]})
+
+    ids_base = [l[i_id] for l in base]
+    ids_novas = [l[i_id] for l in novas[:150]]
+    alteracoes = [
+        {"lanc_id": ids_base[1], "ano": 0, "campos": {"Valor": "R$ 9.999,99", "Descrição": "revisado"}},
+        {"lanc_id": ids_base[2], "ano": 0, "campos": {"Tipo": "realizado", "Orcado_Vinculo": ids_base[3]}},
+        {"lanc_id": ids_novas[0], "ano": 0, "campos": {"Projeto": "Projeto 99", "Valor": "12,5"}},
+        {"lanc_id": ids_base[4], "ano": 0, "campos": {"Valor": "1"}},
+    ]
+    journal_registrar("update_lancamentos", "a", {"alteracoes": alteracoes[:2]})
+    journal_registrar("update_lancamentos", "b", {"alteracoes": alteracoes[2:]})
+    excluir = [ids_base[4], ids_base[5], ids_novas[2], "nao-existe"]
+    journal_registrar("delete_lancamentos", "a", {"lanc_ids": excluir, "anos": None})
+    journal_registrar("append_cadastro", "a", {"tipo": "Projeto", "nome": "Projeto 99"})
+    journal_registrar("append_envolvido", "b", {"linha": [2025, "01 - JANEIRO", "Projeto 99", "Ana", "Dev", "TI", 4.5, ""]})
+    journal_marcar([enviada], "feito")  # já no Sheets: sai da sobreposição
+
+    df_cad = pd.DataFrame({"Tipo": ["Categoria"], "Nome": ["Passagens"], "Shard": ["a"]})
+    out, cad, env = aplicar_journal(df_base, df_cad, pd.DataFrame(), anos)
+
+    # Referência: as mesmas operações nas linhas brutas, e uma limpeza só no final.
+    brutas = {l[i_id]: (list(l), "a") for l in base}
+    anos_novas = limpar_lancamentos([COLS_LANC] + novas[:150])["Ano"].tolist()
+    for l, ano in zip(novas[:150], anos_novas):
+        if ano in anos and l[i_id] not in brutas:
+            brutas[l[i_id]] = (list(l), "b")
+    for a in alteracoes:
+        if a["lanc_id"] in brutas:
+            for c, v in a["campos"].items():
+                brutas[a["lanc_id"]][0][COLS_LANC.index(c)] = v
+    for i in excluir:
+        brutas.pop(i, None)
+    ref = _limpo([l for l, _ in brutas.values()], [s for _, s in brutas.values()])
+
+    pd.testing.assert_frame_equal(_ordenado(out), _ordenado(ref))
+    assert not out["Lanc_ID"].duplicated().any()
+    assert cad.to_dict("records")[-1] == {"Tipo": "Projeto", "Nome": "Projeto 99", "Shard": "a"}
+    assert env.to_dict("records") == [{
+        "Ano": "2025", "Mês": "01 - JANEIRO", "Projeto": "Projeto 99", "Nome": "Ana", "Cargo/Função": "Dev",
+        "Centro de Custo": "TI", "Horas": "4.5", "Observações": "", "Shard": "b",
+    }]
+    assert anos_no_journal() == {int(l[i_ano]) for l in novas[:150]}
+
+
+def test_sem_pendencias_devolve_os_mesmos_objetos(sqlite_local, df_lanc):
+    vazio = pd.DataFrame()
+    out = aplicar_journal(df_lanc, vazio, vazio, (2024,))
+    assert all(a is b for a, b in zip(out, (df_lanc, vazio, vazio)))
+
+
+def test_falhas_viram_falha_apos_o_limite(sqlite_local, monkeypatch):
+    monkeypatch.setattr(journal, "JOURNAL_MAX_TENTATIVAS", 3)
+    i = journal_registrar("append_cadastro", "a", {"tipo": "Projeto", "nome": "X"})
+    for tentativa in range(1, 4):
+        journal_marcar([i], "pendente", "erro")
+        e = journal_listar()[0]
+        assert e["tentativas"] == tentativa
+        assert e["status"] == ("falha" if tentativa == 3 else "pendente")
+    assert journal_resumo() == {"falha": 1}
+
+
+@pytest.fixture
+def app(sqlite_local, monkeypatch):
+    """AppOrc com o envio ao Sheets trocado por um registro das chamadas."""
+    AppOrc = pytest.importorskip("AppOrc")
+    enviados, falhar = [], set()
+
+    def _aplicar_lote_journal(op, shard, payloads):
+        if falhar & {p["n"] for p in payloads}:
+            raise RuntimeError("Sheets indisponível")
+        enviados.extend((shard, p["n"]) for p in payloads)
+
+    monkeypatch.setattr(AppOrc, "_aplicar_lote_journal", _aplicar_lote_journal)
+    return AppOrc, enviados, falhar
+
+
+def test_replay_preserva_a_ordem_por_shard(app, monkeypatch):
+    AppOrc, enviados, falhar = app
+    ops = ["append_lancamentos", "update_lancamentos", "delete_lancamentos"]
+    entradas = [(("a", "b", "c")[n % 3], ops[(n // 3) % 3]) for n in range(30)]
+    ids = [journal_registrar(op, shard, {"n": n}) for n, (shard, op) in enumerate(entradas)]
+    falhar.add(13)  # shard "b": ele e tudo depois dele nesse shard ficam para a próxima rodada
+
+    AppOrc.replay_journal()
+    por_shard = {s: [n for n, (sh, _) in enumerate(entradas) if sh == s] for s in "abc"}
+    assert [n for s, n in enviados if s == "a"] == por_shard["a"]
+    assert [n for s, n in enviados if s == "c"] == por_shard["c"]
+    assert [n for s, n in enviados if s == "b"] == [n for n in por_shard["b"] if n < 13]
+    pendentes = {e["payload"]["n"]: e for e in journal_listar()}
+    assert set(pendentes) == {n for n in por_shard["b"] if n >= 13}
+    assert pendentes[13]["tentativas"] == 1 and pendentes[13]["erro"] == "Sheets indisponível"
+
+    # Entrada em 'falha' (esgotou as tentativas) segura o shard mesmo depois que o Sheets volta.
+    monkeypatch.setattr(journal, "JOURNAL_MAX_TENTATIVAS", 2)
+    journal_marcar([ids[13]], "pendente", "Sheets indisponível")
+    assert journal_resumo()["falha"] == 1
+    falhar.clear()
+    assert AppOrc.replay_journal() == 0
+    journal.journal_reprocessar_falhas()
+    AppOrc.replay_journal()
+    assert [n for s, n in enviados if s == "b"] == por_shard["b"]
+    assert journal_listar() == []
@@ -0,0 +1,70 @@
+"""Razão incremental x compute_consumo completo sobre os mesmos lançamentos."""
+
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from orcamento.agregado import compute_consumo
+from orcamento.razao import (
+    _razao_conn, _razao_diferencas, _razao_mensal_divergencias, razao_aplicar, razao_mensal_tabela,
+    razao_pronta, razao_reconstruir, razao_tabela,
+)
+
+
+def _conferir(df: pd.DataFrame):
+    esperado, alertas = compute_consumo(df)
+    atual, alertas_razao = razao_tabela()
+    assert _razao_diferencas(esperado, atual) == 0
+    assert sorted(alertas["Mensagem"]) == sorted(alertas_razao["Mensagem"])
+    with closing(_razao_conn()) as conn:
+        assert _razao_mensal_divergencias(conn) == 0
+
+
+def test_reconstruir_igual_ao_compute_consumo(sqlite_local, df_lanc):
+    razao_reconstruir(df_lanc)
+    assert razao_pronta()
+    _conferir(df_lanc)
+
+    mensal = razao_mensal_tabela().groupby(["Ano", "Mes_Num", "Projeto", "Categoria", "Tipo"])["Valor_num"].sum()
+    esperado = df_lanc.groupby(["Ano", "Mes_Num", "Projeto", "Categoria", "Tipo"])["Valor_num"].sum()
+    esperado = esperado[esperado.index.get_level_values("Mes_Num").isin(range(1, 13))]
+    pd.testing.assert_series_equal(mensal.sort_index(), esperado.sort_index(), check_names=False, check_dtype=False)
+
+
+def test_aplicar_incremental_igual_a_reconstrucao(sqlite_local, df_lanc):
+    rng = np.random.default_rng(3)
+    atual, resto = df_lanc.iloc[:2000].copy(), df_lanc.iloc[2000:]
+    razao_reconstruir(atual)
+    meses = atual[["Mês", "Mes_Num"]].drop_duplicates().to_numpy()
+    categorias = atual["Categoria"].unique()
+
+    for passo in range(5):
+        # Gravação: um bloco novo.
+        novas, resto = resto.iloc[:200], resto.iloc[200:]
+        razao_aplicar(novas=novas)
+        atual = pd.concat([atual, novas])
+
+        # Exclusão: Lanc_IDs ao acaso (inclui orçados com realizados vinculados).
+        remover = rng.choice(atual["Lanc_ID"].to_numpy(), size=80, replace=False)
+        razao_aplicar(remover=remover)
+        atual = atual[~atual["Lanc_ID"].isin(remover)]
+
+        # Edição: valor, categoria e mês trocados (muda de grupo e de maior orçado).
+        pos = rng.choice(len(atual), size=40, replace=False)
+        editadas = atual.iloc[pos].copy()
+        editadas["Valor_num"] = editadas["Valor_num"] * rng.uniform(0.2, 3.0, size=len(pos))
+        editadas["Categoria"] = rng.choice(categorias, size=len(pos))
+        editadas[["Mês", "Mes_Num"]] = meses[rng.integers(0, len(meses), size=len(pos))]
+        editadas = editadas.astype({"Mes_Num": int})
+        razao_aplicar(novas=editadas)
+        atual = pd.concat([atual[~atual["Lanc_ID"].isin(editadas["Lanc_ID"])], editadas])
+
+        assert razao_pronta(), f"razao_aplicar falhou no passo {passo}"
+        _conferir(atual)
+
+
+def test_aplicar_sem_razao_construida_nao_faz_nada(sqlite_local, df_lanc):
+    razao_aplicar(novas=df_lanc.iloc[:50])
+    assert not razao_pronta()
+    assert razao_tabela()[0].empty